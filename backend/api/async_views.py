@@ -0,0 +1,266 @@
+from abc import ABCMeta, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from api.views import IngredientViewSet, RecipeViewSet, UserViewSet
+from cart.shopping_list import (
+    SHOPPING_LIST_FORMATS,
+    ExportUnavailable,
+    aexport_shopping_list,
+    get_filename,
+)
+from foodgram_config.conditional import make_etag
+from foodgram_config.page_cache import recipe_page_cache
+from ingredients.search import ingredient_index
+from users.authentication import CachedTokenAuthentication
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status_code,
+    )
+
+
+class AsyncReadView(View, metaclass=ABCMeta):
+    """Async-представление горячего GET-эндпоинта для ASGI.
+
+    GET обслуживает корутина ``read`` через асинхронный ORM, остальные
+    методы уходят в синхронный ``viewset_class`` с ``fallback_actions``.
+    Фильтры, сериализаторы, пагинация и валидаторы берутся у экземпляра
+    того же вьюсета, поэтому ответы совпадают с синхронными.
+    """
+
+    viewset_class = None
+    action = None
+    fallback_actions = None
+    fallback = None
+    requires_authentication = False
+    authentication = CachedTokenAuthentication()
+    # Обработчики GET/HEAD нет, всё решает dispatch
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        initkwargs.setdefault(
+            'fallback', cls.viewset_class.as_view(cls.fallback_actions)
+        )
+        view = super().as_view(**initkwargs)
+        # Как и у DRF: CSRF не нужен при авторизации по токену
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(self.fallback)(
+                request, *args, **kwargs
+            )
+        request = Request(request)
+        viewset = self.viewset_class(
+            request=request,
+            args=args,
+            kwargs=kwargs,
+            action=self.action,
+            format_kwarg=None,
+        )
+        try:
+            user, token = (
+                await self.authentication.aauthenticate(request)
+                or (AnonymousUser(), None)
+            )
+            request.user, request.auth = user, token
+            if self.requires_authentication and not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            return await self.read(viewset, request, *args, **kwargs)
+        except (exceptions.APIException, Http404) as exc:
+            return self.handle_exception(exc, viewset, request)
+
+    def handle_exception(self, exc, viewset, request):
+        result = exception_handler(
+            exc, {'view': viewset, 'request': request}
+        )
+        rendered = render(result.data, result.status_code)
+        for header, value in result.items():
+            rendered[header] = value
+        if isinstance(exc, (
+            exceptions.NotAuthenticated, exceptions.AuthenticationFailed
+        )):
+            rendered['WWW-Authenticate'] = (
+                self.authentication.authenticate_header(request)
+            )
+        return rendered
+
+    @abstractmethod
+    async def read(self, viewset, request, *args, **kwargs):
+        """Ответ на GET для ``viewset``, уже связанного с запросом."""
+
+    def respond(self, viewset, request, validators, get_data, cache_key=None):
+        """Ответ с валидаторами; сериализация только если нет 304."""
+        not_modified = viewset.conditional_response(request, *validators)
+        if not_modified is not None:
+            return not_modified
+        data = get_data()
+        if cache_key is not None:
+            recipe_page_cache.set(cache_key, data, viewset.validators)
+        result = render(data)
+        viewset.set_validators(result)
+        if cache_key is not None:
+            result['X-Cache'] = 'MISS'
+        return result
+
+    def cached(self, viewset, request, pk=None):
+        """(ключ, ответ из кэша) для анонима или (None, None)."""
+        if request.user.is_authenticated:
+            return None, None
+        key, cached = recipe_page_cache.get(request, pk)
+        if cached is None:
+            return key, None
+        data, validators = cached
+        not_modified = viewset.conditional_response(request, *validators)
+        if not_modified is not None:
+            return key, not_modified
+        result = render(data)
+        viewset.set_validators(result)
+        result['X-Cache'] = 'HIT'
+        return key, result
+
+
+class RecipeListView(AsyncReadView):
+    viewset_class = RecipeViewSet
+    action = 'list'
+    fallback_actions = {'get': 'list', 'post': 'create'}
+
+    async def read(self, viewset, request):
+        key, cached = self.cached(viewset, request)
+        if cached is not None:
+            return cached
+        queryset = await sync_to_async(viewset.filter_queryset)(
+            viewset.get_queryset()
+        )
+        page = await viewset.paginator.apaginate_queryset(
+            queryset, request, view=viewset
+        )
+        _, _, catalog_version, _ = await ingredient_index.aget_index()
+        etag, _ = viewset.get_recipe_validators(
+            page, viewset.get_page_envelope(), catalog_version
+        )
+        return self.respond(
+            viewset,
+            request,
+            (etag, None),
+            lambda: viewset.get_paginated_response(
+                viewset.get_serializer(page, many=True).data
+            ).data,
+            key,
+        )
+
+
+class RecipeDetailView(AsyncReadView):
+    viewset_class = RecipeViewSet
+    action = 'retrieve'
+    fallback_actions = {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }
+
+    async def read(self, viewset, request, pk):
+        key, cached = self.cached(viewset, request, pk)
+        if cached is not None:
+            return cached
+        recipe = await viewset.get_queryset().filter(pk=pk).afirst()
+        if recipe is None:
+            raise Http404
+        viewset.check_object_permissions(request, recipe)
+        _, _, catalog_version, _ = await ingredient_index.aget_index()
+        return self.respond(
+            viewset,
+            request,
+            viewset.get_recipe_validators(
+                [recipe], catalog_version=catalog_version
+            ),
+            lambda: viewset.get_serializer(recipe).data,
+            key,
+        )
+
+
+class IngredientListView(AsyncReadView):
+    viewset_class = IngredientViewSet
+    action = 'list'
+    fallback_actions = {'get': 'list'}
+
+    async def read(self, viewset, request):
+        name = request.query_params.get('name', '')
+        index = await ingredient_index.aget_index()
+        _, _, catalog_version, _ = index
+        return self.respond(
+            viewset,
+            request,
+            (make_etag(catalog_version, name), None),
+            lambda: viewset.get_serializer(
+                ingredient_index.find(index, name), many=True
+            ).data,
+        )
+
+
+class SubscriptionsView(AsyncReadView):
+    viewset_class = UserViewSet
+    action = 'subscriptions'
+    fallback_actions = {'get': 'subscriptions'}
+    requires_authentication = True
+
+    async def read(self, viewset, request):
+        page = await viewset.paginator.apaginate_queryset(
+            viewset.get_subscriptions_queryset(), request, view=viewset
+        )
+        recipes = viewset.get_page_recipes(
+            page, request.query_params.get('recipes_limit')
+        )
+        viewset.attach_page_recipes(
+            page, [recipe async for recipe in recipes]
+        )
+        serializer = viewset.get_serializer(page, many=True)
+        return render(viewset.get_paginated_response(serializer.data).data)
+
+
+class ShoppingListDownloadView(AsyncReadView):
+    viewset_class = RecipeViewSet
+    action = 'export_shopping_list'
+    fallback_actions = {'get': 'export_shopping_list'}
+    requires_authentication = True
+
+    async def read(self, viewset, request):
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return render(
+                {'errors': f'Формат {file_format} не поддерживается'},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        current_time = timezone.now()
+        try:
+            content, content_type = await aexport_shopping_list(
+                request.user, file_format, current_time
+            )
+        except ExportUnavailable as error:
+            return render(
+                {'errors': str(error)},
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        file_response = StreamingHttpResponse(
+            content,
+            content_type=content_type
+        )
+        file_response['Content-Disposition'] = (
+            f'attachment; filename="{get_filename(file_format, current_time)}"'
+        )
+        return file_response
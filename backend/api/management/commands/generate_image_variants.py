@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from foodgram_config.images import (
+    find_built_formats, generate_variants, get_formats
+)
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит уменьшенные копии картинок рецептов и аватарок, '
+        'у которых их ещё нет. Нужна для уже загруженных файлов и после '
+        'изменения IMAGE_VARIANTS или IMAGE_VARIANT_FORMATS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='пересоздать копии, даже если они уже есть',
+        )
+
+    def handle(self, *args, **options):
+        sources = (
+            (Recipe, 'image'),
+            (User, 'avatar'),
+        )
+        generated = skipped = failed = 0
+        for model, field_name in sources:
+            field = model._meta.get_field(field_name)
+            files = model.objects.exclude(
+                **{field_name: ''}
+            ).exclude(
+                **{f'{field_name}__isnull': True}
+            ).values_list('pk', field_name, field.variants_field).iterator()
+            for pk, name, stored in files:
+                field_file = field.attr_class(None, field, name)
+                formats = find_built_formats(field_file.storage, name)
+                if options['force'] or formats != ','.join(get_formats()):
+                    try:
+                        formats = generate_variants(field_file)
+                    except (OSError, ValueError) as error:
+                        failed += 1
+                        self.stderr.write(f'{name}: {error}')
+                        continue
+                    generated += 1
+                else:
+                    skipped += 1
+                if formats != stored:
+                    # update() не двигает updated_at и не шлёт сигналы
+                    model.objects.filter(pk=pk).update(
+                        **{field.variants_field: formats}
+                    )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {generated}, уже были: {skipped}, ошибок: {failed}'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from foodgram_config.page_cache import recipe_page_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша страниц рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='обнулить счётчики после вывода',
+        )
+
+    def handle(self, *args, **options):
+        stats = recipe_page_cache.stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f"hits: {stats['hits']}, misses: {stats['misses']}, "
+            f'hit ratio: {ratio:.1%}'
+        )
+        if options['reset']:
+            recipe_page_cache.reset_stats()
@@ -0,0 +1,205 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cart.models import ShoppingCart
+from ingredients.models import Ingredient
+from recipes.models import Favorite, Recipe, RecipeIngredient
+from users.models import Subscription, User
+
+PRODUCTS = (
+    'мука', 'сахар', 'соль', 'молоко', 'масло', 'сыр', 'рис', 'гречка',
+    'картофель', 'морковь', 'лук', 'чеснок', 'томаты', 'перец', 'курица',
+    'говядина', 'свинина', 'индейка', 'треска', 'лосось', 'яблоки',
+    'груши', 'клубника', 'малина', 'орехи', 'мёд', 'сливки', 'творог',
+    'йогурт', 'фасоль', 'горох', 'чечевица', 'макароны', 'хлеб', 'яйца',
+    'кабачки', 'баклажаны', 'капуста', 'шпинат', 'укроп', 'петрушка',
+    'базилик', 'корица', 'ваниль', 'какао', 'шоколад', 'кефир', 'грибы',
+)
+KINDS = (
+    'пшеничная', 'ржаная', 'цельнозерновая', 'тростниковый', 'морская',
+    'топлёное', 'оливковое', 'копчёный', 'свежий', 'сушёный', 'молотый',
+    'замороженный', 'консервированный', 'домашний', 'фермерский',
+    'обезжиренный', 'жирный', 'красный', 'белый', 'зелёный', 'молодой',
+    'маринованный', 'тёртый', 'рубленый', 'органический', 'местный',
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+DISHES = (
+    'суп', 'салат', 'пирог', 'рагу', 'запеканка', 'омлет', 'каша',
+    'паста', 'котлеты', 'блины', 'соус', 'десерт', 'плов', 'жаркое',
+)
+FIRST_NAMES = (
+    'Анна', 'Иван', 'Мария', 'Пётр', 'Елена', 'Алексей', 'Ольга',
+    'Дмитрий', 'Наталья', 'Сергей', 'Татьяна', 'Михаил',
+)
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев',
+    'Козлов', 'Новиков', 'Морозов', 'Волков', 'Павлов', 'Фёдоров',
+)
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими данными: пользователи, каталог '
+        'ингредиентов, рецепты с 5–30 ингредиентами, подписки, избранное '
+        'и корзины. Одинаковый --seed даёт одинаковые данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--min-ingredients', type=int, default=5)
+        parser.add_argument('--max-ingredients', type=int, default=30)
+        parser.add_argument(
+            '--subscriptions', type=int, default=20,
+            help='подписок на пользователя, не больше',
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=30,
+            help='рецептов в избранном на пользователя, не больше',
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='рецептов в корзине на пользователя, не больше',
+        )
+
+    def handle(self, *args, **options):
+        if not (
+            1 <= options['min_ingredients'] <= options['max_ingredients']
+        ):
+            raise CommandError(
+                'Нужно 1 <= --min-ingredients <= --max-ingredients'
+            )
+        if options['max_ingredients'] > options['ingredients']:
+            raise CommandError(
+                '--max-ingredients больше размера каталога'
+            )
+        self.random = random.Random(options['seed'])
+        # Префикс отличает данные разных запусков: логины и почты уникальны
+        self.prefix = f'seed{options["seed"]}-{User.objects.count()}'
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            ingredients = self.create_ingredients(options['ingredients'])
+            recipes = self.create_recipes(
+                users,
+                ingredients,
+                options['recipes'],
+                options['min_ingredients'],
+                options['max_ingredients'],
+            )
+            subscriptions = self.create_relations(
+                Subscription, users, users, options['subscriptions'],
+                'subscribed_to',
+            )
+            favorites = self.create_relations(
+                Favorite, users, recipes, options['favorites'], 'recipe'
+            )
+            carts = self.create_relations(
+                ShoppingCart, users, recipes, options['carts'], 'recipe'
+            )
+            call_command('rebuild_shopping_lists', stdout=self.stdout)
+            call_command('rebuild_feed', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, ингредиентов '
+            f'{len(ingredients)}, рецептов {len(recipes)}, подписок '
+            f'{subscriptions}, в избранном {favorites}, в корзинах {carts}'
+        ))
+
+    def create_users(self, count):
+        # Хэш пароля считается один раз: он медленный намеренно
+        password = make_password('password')
+        return User.objects.bulk_create(
+            (
+                User(
+                    email=f'{self.prefix}-{number}@example.com',
+                    username=f'{self.prefix}-{number}',
+                    first_name=self.random.choice(FIRST_NAMES),
+                    last_name=self.random.choice(LAST_NAMES),
+                    password=password,
+                )
+                for number in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    def create_ingredients(self, count):
+        names = [
+            f'{product} {kind}' for product in PRODUCTS for kind in KINDS
+        ]
+        self.random.shuffle(names)
+        return Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=(
+                        names[number] if number < len(names)
+                        else f'{names[number % len(names)]} {number}'
+                    ),
+                    measurement_unit=self.random.choice(UNITS),
+                )
+                for number in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    def create_recipes(self, users, ingredients, count, low, high):
+        # Несколько активных авторов пишут большую часть рецептов
+        weights = [1 / (rank + 1) for rank in range(len(users))]
+        authors = self.random.choices(users, weights, k=count)
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=author,
+                    name=(
+                        f'{self.random.choice(DISHES).capitalize()} '
+                        f'№{number}'
+                    ),
+                    image='recipes/images/seed.png',
+                    text='Синтетический рецепт для нагрузочных замеров.',
+                    cooking_time=self.random.randint(5, 180),
+                )
+                for number, author in enumerate(authors)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        # auto_now_add ставит всем одно время, разносим даты за год
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=self.random.randint(0, 365 * 24 * 3600)
+            )
+        Recipe.objects.bulk_update(recipes, ['pub_date'], BATCH_SIZE)
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=self.random.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient in self.random.sample(
+                    ingredients, self.random.randint(low, high)
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        return recipes
+
+    def create_relations(self, model, users, targets, limit, target_field):
+        """До ``limit`` случайных различных целей на пользователя."""
+        rows = []
+        for user in users:
+            for target in self.random.sample(
+                targets, min(self.random.randint(0, limit), len(targets))
+            ):
+                if target is not user:
+                    rows.append(model(user=user, **{target_field: target}))
+        model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        return len(rows)
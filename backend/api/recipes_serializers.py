@@ -1,16 +1,23 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
-from drf_extra_fields.fields import Base64ImageField
 from django.core.validators import MinValueValidator
 
 from recipes.models import RecipeIngredient, Recipe
+from recipes.pantry import pantry_index
+from recipes.search import highlight, snippet
+from recipes.signals import saving_recipe
 from ingredients.models import Ingredient
 from api.serializers import CustomUserSerializer
+from cart.services import recipe_amounts_changed
+from foodgram_config.images import (
+    ImageSourcesField, ImageVariantSerializerField
+)
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source="ingredient.id"
+    id = serializers.IntegerField(
+        source="ingredient_id"
     )
     name = serializers.CharField(
         source="ingredient.name",
@@ -44,10 +51,17 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True,
         source="recipe_ingredients",
     )
-    image = Base64ImageField(
+    image = ImageVariantSerializerField(
+        variant='card',
+        detail_variant='full',
         required=True,
         allow_null=False
     )
+    image_sources = ImageSourcesField(
+        variant='card',
+        detail_variant='full',
+        source='image',
+    )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     cooking_time = serializers.IntegerField(
@@ -63,6 +77,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             "author",
             "ingredients", "name",
             "image",
+            "image_sources",
             "text",
             "cooking_time",
             "is_favorited",
@@ -101,14 +116,24 @@ class RecipeSerializer(serializers.ModelSerializer):
                 "Ing is Null"
             )
         ingredient_ids = [
-            ingredient["ingredient"]["id"] for ingredient in ingredients
+            ingredient["ingredient_id"] for ingredient in ingredients
         ]
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError("Ing is duplicated")
+        # Все id проверяются одним запросом, а не get() на каждый ингредиент
+        existing_ids = set(
+            Ingredient.objects.filter(
+                id__in=ingredient_ids
+            ).values_list("id", flat=True)
+        )
+        if len(existing_ids) != len(ingredient_ids):
+            raise serializers.ValidationError("Ing is not found")
         return ingredients
 
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get("request")
         return (
                 request and
@@ -117,6 +142,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return obj.shopping_cart.filter(
@@ -124,17 +151,40 @@ class RecipeSerializer(serializers.ModelSerializer):
             ).exists()
         return False
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        data = super().to_representation(instance)
+        terms = self.context.get('search_terms')
+        if terms:
+            data['highlight'] = {
+                'name': highlight(instance.name, terms),
+                'text': snippet(instance.text, terms),
+            }
+        if hasattr(instance, 'missing_ingredients'):
+            data['missing_ingredients'] = instance.missing_ingredients
+            data['covered_ingredients'] = instance.covered_ingredients
+        return data
+
     def create(self, validated_data):
         ingredients_data = validated_data.pop("recipe_ingredients", [])
         recipe = super().create(validated_data)
         RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
                 recipe=recipe,
-                ingredient_id=ingredient_data["ingredient"]["id"].id,
+                ingredient_id=ingredient_data["ingredient_id"],
                 amount=ingredient_data["amount"],
             )
             for ingredient_data in ingredients_data
         )
+        # bulk_create не шлёт сигналы, индекс обновляется явно
+        pantry_index.set_recipe(
+            recipe.id,
+            [
+                ingredient_data["ingredient_id"]
+                for ingredient_data in ingredients_data
+            ],
+        )
         return recipe
 
     def update(self, instance, validated_data):
@@ -146,14 +196,68 @@ class RecipeSerializer(serializers.ModelSerializer):
         if "image" not in validated_data:
             validated_data["image"] = instance.image
         ingredients_data = validated_data.pop("recipe_ingredients", [])
-        instance = super().update(instance, validated_data)
-        instance.recipe_ingredients.all().delete()
-        RecipeIngredient.objects.bulk_create(
-            RecipeIngredient(
-                recipe=instance,
-                ingredient_id=ingredient_data["ingredient"]["id"].id,
-                amount=ingredient_data["amount"],
-            )
+        new_amounts = {
+            ingredient_data["ingredient_id"]: ingredient_data["amount"]
             for ingredient_data in ingredients_data
-        )
+        }
+        with transaction.atomic():
+            rows = {
+                recipe_ingredient.ingredient_id: recipe_ingredient
+                for recipe_ingredient in instance.recipe_ingredients.all()
+            }
+            instance = super().update(instance, validated_data)
+            old_amounts = {
+                ingredient_id: row.amount
+                for ingredient_id, row in rows.items()
+            }
+            if new_amounts != old_amounts:
+                with saving_recipe(instance.id):
+                    self.update_ingredients(instance, rows, new_amounts)
+                recipe_amounts_changed(instance.id, old_amounts, new_amounts)
         return instance
+
+    @staticmethod
+    def update_ingredients(recipe, rows, amounts):
+        """Приводит строки ``rows`` {ingredient_id: RecipeIngredient}
+        к ``amounts``: удаляет лишние, меняет количества, добавляет новые.
+
+        Совпадающие строки не трогаются и сохраняют свои id.
+        """
+        removed = [
+            row.pk for ingredient_id, row in rows.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        for ingredient_id, row in rows.items():
+            amount = amounts.get(ingredient_id, row.amount)
+            if amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        added = [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in rows
+        ]
+        if removed:
+            # Сигналы удаления сами убирают строки из индекса
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ["amount"])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+            # bulk_create не шлёт сигналы, индекс обновляется явно
+            pantry_index.set_recipe(recipe.id, amounts)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_MAX,
+    )
+
+    def validate_recipes(self, value):
+        # Повторы не нужны, порядок ответа — как в запросе
+        return list(dict.fromkeys(value))
@@ -3,6 +3,10 @@ from drf_extra_fields.fields import Base64ImageField
 from django.contrib.auth import authenticate
 
 from api.shorts_serializers import RecipeShortSerializer
+from foodgram_config.images import (
+    ImageSourcesField, ImageVariantSerializerField
+)
+from users.authentication import token_cache
 from users.models import Subscription, User
 from ingredients.models import Ingredient
 
@@ -46,9 +50,12 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
 class CustomUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    avatar = Base64ImageField()
+    avatar = ImageVariantSerializerField(variant='thumbnail')
+    avatar_sources = ImageSourcesField(variant='thumbnail', source='avatar')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return request.user.users_subscriptions.filter(
@@ -66,12 +73,14 @@ class CustomUserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_sources',
         )
 
 
 class ReadUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    avatar = Base64ImageField()
+    avatar = ImageVariantSerializerField(variant='thumbnail')
+    avatar_sources = ImageSourcesField(variant='thumbnail', source='avatar')
 
     class Meta:
         model = User
@@ -83,12 +92,15 @@ class ReadUserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_sources',
         )
         read_only_fields = (
             'email',
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return request.user.users_subscriptions.filter(
@@ -163,20 +175,27 @@ class ChangePasswordSerializer(serializers.Serializer):
         new_password = self.validated_data['new_password']
         user.set_password(new_password)
         user.save()
+        token_cache.evict_user(user.id)
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
-    avatar = Base64ImageField(
+    avatar = ImageVariantSerializerField(
+        variant='thumbnail',
         required=False
     )
+    avatar_sources = ImageSourcesField(variant='thumbnail', source='avatar')
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return request.user.users_subscriptions.filter(
@@ -185,6 +204,10 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return False
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'page_recipes'):
+            return RecipeShortSerializer(
+                obj.page_recipes, many=True, read_only=True
+            ).data
         request = self.context.get('request')
 
         limit = request.GET.get('recipes_limit')
@@ -213,6 +236,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_sources',
             'recipes',
             'recipes_count',
         )
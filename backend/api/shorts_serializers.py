@@ -1,15 +1,25 @@
 from rest_framework.serializers import ModelSerializer
 
+from foodgram_config.images import (
+    ImageSourcesField, ImageVariantSerializerField
+)
 from recipes.models import Recipe
 
 
 class RecipeShortSerializer(ModelSerializer):
+    image = ImageVariantSerializerField(
+        variant='thumbnail',
+        read_only=True
+    )
+    image_sources = ImageSourcesField(variant='thumbnail', source='image')
+
     class Meta:
         model = Recipe
         fields = (
             "id",
             "name",
             "image",
+            "image_sources",
             "cooking_time"
         )
         read_only_fields = fields
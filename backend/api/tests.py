@@ -1,3 +1,1706 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from cart import shopping_list
+from cart.models import ShoppingCart, ShoppingListItem
+from cart.services import add_to_shopping_list
+from foodgram_config.images import (
+    delete_variants, get_formats, variant_names
+)
+from foodgram_config.page_cache import recipe_page_cache
+from foodgram_config.sql_budget import assert_sql_budget, recording
+from ingredients.models import Ingredient
+from ingredients.search import ingredient_index
+from recipes.models import Favorite, Recipe, RecipeIngredient
+from recipes.pantry import pantry_index
+from recipes.signals import pending
+from users.models import Subscription, User
+
+
+class RecipeListQueriesTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='viewer@example.com',
+            username='viewer',
+            first_name='Зритель',
+            last_name='Тестовый',
+            password='password',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com',
+                username=f'author{i}',
+                first_name='Автор',
+                last_name=str(i),
+                password='password',
+            )
+            for i in range(3)
+        ]
+        cls.ingredient = Ingredient.objects.create(
+            name='соль',
+            measurement_unit='г'
+        )
+        Subscription.objects.create(
+            user=cls.user,
+            subscribed_to=cls.authors[0]
+        )
+
+    def create_recipes(self, count):
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                author=self.authors[i % len(self.authors)],
+                name=f'рецепт {i}',
+                image='recipes/images/test.png',
+                text='описание',
+                cooking_time=10,
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe,
+                ingredient=self.ingredient,
+                amount=5,
+            )
+            if i % 2:
+                Favorite.objects.create(user=self.user, recipe=recipe)
+            else:
+                ShoppingCart.objects.create(user=self.user, recipe=recipe)
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        self.client.force_authenticate(self.user)
+        self.create_recipes(2)
+        # count, рецепты с флагами и автором, ингредиенты рецептов
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'limit': 25})
+        self.create_recipes(20)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'limit': 25})
+        self.assertEqual(response.data['count'], 22)
+
+    def test_list_flags_match_viewer(self):
+        self.client.force_authenticate(self.user)
+        self.create_recipes(4)
+        response = self.client.get(self.url, {'limit': 25})
+        for item in response.data['results']:
+            recipe = Recipe.objects.get(pk=item['id'])
+            self.assertEqual(
+                item['is_favorited'],
+                recipe.favorite.filter(user=self.user).exists()
+            )
+            self.assertEqual(
+                item['is_in_shopping_cart'],
+                recipe.shopping_cart.filter(user=self.user).exists()
+            )
+            self.assertEqual(
+                item['author']['is_subscribed'],
+                recipe.author == self.authors[0]
+            )
+
+    def test_anonymous_list_flags_are_false(self):
+        self.create_recipes(2)
+        response = self.client.get(self.url)
+        for item in response.data['results']:
+            self.assertFalse(item['is_favorited'])
+            self.assertFalse(item['is_in_shopping_cart'])
+            self.assertFalse(item['author']['is_subscribed'])
+
+
+# Прозрачный PNG 1x1
+IMAGE = (
+    'data:image/png;base64,'
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA'
+    '60e6kgAAAABJRU5ErkJggg=='
+)
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeQueryBudgetTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Тестовый',
+            password='password',
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(30)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def payload(self, ingredients_count, name='рецепт', amount=10):
+        return {
+            'name': name,
+            'text': 'описание',
+            'cooking_time': 5,
+            'image': IMAGE,
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient in self.ingredients[:ingredients_count]
+            ],
+        }
+
+    def create_recipe(self, ingredients_count):
+        recipe = Recipe.objects.create(
+            author=self.author,
+            name='рецепт',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in self.ingredients[:ingredients_count]
+        )
+        return recipe
+
+    def test_list_budget(self):
+        for ingredients_count in (1, 30):
+            self.create_recipe(ingredients_count)
+            with self.assertNumQueries(3):
+                self.client.get(self.url)
+
+    def test_retrieve_budget(self):
+        for ingredients_count in (1, 30):
+            recipe = self.create_recipe(ingredients_count)
+            with self.assertNumQueries(2):
+                response = self.client.get(f'{self.url}{recipe.id}/')
+            self.assertEqual(
+                len(response.data['ingredients']), ingredients_count
+            )
+
+    def test_create_budget(self):
+        for ingredients_count in (1, 30):
+            # проверка id, INSERT рецепта и ингредиентов, подписчики
+            # автора для ленты, перечитывание
+            with self.assertNumQueries(6):
+                response = self.client.post(
+                    self.url,
+                    self.payload(ingredients_count),
+                    format='json'
+                )
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertEqual(
+                len(response.data['ingredients']), ingredients_count
+            )
+
+    def test_update_budget(self):
+        # рецепт и ингредиенты, проверка id, транзакция из UPDATE
+        # рецепта, перечитывание; при том же составе ингредиенты
+        # не трогаются
+        for created_count, ingredients_count, amount, queries in (
+            (1, 1, 1, 8),
+            # плюс UPDATE количества, INSERT новых и корзины с рецептом
+            (1, 30, 10, 11),
+            # плюс выборка удаляемых строк, их DELETE и корзины с рецептом;
+            # рецепт не трогается и не сбрасывается по разу на строку
+            (30, 1, 1, 11),
+        ):
+            recipe = self.create_recipe(created_count)
+            with self.assertNumQueries(queries):
+                response = self.client.patch(
+                    f'{self.url}{recipe.id}/',
+                    self.payload(ingredients_count, 'новое', amount),
+                    format='json'
+                )
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(response.data['name'], 'новое')
+            self.assertEqual(
+                len(response.data['ingredients']), ingredients_count
+            )
+
+    def test_update_applies_ingredient_diff(self):
+        recipe = self.create_recipe(3)
+        kept, changed, removed = recipe.recipe_ingredients.order_by('id')
+        ShoppingCart.objects.create(user=self.author, recipe=recipe)
+        add_to_shopping_list(self.author.id, recipe.id)
+        pantry_index.invalidate()
+        pantry_index.ensure_built()
+        added = self.ingredients[3]
+        payload = self.payload(0)
+        payload['ingredients'] = [
+            {'id': kept.ingredient_id, 'amount': kept.amount},
+            {'id': changed.ingredient_id, 'amount': 7},
+            {'id': added.id, 'amount': 4},
+        ]
+        response = self.client.patch(
+            f'{self.url}{recipe.id}/', payload, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        rows = {
+            row.ingredient_id: row
+            for row in recipe.recipe_ingredients.all()
+        }
+        self.assertEqual(rows[kept.ingredient_id].pk, kept.pk)
+        self.assertEqual(rows[changed.ingredient_id].pk, changed.pk)
+        self.assertEqual(rows[changed.ingredient_id].amount, 7)
+        self.assertNotIn(removed.ingredient_id, rows)
+        self.assertEqual(rows[added.id].amount, 4)
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(
+                user=self.author
+            ).values_list('ingredient_id', 'total')),
+            {kept.ingredient_id: 1, changed.ingredient_id: 7, added.id: 4},
+        )
+        self.assertEqual(
+            {
+                recipe_id
+                for recipe_id, _, _ in pantry_index.find(
+                    [removed.ingredient_id], 10, 10
+                )
+            },
+            set(),
+        )
+        self.assertEqual(
+            [
+                (recipe_id, missing)
+                for recipe_id, missing, _ in pantry_index.find(
+                    [added.id], 10, 10
+                )
+            ],
+            [(recipe.id, 2)],
+        )
+        pantry_index.invalidate()
+
+    def test_create_with_unknown_ingredient(self):
+        payload = self.payload(1)
+        payload['ingredients'].append({'id': 10 ** 6, 'amount': 1})
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SubscriptionsQueriesTest(APITestCase):
+    url = '/api/users/subscriptions/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com',
+            username='reader',
+            first_name='Читатель',
+            last_name='Тестовый',
+            password='password',
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def subscribe_to_authors(self, count, recipes_per_author):
+        for _ in range(count):
+            number = User.objects.count()
+            author = User.objects.create_user(
+                email=f'writer{number}@example.com',
+                username=f'writer{number}',
+                first_name='Автор',
+                last_name=str(number),
+                password='password',
+            )
+            Subscription.objects.create(user=self.user, subscribed_to=author)
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=f'рецепт {i}',
+                    image='recipes/images/test.png',
+                    text='описание',
+                    cooking_time=10,
+                )
+                for i in range(recipes_per_author)
+            )
+
+    def test_query_count_does_not_depend_on_authors(self):
+        self.subscribe_to_authors(1, 2)
+        # count, авторы страницы, рецепты авторов
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'recipes_limit': 3})
+        self.subscribe_to_authors(5, 6)
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                self.url, {'recipes_limit': 3, 'limit': 25}
+            )
+        self.assertEqual(len(response.data['results']), 6)
+        for author in response.data['results'][1:]:
+            self.assertTrue(author['is_subscribed'])
+            self.assertEqual(author['recipes_count'], 6)
+            self.assertEqual(len(author['recipes']), 3)
+
+    def test_recipes_limit_keeps_newest(self):
+        self.subscribe_to_authors(1, 4)
+        author = User.objects.get(users_subscribers__user=self.user)
+        newest = list(
+            author.recipes.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )[:2]
+        )
+        response = self.client.get(self.url, {'recipes_limit': 2})
+        recipes = response.data['results'][0]['recipes']
+        self.assertEqual([recipe['id'] for recipe in recipes], newest)
+
+    def test_without_limit_returns_all_recipes(self):
+        self.subscribe_to_authors(2, 4)
+        response = self.client.get(self.url)
+        for author in response.data['results']:
+            self.assertEqual(len(author['recipes']), 4)
+
+
+class ToggleActionsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                email=f'{name}@example.com',
+                username=name,
+                first_name=name,
+                last_name=name,
+                password='password',
+            )
+            for name in ('clicker', 'cook')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='рецепт',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_toggles(self):
+        for url_name, model in (
+            ('favorite', Favorite),
+            ('shopping_cart', ShoppingCart),
+        ):
+            url = f'/api/recipes/{self.recipe.id}/{url_name}/'
+            self.assertEqual(self.client.post(url).status_code, 201)
+            self.assertEqual(self.client.post(url).status_code, 400)
+            self.assertEqual(model.objects.count(), 1)
+            self.assertEqual(self.client.delete(url).status_code, 204)
+            self.assertEqual(self.client.delete(url).status_code, 400)
+            self.assertEqual(
+                self.client.delete(f'/api/recipes/0/{url_name}/').status_code,
+                404
+            )
+
+    def test_favorite_toggle_is_one_statement(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        # рецепт и INSERT внутри точки сохранения
+        with self.assertNumQueries(4):
+            self.client.post(url)
+        # DELETE внутри точки сохранения
+        with self.assertNumQueries(3):
+            self.client.delete(url)
+
+    def test_shopping_cart_keeps_list_totals(self):
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=salt, amount=5
+        )
+        other = Recipe.objects.create(
+            author=self.author,
+            name='другой рецепт',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.create(
+            recipe=other, ingredient=salt, amount=7
+        )
+        for recipe in (self.recipe, other):
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        item = ShoppingListItem.objects.get(user=self.user)
+        self.assertEqual(item.total, 12)
+        self.client.delete(f'/api/recipes/{other.id}/shopping_cart/')
+        item.refresh_from_db()
+        self.assertEqual(item.total, 5)
+        other.delete()
+        self.recipe.delete()
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_subscribe_toggle(self):
+        url = f'/api/users/{self.author.id}/subscribe/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(Subscription.objects.count(), 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+
+
+class BulkRecipeRelationsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                email=f'{name}@example.com',
+                username=name,
+                first_name=name,
+                last_name=name,
+                password='password',
+            )
+            for name in ('shopper', 'chef')
+        )
+        cls.salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.author,
+                name=f'рецепт {number}',
+                image='recipes/images/test.png',
+                text='описание',
+                cooking_time=10,
+            )
+            for number in range(21)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=cls.salt, amount=2)
+            for recipe in cls.recipes
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def send(self, method, relation, recipe_ids):
+        return getattr(self.client, method)(
+            f'/api/recipes/bulk_{relation}/',
+            {'recipes': recipe_ids},
+            format='json',
+        )
+
+    def statuses(self, response):
+        return {
+            result['id']: result['status']
+            for result in response.data['results']
+        }
+
+    def test_per_id_statuses(self):
+        first, second = self.recipes[0].id, self.recipes[1].id
+        missing = self.recipes[-1].id + 1
+        Favorite.objects.create(user=self.user, recipe_id=first)
+        response = self.send(
+            'post', 'favorite', [first, second, missing, second]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['id'] for result in response.data['results']],
+            [first, second, missing],
+        )
+        self.assertEqual(
+            self.statuses(response),
+            {first: 'exists', second: 'added', missing: 'not_found'},
+        )
+        response = self.send('delete', 'favorite', [second, missing])
+        self.assertEqual(
+            self.statuses(response),
+            {second: 'removed', missing: 'not_found'},
+        )
+        response = self.send('delete', 'favorite', [second])
+        self.assertEqual(self.statuses(response), {second: 'absent'})
+        self.assertEqual(
+            list(Favorite.objects.values_list('recipe_id', flat=True)),
+            [first],
+        )
+
+    def test_shopping_cart_keeps_list_totals(self):
+        recipe_ids = [recipe.id for recipe in self.recipes[:5]]
+        self.client.post(f'/api/recipes/{recipe_ids[0]}/shopping_cart/')
+        self.send('post', 'shopping_cart', recipe_ids)
+        self.assertEqual(ShoppingCart.objects.count(), 5)
+        item = ShoppingListItem.objects.get(user=self.user)
+        self.assertEqual(item.total, 10)
+        self.send('delete', 'shopping_cart', recipe_ids[:3])
+        item.refresh_from_db()
+        self.assertEqual(item.total, 4)
+        self.send('delete', 'shopping_cart', recipe_ids)
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_queries_do_not_depend_on_list_length(self):
+        for relation in ('favorite', 'shopping_cart'):
+            for method in ('post', 'delete'):
+                counts = []
+                for recipes in (self.recipes[:1], self.recipes[1:]):
+                    with CaptureQueriesContext(connection) as queries:
+                        self.send(
+                            method, relation,
+                            [recipe.id for recipe in recipes],
+                        )
+                    counts.append(len(queries))
+                self.assertEqual(counts[0], counts[1], (relation, method))
+                self.assertLessEqual(counts[1], 8, (relation, method))
+
+    def test_validation(self):
+        too_many = list(range(1, settings.BULK_RECIPES_MAX + 2))
+        for recipe_ids in ([], ['x'], [0], None, too_many):
+            response = self.send('post', 'favorite', recipe_ids)
+            self.assertEqual(response.status_code, 400, recipe_ids)
+        self.client.force_authenticate(None)
+        response = self.send('post', 'favorite', [self.recipes[0].id])
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageVariantsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='painter@example.com',
+            username='painter',
+            first_name='Художник',
+            last_name='Тестовый',
+            password='password',
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='краска', measurement_unit='г'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.post('/api/recipes/', {
+            'name': 'рецепт',
+            'text': 'описание',
+            'cooking_time': 5,
+            'image': IMAGE,
+            'ingredients': [{'id': self.ingredient.id, 'amount': 1}],
+        }, format='json')
+        self.recipe = Recipe.objects.get(pk=response.data['id'])
+
+    def test_variants_are_generated_on_upload(self):
+        storage = self.recipe.image.storage
+        for name in variant_names(self.recipe.image.name):
+            self.assertTrue(storage.exists(name), name)
+
+    def test_serializers_point_to_variants(self):
+        url = '/api/recipes/'
+        listed = self.client.get(url).data['results'][0]['image']
+        detail = self.client.get(f'{url}{self.recipe.id}/').data['image']
+        short = self.client.post(
+            f'{url}{self.recipe.id}/favorite/'
+        ).data['image']
+        self.assertTrue(listed.endswith('.card.jpg'), listed)
+        self.assertTrue(detail.endswith('.full.jpg'), detail)
+        self.assertTrue(short.endswith('.thumbnail.jpg'), short)
+
+    def test_modern_formats_listed_alongside(self):
+        sources = self.client.get(
+            f'/api/recipes/{self.recipe.id}/'
+        ).data['image_sources']
+        self.assertEqual(list(sources), get_formats())
+        self.assertTrue(sources['webp'].endswith('.full.webp'))
+        self.assertTrue(sources['jpeg'].endswith('.full.jpg'))
+
+    def test_original_until_variants_exist(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(image_variants=None)
+        data = self.client.get(f'/api/recipes/{self.recipe.id}/').data
+        self.assertTrue(
+            data['image'].endswith(self.recipe.image.url), data['image']
+        )
+        self.assertEqual(data['image_sources'], {})
+
+    def test_reads_do_not_probe_storage(self):
+        self.assertEqual(self.recipe.image_variants, ','.join(get_formats()))
+        with mock.patch.object(
+            FileSystemStorage, 'exists', side_effect=AssertionError
+        ):
+            self.client.get('/api/recipes/')
+            self.client.get(f'/api/recipes/{self.recipe.id}/')
+
+    def test_backfill_command(self):
+        delete_variants(self.recipe.image)
+        Recipe.objects.filter(pk=self.recipe.pk).update(image_variants=None)
+        call_command('generate_image_variants', stdout=io.StringIO())
+        self.test_variants_are_generated_on_upload()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, ','.join(get_formats()))
+
+    def test_backfill_marks_existing_variants(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(image_variants=None)
+        stdout = io.StringIO()
+        call_command('generate_image_variants', stdout=stdout)
+        self.assertIn('уже были: 1', stdout.getvalue())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, ','.join(get_formats()))
+
+
+class RecipeKeysetPaginationTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='feed@example.com',
+            username='feed',
+            first_name='Лента',
+            last_name='Тестовая',
+            password='password',
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'рецепт {i}',
+                image='recipes/images/test.png',
+                text='описание',
+                cooking_time=10,
+            )
+            for i in range(10)
+        )
+        # Одинаковые даты проверяют, что ключ учитывает id
+        tied_ids = Recipe.objects.order_by('id').values('id')[:6]
+        Recipe.objects.filter(id__in=tied_ids).update(
+            pub_date=Recipe.objects.earliest('pub_date').pub_date
+        )
+
+    def test_walks_all_recipes_in_order(self):
+        expected = list(
+            Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        seen = []
+        url = f'{self.url}?pagination=cursor&limit=3'
+        while url:
+            # рецепты и их ингредиенты, без COUNT(*)
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get(self.url, {'page': 2, 'limit': 3})
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_rejected_with_ranked_filters(self):
+        for params in (
+            {'pagination': 'cursor', 'search': 'рецепт'},
+            {'cursor': 'garbage', 'have': 10 ** 6},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('pagination', response.data)
+
+
+class ConditionalGetTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='etag@example.com',
+            username='etag',
+            first_name='Кэш',
+            last_name='Тестовый',
+            password='password',
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='перец',
+            measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='рецепт',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe,
+            ingredient=cls.ingredient,
+            amount=5,
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def get_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_recipe_list_not_modified(self):
+        url = '/api/recipes/'
+        etag = self.get_etag(url)
+        # облегчённая страница и COUNT(*), без ингредиентов
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_recipe_etag_follows_viewer_state(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.get_etag(url)
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_recipe_etag_follows_ingredient_changes(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        row = self.recipe.recipe_ingredients.get()
+        etag = self.get_etag(url)
+        row.amount = 7
+        with self.captureOnCommitCallbacks(execute=True):
+            row.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ingredients'][0]['amount'], 7)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            row.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ingredients'], [])
+
+    def test_ingredient_rows_touch_recipe_once(self):
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=self.recipe, ingredient=ingredient, amount=1
+            )
+            for ingredient in Ingredient.objects.bulk_create(
+                Ingredient(name=f'добавка {i}', measurement_unit='г')
+                for i in range(5)
+            )
+        )
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.recipe_ingredients.all().delete()
+        updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "recipes_recipe"')
+        ]
+        self.assertEqual(len(updates), 1)
+
+    def test_recipe_etag_follows_updates(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.get_etag(url)
+        self.recipe.name = 'новое название'
+        self.recipe.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_recipe_last_modified(self):
+        self.client.force_authenticate(None)
+        url = f'/api/recipes/{self.recipe.id}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_recipe_last_modified_follows_catalog(self):
+        self.client.force_authenticate(None)
+        # Заголовок с точностью до секунды: всё остальное правилось раньше
+        past = timezone.now() - timedelta(minutes=1)
+        for model in (Recipe, User, Ingredient):
+            model.objects.update(updated_at=past)
+        ingredient_index.invalidate()
+        url = f'/api/recipes/{self.recipe.id}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.ingredient.name = 'перец чёрный'
+        self.ingredient.save()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Last-Modified'],
+            http_date(self.ingredient.updated_at.timestamp()),
+        )
+        self.assertEqual(
+            response.data['ingredients'][0]['name'], 'перец чёрный'
+        )
+
+    def test_ingredients_not_modified(self):
+        url = '/api/ingredients/?name=пер'
+        etag = self.get_etag(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(etag, self.get_etag('/api/ingredients/'))
+
+    def test_user_etag_follows_subscription(self):
+        author = User.objects.create_user(
+            email='other@example.com',
+            username='other',
+            first_name='Другой',
+            last_name='Автор',
+            password='password',
+        )
+        url = f'/api/users/{author.id}/'
+        etag = self.get_etag(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Subscription.objects.create(user=self.user, subscribed_to=author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'page-cache-test',
+    },
+    'page_generations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'page-generations-test',
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens-test',
+    },
+})
+class AnonymousPageCacheTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cached@example.com',
+            username='cached',
+            first_name='Кэш',
+            last_name='Анонимный',
+            password='password',
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='мука',
+            measurement_unit='г'
+        )
+        cls.recipes = []
+        for i in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f'рецепт {i}',
+                image='recipes/images/test.png',
+                text='описание',
+                cooking_time=10,
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe,
+                ingredient=cls.ingredient,
+                amount=5,
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        recipe_page_cache.cache.clear()
+        recipe_page_cache.shared.clear()
+        # Строки из setUpTestData не фиксируются, их рецепты остаются
+        # в наборе до первого перехваченного on_commit
+        pending.recipe_ids.clear()
+
+    def assertCached(self, url, hit, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'HIT' if hit else 'MISS')
+        return response
+
+    def test_hit_without_queries(self):
+        url = f'/api/recipes/{self.recipes[0].id}/'
+        missed = self.assertCached(url, hit=False)
+        with self.assertNumQueries(0):
+            hit = self.assertCached(url, hit=True)
+        self.assertEqual(hit.data, missed.data)
+        self.assertEqual(hit['ETag'], missed['ETag'])
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=missed['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            recipe_page_cache.stats(), {'hits': 2, 'misses': 1}
+        )
+
+    def test_keyed_on_query_params(self):
+        self.assertCached('/api/recipes/', hit=False, limit=1)
+        self.assertCached('/api/recipes/', hit=False, limit=2)
+        self.assertCached('/api/recipes/', hit=True, limit=1)
+
+    def test_authenticated_bypass(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('X-Cache', response)
+
+    def test_recipe_change_invalidates_only_its_detail(self):
+        changed, untouched = (
+            f'/api/recipes/{recipe.id}/' for recipe in self.recipes
+        )
+        for url in ('/api/recipes/', changed, untouched):
+            self.assertCached(url, hit=False)
+        RecipeIngredient.objects.filter(recipe=self.recipes[0]).update(
+            amount=7
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.get(recipe=self.recipes[0]).save()
+        response = self.assertCached(changed, hit=False)
+        self.assertEqual(response.data['ingredients'][0]['amount'], 7)
+        self.assertCached('/api/recipes/', hit=False)
+        self.assertCached(untouched, hit=True)
+
+    def test_catalog_change_invalidates_all_pages(self):
+        urls = [
+            '/api/recipes/',
+            *(f'/api/recipes/{recipe.id}/' for recipe in self.recipes),
+        ]
+        for url in urls:
+            self.assertCached(url, hit=False)
+        self.ingredient.name = 'мука пшеничная'
+        self.ingredient.save()
+        for url in urls:
+            self.assertCached(url, hit=False)
+        response = self.assertCached(urls[1], hit=True)
+        self.assertEqual(
+            response.data['ingredients'][0]['name'], 'мука пшеничная'
+        )
+
+    def test_delete_invalidates_list(self):
+        self.assertCached('/api/recipes/', hit=False)
+        self.recipes[1].delete()
+        response = self.assertCached('/api/recipes/', hit=False)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_stats_command(self):
+        self.assertCached('/api/recipes/', hit=False)
+        self.assertCached('/api/recipes/', hit=True)
+        out = io.StringIO()
+        call_command('page_cache_stats', '--reset', stdout=out)
+        self.assertIn('hits: 1, misses: 1', out.getvalue())
+        self.assertEqual(
+            recipe_page_cache.stats(), {'hits': 0, 'misses': 0}
+        )
+
+
+@override_settings(ROOT_URLCONF='foodgram_config.asgi_urls')
+class AsyncReadViewsTest(APITestCase):
+    """Async-представления ASGI отвечают так же, как синхронные вьюсеты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                email=f'{name}@example.com',
+                username=name,
+                first_name='Асинхронный',
+                last_name=name,
+                password='password',
+            )
+            for name in ('async-reader', 'async-author')
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.ingredient = Ingredient.objects.create(
+            name='сахар',
+            measurement_unit='г'
+        )
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f'рецепт {i}',
+                image='recipes/images/test.png',
+                text='описание',
+                cooking_time=10,
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe,
+                ingredient=cls.ingredient,
+                amount=i + 1,
+            )
+        cls.recipe = recipe
+        Subscription.objects.create(user=cls.user, subscribed_to=cls.author)
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        add_to_shopping_list(cls.user.id, recipe.id)
+
+    def setUp(self):
+        recipe_page_cache.cache.clear()
+        recipe_page_cache.shared.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    @sync_to_async
+    def sync_get(self, url, data=None):
+        with override_settings(ROOT_URLCONF='foodgram_config.urls'):
+            response = self.client.get(url, data)
+        if response.streaming:
+            # файл читается из курсора, поэтому дочитываем его здесь же
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def async_get(self, url, data=None, anonymous=False, headers=None):
+        headers = dict(headers or {})
+        if not anonymous:
+            headers['Authorization'] = f'Token {self.token}'
+        return self.async_client.get(url, data, headers=headers)
+
+    async def assertSameAsSync(self, url, data=None):
+        expected = await self.sync_get(url, data)
+        response = await self.async_get(url, data)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        return response
+
+    async def test_recipes(self):
+        await self.assertSameAsSync('/api/recipes/', {'limit': 2})
+        await self.assertSameAsSync(
+            '/api/recipes/', {'pagination': 'cursor', 'limit': 2}
+        )
+        await self.assertSameAsSync(
+            '/api/recipes/', {'is_favorited': 1, 'author': self.author.id}
+        )
+        response = await self.assertSameAsSync(
+            f'/api/recipes/{self.recipe.id}/'
+        )
+        self.assertTrue(response.json()['is_in_shopping_cart'])
+
+    async def test_recipe_not_modified(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        response = await self.async_get(url)
+        response = await self.async_get(
+            url, headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_anonymous_page_cache(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        missed = await self.async_get(url, anonymous=True)
+        hit = await self.async_get(url, anonymous=True)
+        self.assertEqual(
+            (missed['X-Cache'], hit['X-Cache']), ('MISS', 'HIT')
+        )
+        self.assertEqual(hit.json(), missed.json())
+
+    async def test_missing_recipe(self):
+        response = await self.async_get('/api/recipes/0/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_ingredients(self):
+        await self.assertSameAsSync('/api/ingredients/', {'name': 'сах'})
+
+    async def test_subscriptions(self):
+        await self.assertSameAsSync(
+            '/api/users/subscriptions/', {'recipes_limit': 1}
+        )
+        response = await self.async_get(
+            '/api/users/subscriptions/', anonymous=True
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_shopping_list_download(self):
+        url = '/api/recipes/download_shopping_cart/'
+        for file_format in ('txt', 'csv'):
+            expected = await self.sync_get(url, {'format': file_format})
+            response = await self.async_get(url, {'format': file_format})
+            self.assertEqual(
+                b''.join([chunk async for chunk in response]),
+                expected.body,
+            )
+        response = await self.async_get(url, {'format': 'doc'})
+        self.assertEqual(response.status_code, 400)
+        with override_settings(SHOPPING_LIST_PDF_FONT='/nonexistent.ttf'):
+            response = await self.async_get(url, {'format': 'pdf'})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.streaming)
+
+    async def test_shopping_list_streams_by_blocks(self):
+        rendered = []
+
+        def render(recipes, ingredients, created):
+            for i in range(3):
+                rendered.append(i)
+                yield 'x' * shopping_list.CHUNK_SIZE
+
+        formats = {'txt': (render, 'text/plain')}
+        with mock.patch.dict(shopping_list.SHOPPING_LIST_FORMATS, formats):
+            content, _ = await shopping_list.aexport_shopping_list(
+                self.user, 'txt', None
+            )
+            self.assertEqual(rendered, [])
+            await anext(content)
+            self.assertEqual(rendered, [0])
+            self.assertEqual(len([chunk async for chunk in content]), 2)
+        self.assertEqual(rendered, [0, 1, 2])
+
+    async def test_writes_fall_back_to_viewset(self):
+        response = await self.async_client.delete(
+            f'/api/recipes/{self.recipe.id}/',
+            headers={'Authorization': f'Token {self.token}'},
+        )
+        # рецепт чужой: проверку прав делает синхронный вьюсет
+        self.assertEqual(response.status_code, 403)
+
+
+class SQLiteProfileTest(APITestCase):
+
+    def test_pragmas_applied_to_connection(self):
+        # synchronous=NORMAL читается как 1
+        expected = {
+            'synchronous': 1,
+            'cache_size': -64000,
+            'busy_timeout': 5000,
+        }
+        with connection.cursor() as cursor:
+            for pragma, value in expected.items():
+                cursor.execute(f'PRAGMA {pragma}')
+                self.assertEqual(cursor.fetchone()[0], value, pragma)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class SeedFoodgramTest(APITestCase):
+
+    def seed(self, **options):
+        call_command(
+            'seed_foodgram',
+            users=20,
+            ingredients=100,
+            recipes=40,
+            min_ingredients=5,
+            max_ingredients=12,
+            stdout=io.StringIO(),
+            **options,
+        )
+
+    def test_volumes_and_consistency(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Ingredient.objects.count(), 100)
+        self.assertEqual(Recipe.objects.count(), 40)
+        for recipe in Recipe.objects.all():
+            self.assertTrue(5 <= recipe.recipe_ingredients.count() <= 12)
+        self.assertFalse(
+            Subscription.objects.filter(
+                user=models.F('subscribed_to')
+            ).exists()
+        )
+        self.assertTrue(ShoppingCart.objects.exists())
+        call_command(
+            'rebuild_shopping_lists', verify=True, stdout=io.StringIO()
+        )
+
+    def test_same_seed_same_data(self):
+        self.seed(seed=7)
+        first = list(
+            RecipeIngredient.objects.order_by('id')
+            .values_list('ingredient__name', 'amount')
+        )
+        RecipeIngredient.objects.all().delete()
+        Recipe.objects.all().delete()
+        Ingredient.objects.all().delete()
+        User.objects.all().delete()
+        self.seed(seed=7)
+        self.assertEqual(
+            list(
+                RecipeIngredient.objects.order_by('id')
+                .values_list('ingredient__name', 'amount')
+            ),
+            first,
+        )
+
+
+@override_settings(SQL_BUDGET_SAMPLE_RATE=1)
+class SQLBudgetTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='budget-staff@example.com',
+            username='budget-staff',
+            first_name='Бюджет',
+            last_name='Служебный',
+            password='password',
+            is_staff=True,
+        )
+        cls.staff_token = Token.objects.create(user=cls.staff)
+        cls.user = User.objects.create_user(
+            email='budget@example.com',
+            username='budget',
+            first_name='Бюджет',
+            last_name='Тестовый',
+            password='password',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        for i in range(8):
+            author = User.objects.create_user(
+                email=f'budget-author{i}@example.com',
+                username=f'budget-author{i}',
+                first_name='Автор',
+                last_name=str(i),
+                password='password',
+            )
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'рецепт {i}',
+                image='recipes/images/test.png',
+                text='описание',
+                cooking_time=10,
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100
+            )
+        cls.recipe = recipe
+        Subscription.objects.create(user=cls.user, subscribed_to=author)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_headers(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.staff_token.key}'
+        )
+        with recording() as recorder:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-DB-Queries'], str(recorder.count))
+        self.assertEqual(response['X-DB-Duplicates'], '0')
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;dur=[\d.]+;desc="{recorder.count} queries"$'
+        )
+        self.assertIn('X-DB-Time', response)
+        self.assertIn('X-DB-Slowest', response)
+
+    @override_settings(DEBUG=True)
+    def test_headers_in_debug(self):
+        response = self.client.get('/api/recipes/')
+        self.assertIn('X-DB-Queries', response)
+
+    def test_headers_hidden_from_users(self):
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('X-DB-Queries', response)
+        self.assertNotIn('Server-Timing', response)
+        self.client.credentials()
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('X-DB-Queries', response)
+
+    @override_settings(SQL_BUDGET_HEADERS=False, DEBUG=True)
+    def test_headers_disabled(self):
+        response = self.client.get('/api/recipes/')
+        self.assertNotIn('X-DB-Queries', response)
+
+    @override_settings(SQL_BUDGET_SAMPLE_RATE=0)
+    def test_unsampled_request_not_recorded(self):
+        with self.assertNoLogs('foodgram.sql_budget'):
+            with override_settings(SQL_BUDGET_MAX_QUERIES=0):
+                response = self.client.get('/api/recipes/')
+        self.assertNotIn('X-DB-Queries', response)
+
+    @override_settings(SQL_BUDGET_MAX_QUERIES=1)
+    def test_over_budget_logged(self):
+        with self.assertLogs('foodgram.sql_budget', 'WARNING') as logs:
+            self.client.get('/api/recipes/')
+        self.assertIn('GET /api/recipes/', logs.output[0])
+
+    def test_duplicates_reported(self):
+        with self.assertRaisesMessage(AssertionError, 'повторов 2 > 0'):
+            with assert_sql_budget():
+                for recipe in Recipe.objects.all()[:3]:
+                    recipe.recipe_ingredients.count()
+
+    def test_endpoint_budgets(self):
+        budgets = {
+            '/api/users/': 3,
+            f'/api/users/{self.user.id}/': 1,
+            '/api/users/me/': 1,
+            '/api/users/subscriptions/': 3,
+            '/api/recipes/': 4,
+            f'/api/recipes/{self.recipe.id}/': 2,
+            '/api/ingredients/': 1,
+        }
+        for url, queries in budgets.items():
+            with self.subTest(url=url):
+                with assert_sql_budget(queries):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(ROOT_URLCONF='foodgram_config.asgi_urls')
+    async def test_async_view_recorded(self):
+        response = await self.async_client.get(
+            '/api/recipes/',
+            headers={'Authorization': f'Token {self.staff_token.key}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+    @override_settings(ROOT_URLCONF='foodgram_config.asgi_urls')
+    async def test_async_view_hides_headers_from_users(self):
+        response = await self.async_client.get(
+            '/api/recipes/',
+            headers={'Authorization': f'Token {self.token.key}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-DB-Queries', response)
+
+
+class RecipeSearchTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='search@example.com',
+            username='search',
+            first_name='Поиск',
+            last_name='Тестовый',
+            password='password',
+        )
+        ingredient = Ingredient.objects.create(
+            name='свёкла', measurement_unit='г'
+        )
+        cls.borsch = cls.create_recipe(
+            'Борщ со свёклой', 'Сварить бульон, добавить <b>капусту</b>.'
+        )
+        cls.salad = cls.create_recipe(
+            'Салат', 'Отварную свеклу натереть, добавить чеснок.'
+        )
+        cls.soup = cls.create_recipe('Суп', 'Картофель и морковь.')
+        for recipe in (cls.borsch, cls.salad, cls.soup):
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+
+    @classmethod
+    def create_recipe(cls, name, text):
+        return Recipe.objects.create(
+            author=cls.author,
+            name=name,
+            image='recipes/images/test.png',
+            text=text,
+            cooking_time=10,
+        )
+
+    def search(self, query):
+        response = self.client.get(self.url, {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def ids(self, query):
+        return [recipe['id'] for recipe in self.search(query)]
+
+    def test_ranked_by_relevance(self):
+        # Совпадение в названии выше, чем в описании; «ё» равна «е»
+        self.assertEqual(self.ids('свекла'), [self.borsch.id, self.salad.id])
+        self.assertEqual(self.ids('СВЁК'), [self.borsch.id, self.salad.id])
+        self.assertEqual(self.ids('свекла чеснок'), [self.salad.id])
+        self.assertEqual(self.ids('ананас'), [])
+
+    def test_highlight_escaped(self):
+        results = self.search('капуст')
+        self.assertEqual(
+            results[0]['highlight'],
+            {
+                'name': 'Борщ со свёклой',
+                'text': (
+                    'Сварить бульон, добавить &lt;b&gt;'
+                    '<mark>капусту</mark>&lt;/b&gt;.'
+                ),
+            },
+        )
+        self.assertNotIn('highlight', self.client.get(self.url).data[
+            'results'
+        ][0])
+
+    def test_index_follows_changes(self):
+        self.soup.name = 'Свекольник'
+        self.soup.save()
+        self.assertIn(self.soup.id, self.ids('свекольник'))
+        self.borsch.delete()
+        self.assertEqual(self.ids('борщ'), [])
+        created = Recipe.objects.bulk_create([
+            Recipe(
+                author=self.author,
+                name='Борщ зелёный',
+                image='recipes/images/test.png',
+                text='Щавель.',
+                cooking_time=10,
+            )
+        ])
+        self.assertEqual(self.ids('щавель'), [created[0].id])
+
+    def test_combined_with_filters(self):
+        self.assertEqual(
+            self.ids('свекла'),
+            [
+                recipe['id'] for recipe in self.client.get(
+                    self.url, {'search': 'свекла', 'author': self.author.id}
+                ).data['results']
+            ],
+        )
+        self.assertEqual(self.client.get(
+            self.url, {'search': 'свекла', 'is_favorited': 1}
+        ).data['count'], 0)
+
+    def test_query_syntax_is_not_interpreted(self):
+        for query in ('"', 'NOT', 'a OR b', '*', 'борщ" OR "суп'):
+            with self.subTest(query=query):
+                self.search(query)
+
+    @override_settings(RECIPE_SEARCH_FTS=False)
+    def test_fallback_without_fts(self):
+        self.salad.name = 'Salad'
+        self.salad.text = 'Beetroot and garlic, plus beet leaves.'
+        self.salad.save()
+        self.soup.text = 'Soup with beet.'
+        self.soup.save()
+        self.soup.name = 'Beet soup'
+        self.soup.save()
+        self.assertEqual(self.ids('beet'), [self.soup.id, self.salad.id])
+        self.assertEqual(
+            self.search('garlic')[0]['highlight']['text'],
+            'Beetroot and <mark>garlic</mark>, plus beet leaves.',
+        )
+
+    @override_settings(RECIPE_SEARCH_FTS=False)
+    def test_fallback_folds_cyrillic(self):
+        self.assertEqual(self.ids('СВЁК'), [self.borsch.id, self.salad.id])
+        self.assertEqual(self.ids('БОРЩ'), [self.borsch.id])
+        self.assertEqual(self.ids('свекла чеснок'), [self.salad.id])
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            email='search-admin@example.com',
+            username='search-admin',
+            first_name='Админ',
+            last_name='Тестовый',
+            password='password',
+        )
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/admin/recipes/recipe/', {'q': 'свекла'}
+            )
+        self.assertContains(response, 'Салат')
+        self.assertNotContains(response, 'Суп')
+        self.assertTrue(any(
+            'MATCH' in query['sql'] for query in queries.captured_queries
+        ))
+
+    @override_settings(ROOT_URLCONF='foodgram_config.asgi_urls')
+    async def test_async_list(self):
+        response = await self.async_client.get(
+            self.url, {'search': 'свекла'}
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [self.borsch.id, self.salad.id],
+        )
+        self.assertIn('<mark>', response.json()['results'][1][
+            'highlight'
+        ]['text'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipePantryTest(APITestCase):
+    url = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='pantry@example.com',
+            username='pantry',
+            first_name='Кладовая',
+            last_name='Тестовая',
+            password='password',
+        )
+        cls.flour, cls.egg, cls.milk, cls.sugar, cls.salt = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'яйцо', 'молоко', 'сахар', 'соль')
+        )
+        cls.pancakes = cls.create_recipe(cls.flour, cls.egg, cls.milk)
+        cls.omelette = cls.create_recipe(cls.egg, cls.milk)
+        cls.meringue = cls.create_recipe(cls.egg, cls.sugar)
+        cls.bread = cls.create_recipe(cls.flour, cls.salt)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def create_recipe(cls, *ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.author,
+            name='рецепт',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    def setUp(self):
+        # id рецептов повторяются между тестами после отката транзакций
+        pantry_index.invalidate()
+        recipe_page_cache.cache.clear()
+
+    def cook(self, *ingredients, **params):
+        response = self.client.get(self.url, {
+            'have': ','.join(str(ingredient.id) for ingredient in ingredients),
+            **params,
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            (
+                recipe['id'],
+                recipe['missing_ingredients'],
+                recipe['covered_ingredients'],
+            )
+            for recipe in response.data['results']
+        ]
+
+    def test_ranked_by_coverage(self):
+        self.assertEqual(
+            self.cook(self.egg, self.milk), [(self.omelette.id, 0, 2)]
+        )
+        self.assertEqual(
+            self.cook(self.egg, self.milk, missing_max=1),
+            [
+                (self.omelette.id, 0, 2),
+                (self.pancakes.id, 1, 2),
+                (self.meringue.id, 1, 1),
+            ],
+        )
+        self.assertEqual(
+            self.cook(self.flour, self.salt, self.sugar, missing_max=2),
+            [
+                (self.bread.id, 0, 2),
+                (self.meringue.id, 1, 1),
+                (self.pancakes.id, 2, 1),
+            ],
+        )
+
+    def test_without_have(self):
+        response = self.client.get(self.url, {'missing_max': 1})
+        self.assertEqual(response.data['count'], 4)
+        self.assertNotIn('missing_ingredients', response.data['results'][0])
+
+    def test_invalid_params(self):
+        for params in (
+            {'have': 'яйцо'},
+            {'have': self.egg.id, 'missing_max': -1},
+            {'have': self.egg.id, 'missing_max': 1000},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_unknown_ingredient(self):
+        self.assertEqual(
+            self.client.get(self.url, {'have': 10 ** 6}).data['count'], 0
+        )
+
+    @override_settings(PANTRY_MAX_RESULTS=1)
+    def test_limit_applies_after_filters(self):
+        other = User.objects.create_user(
+            email='other-pantry@example.com',
+            username='other-pantry',
+            first_name='Другая',
+            last_name='Кладовая',
+            password='password',
+        )
+        newer = self.create_recipe(self.egg, self.milk)
+        Recipe.objects.filter(pk=newer.pk).update(author=other)
+        self.assertEqual(
+            self.cook(self.egg, self.milk), [(newer.id, 0, 2)]
+        )
+        self.assertEqual(
+            self.cook(self.egg, self.milk, author=self.author.id),
+            [(self.omelette.id, 0, 2)],
+        )
+
+    def test_rebuild_replays_concurrent_changes(self):
+        pantry_index.ensure_built()
+        # Как при фоновой перестройке: правка приходит, пока снимок
+        # базы уже прочитан и ещё её не содержит
+        pantry_index.replay = []
+        pantry_index.set_recipe(self.bread.id, [self.flour.id, self.egg.id])
+        pantry_index.build()
+        self.assertIsNone(pantry_index.replay)
+        self.assertIn(
+            (self.bread.id, 0, 2),
+            pantry_index.find([self.flour.id, self.egg.id], 0, 10),
+        )
+
+    def test_index_follows_changes(self):
+        self.cook(self.egg)
+        self.client.force_authenticate(self.author)
+        response = self.client.post(self.url, {
+            'name': 'яичница',
+            'text': 'описание',
+            'cooking_time': 5,
+            'image': IMAGE,
+            'ingredients': [{'id': self.egg.id, 'amount': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        fried_egg = response.data['id']
+        response = self.client.patch(f'{self.url}{self.pancakes.id}/', {
+            'ingredients': [
+                {'id': self.egg.id, 'amount': 1},
+                {'id': self.milk.id, 'amount': 1},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.omelette.delete()
+        RecipeIngredient.objects.create(
+            recipe=self.meringue, ingredient=self.milk, amount=1
+        )
+        # Индекс не перестраивался: без перестройки это 3 запроса списка
+        with self.assertNumQueries(3):
+            found = self.cook(self.egg, self.milk)
+        self.assertEqual(
+            found, [(self.pancakes.id, 0, 2), (fried_egg, 0, 1)]
+        )
+        pantry_index.invalidate()
+        self.assertEqual(self.cook(self.egg, self.milk), found)
+
+    @override_settings(ROOT_URLCONF='foodgram_config.asgi_urls')
+    async def test_async_list(self):
+        response = await self.async_client.get(self.url, {
+            'have': f'{self.egg.id},{self.milk.id}',
+            'missing_max': 1,
+        })
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [self.omelette.id, self.pancakes.id, self.meringue.id],
+        )
@@ -1,5 +1,8 @@
-from django.conf import settings
-from django.db.models import F
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Count, Exists, F, OuterRef, Prefetch, Value, Window
+)
+from django.db.models.functions import RowNumber
 from rest_framework.response import Response
 from rest_framework import (
     response,
@@ -7,21 +10,36 @@ from rest_framework import (
     viewsets,
     authtoken
 )
-from django.db.models import Sum
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.files.storage import default_storage
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
-from hashids import Hashids
 
+from users.authentication import token_cache
 from users.models import Subscription, User
 from cart.models import ShoppingCart
-from recipes.models import Recipe, Favorite, RecipeIngredient
+from cart.services import (
+    add_recipes_to_shopping_list,
+    add_to_shopping_list,
+    remove_from_shopping_list,
+    remove_recipes_from_shopping_list,
+)
+from cart.shopping_list import (
+    SHOPPING_LIST_FORMATS,
+    ExportUnavailable,
+    export_shopping_list,
+    get_filename,
+)
+from feed.models import FeedItem
+from feed.services import add_author_to_feed, remove_author_from_feed
+from recipes.models import Recipe, Favorite, RecipeIngredient, SimilarRecipe
+from recipes.search import search_terms
 from ingredients.models import Ingredient
+from ingredients.search import ingredient_index
 from api.serializers import (
     UserCreateSerializer,
     CustomUserSerializer,
@@ -33,21 +51,62 @@ from api.serializers import (
     SubscribeSerializer,
     SubscribeCreateSerializer
 )
-from api.recipes_serializers import RecipeSerializer
+from api.recipes_serializers import RecipeIdsSerializer, RecipeSerializer
 from api.shorts_serializers import RecipeShortSerializer
-from foodgram_config.paginations import UserPagination, RecipePagination
+from foodgram_config.paginations import (
+    KeysetPagination, RecipePagination, UserPagination
+)
+from foodgram_config.conditional import (
+    ConditionalGetMixin, is_conditional, make_etag
+)
 from foodgram_config.filters import IngredientFilter
+from foodgram_config.images import delete_variants
+from foodgram_config.negotiation import FileDownloadNegotiation
+from foodgram_config.page_cache import recipe_page_cache
 from foodgram_config.recipes_filters import RecipeFilter
 from foodgram_config.permissions import IsAuthorOrReadOnly
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     pagination_class = UserPagination
     http_method_names = [
         'get', 'post', 'put', 'patch', 'delete'
     ]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if (
+            self.action not in ('list', 'retrieve')
+            or not user.is_authenticated
+        ):
+            return queryset
+        return queryset.annotate(
+            is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=user,
+                    subscribed_to=OuterRef('pk')
+                )
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        not_modified = self.conditional_response(
+            request,
+            make_etag(
+                instance.id,
+                instance.updated_at,
+                getattr(instance, 'is_subscribed', False),
+            ),
+            instance.updated_at,
+        )
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        return response.Response(serializer.data)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -64,19 +123,18 @@ class UserViewSet(viewsets.ModelViewSet):
             )
 
         if request.method == 'POST':
-            if Subscription.objects.filter(
-                    user=request.user,
-                    subscribed_to=author_of_sub
-            ).exists():
+            try:
+                with transaction.atomic():
+                    Subscription.objects.create(
+                        user=request.user,
+                        subscribed_to=author_of_sub
+                    )
+                    add_author_to_feed(request.user.id, author_of_sub.id)
+            except IntegrityError:
                 return Response(
                     {'errors': 'sub is already'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-
-            Subscription.objects.create(
-                user=request.user,
-                subscribed_to=author_of_sub
-            )
             serializer = SubscribeSerializer(
                 author_of_sub,
                 context={'request': request}
@@ -87,18 +145,21 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_201_CREATED
             )
         else:
+            with transaction.atomic():
+                deleted, _ = Subscription.objects.filter(
+                    user=request.user,
+                    subscribed_to=author_of_sub
+                ).delete()
+                if deleted:
+                    remove_author_from_feed(
+                        request.user.id, author_of_sub.id
+                    )
 
-            subscription = Subscription.objects.filter(
-                user=request.user,
-                subscribed_to=author_of_sub
-            ).first()
-
-            if not subscription:
+            if not deleted:
                 return Response(
                     {'errors': 'sub is Null'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            subscription.delete()
 
             return Response(
                 status=status.HTTP_204_NO_CONTENT
@@ -111,10 +172,15 @@ class UserViewSet(viewsets.ModelViewSet):
         url_path='subscriptions',
     )
     def subscriptions(self, request):
-        subs_list = User.objects.filter(
-            users_subscribers__user=request.user
-        )
+        subs_list = self.get_subscriptions_queryset()
         page = self.paginate_queryset(subs_list)  # страничка
+        self.attach_page_recipes(
+            page,
+            self.get_page_recipes(
+                page,
+                request.query_params.get('recipes_limit')
+            )
+        )
         serializer = self.get_serializer(
             page,
             many=True
@@ -124,6 +190,45 @@ class UserViewSet(viewsets.ModelViewSet):
             serializer_data
         )
 
+    def get_subscriptions_queryset(self):
+        return User.objects.filter(
+            users_subscribers__user=self.request.user
+        ).annotate(
+            recipes_count=Count('recipes', distinct=True),
+            is_subscribed=Value(True),
+        ).order_by('id')
+
+    @staticmethod
+    def get_page_recipes(authors, limit):
+        """Рецепты всех авторов страницы одним запросом.
+
+        Первые ``limit`` рецептов каждого автора отбираются оконной
+        функцией ROW_NUMBER по автору.
+        """
+        recipes = Recipe.objects.filter(author__in=authors)
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = None
+        if limit and limit > 0:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    order_by=[F('pub_date').desc(), F('id').desc()],
+                )
+            ).filter(row_number__lte=limit)
+        return recipes
+
+    @staticmethod
+    def attach_page_recipes(authors, recipes):
+        """Раскладывает рецепты по авторам в ``page_recipes``."""
+        by_author = {author.id: [] for author in authors}
+        for recipe in recipes:
+            by_author[recipe.author_id].append(recipe)
+        for author in authors:
+            author.page_recipes = by_author[author.id]
+
     def get_serializer_class(self):
         if self.action == 'create':
             return UserCreateSerializer
@@ -199,6 +304,7 @@ class UserViewSet(viewsets.ModelViewSet):
         if request.user.avatar:
             try:
                 name = request.user.avatar.name
+                delete_variants(request.user.avatar)
                 if default_storage.exists(name):
                     default_storage.delete(name)
             except Exception:
@@ -223,19 +329,47 @@ class UserViewSet(viewsets.ModelViewSet):
         )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filterset_class = IngredientFilter
     filter_backends = [DjangoFilterBackend]
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name', '')
+        # Каталог и автодополнение обслуживаются индексом в памяти,
+        # валидатор — версия каталога, без запроса к БД
+        not_modified = self.conditional_response(
+            request, make_etag(ingredient_index.version, name)
+        )
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(
+            ingredient_index.search(name),
+            many=True
+        )
+        return response.Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        not_modified = self.conditional_response(
+            request,
+            make_etag(instance.id, instance.updated_at),
+            instance.updated_at,
+        )
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        return response.Response(serializer.data)
+
 
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        request.user.auth_token.delete()
+        token_cache.evict(request.auth.key)
+        request.auth.delete()
         return response.Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -266,10 +400,7 @@ class ObtainAuthToken(APIView):
         )
 
 
-hashids = Hashids(salt=settings.SECRET_KEY, min_length=6)
-
-
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [
@@ -279,11 +410,159 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = RecipePagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    # Действия, которые отдают RecipeSerializer целиком:
+    # для них автор и ингредиенты подгружаются заранее
+    serialized_actions = (
+        'list', 'retrieve', 'create', 'update', 'partial_update', 'feed'
+    )
+    select_related_plan = ('author',)
+    prefetch_plan = (
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+    )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.serialized_actions:
+            return queryset
+        queryset = queryset.select_related(
+            *self.select_related_plan
+        ).prefetch_related(
+            *self.prefetch_plan
+        )
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        # Флаги зрителя считаются подзапросами в том же SELECT,
+        # сериализаторы читают их вместо отдельных EXISTS на каждую строку
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(
+                    user=user,
+                    recipe=OuterRef('pk')
+                )
+            ),
+            author_is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=user,
+                    subscribed_to=OuterRef('author')
+                )
+            ),
+        )
+
+    def get_recipe_validators(
+            self, recipes, envelope=None, catalog_version=None
+    ):
+        """ETag и Last-Modified для набора рецептов.
+
+        В ETag входят версии рецептов и авторов, флаги зрителя
+        и версия каталога ингредиентов (названия берутся из него).
+        Last-Modified учитывает и последнюю правку каталога.
+        """
+        if catalog_version is None:
+            catalog_version = ingredient_index.version
+        etag = make_etag(
+            catalog_version,
+            envelope,
+            [
+                (
+                    recipe.id,
+                    recipe.updated_at,
+                    recipe.author.updated_at,
+                    getattr(recipe, 'is_favorited', False),
+                    getattr(recipe, 'is_in_shopping_cart', False),
+                    getattr(recipe, 'author_is_subscribed', False),
+                )
+                for recipe in recipes
+            ],
+        )
+        last_modified = max(
+            (
+                max(recipe.updated_at, recipe.author.updated_at)
+                for recipe in recipes
+            ),
+            default=None
+        )
+        _, catalog_updated_at = catalog_version
+        if last_modified and catalog_updated_at:
+            last_modified = max(last_modified, catalog_updated_at)
+        return etag, last_modified
+
+    def get_page_envelope(self):
+        data = self.paginator.get_paginated_response([]).data
+        # Подсветка и число недостающих ингредиентов зависят от запроса,
+        # а не только от рецептов страницы
+        data['query'] = sorted(self.request.query_params.lists())
+        return sorted(
+            (key, value) for key, value in data.items() if key != 'results'
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            # Подсветка совпадений в ответе на поиск
+            context['search_terms'] = search_terms(
+                self.request.query_params.get('search')
+            )
+        return context
+
+    @recipe_page_cache.cache_anonymous
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not is_conditional(request):
+            page = self.paginate_queryset(queryset)
+            etag, _ = self.get_recipe_validators(
+                page, self.get_page_envelope()
+            )
+            self.validators = (etag, None)
+        else:
+            # Сначала сверяем валидаторы по облегчённой выборке страницы,
+            # ингредиенты и полные строки читаются только при изменениях
+            stubs = self.paginate_queryset(
+                queryset.prefetch_related(None).only(
+                    'id', 'pub_date', 'updated_at',
+                    'author', 'author__updated_at',
+                )
+            )
+            # Удаление рецепта не двигает Last-Modified, поэтому
+            # страница ленты валидируется только по ETag
+            etag, _ = self.get_recipe_validators(
+                stubs, self.get_page_envelope()
+            )
+            not_modified = self.conditional_response(request, etag)
+            if not_modified is not None:
+                return not_modified
+            recipes = queryset.in_bulk([stub.id for stub in stubs])
+            page = [recipes[stub.id] for stub in stubs]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @recipe_page_cache.cache_anonymous
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        not_modified = self.conditional_response(
+            request, *self.get_recipe_validators([instance])
+        )
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        return response.Response(serializer.data)
 
     def perform_create(self, serializer):
         recipe = serializer.save(author=self.request.user)
-        recipe.short_code = hashids.encode(recipe.id)
-        recipe.save()
+        serializer.instance = self.get_queryset().get(pk=recipe.pk)
+
+    def perform_update(self, serializer):
+        recipe = serializer.save()
+        serializer.instance = self.get_queryset().get(pk=recipe.pk)
 
     @action(
         detail=True,
@@ -301,59 +580,79 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     @action(
-        detail=True,
-        methods=["post"],
-        url_name="favorite",
-        permission_classes=[
-            IsAuthenticated
-        ],
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
     )
-    def favorite(self, request, pk=None):
-        recipe = get_object_or_404(
-            Recipe,
-            id=pk
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые первыми, по курсору.
+
+        Страница — один проход по индексу ленты FeedItem от курсора,
+        затем рецепты страницы по первичному ключу.
+        """
+        paginator = KeysetPagination()
+        items = paginator.paginate_queryset(
+            FeedItem.objects.filter(
+                user=request.user
+            ).only('id', 'recipe_id', 'pub_date'),
+            request,
+            self,
         )
-        instance, created = Favorite.objects.get_or_create(
-            user=request.user,
-            recipe=recipe
+        recipes = self.get_queryset().in_bulk(
+            [item.recipe_id for item in items]
         )
-
-        if not created:
-            return response.Response(
-                {"errors": "Fav is already"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        serializer = RecipeShortSerializer(
-            recipe,
-            context={'request': request}
-        )
-        serializer_data = serializer.data
-        return response.Response(
-            serializer_data,
-            status=status.HTTP_201_CREATED
+        serializer = self.get_serializer(
+            [
+                recipes[item.recipe_id] for item in items
+                if item.recipe_id in recipes
+            ],
+            many=True,
         )
+        return paginator.get_paginated_response(serializer.data)
 
     @action(
         detail=True,
-        methods=["post"],
-        url_name="shopping_cart",
-        permission_classes=[IsAuthenticated],
+        methods=['get'],
     )
-    def shopping_cart(self, request, pk=None):
-        # Вынести в общее, с фаворитом
+    def similar(self, request, pk=None):
+        """Похожие по составу рецепты из предрассчитанных соседей."""
+        links = list(
+            SimilarRecipe.objects.filter(
+                recipe_id=pk
+            ).select_related('similar').order_by('-score', 'similar_id')
+        )
+        if not links:
+            get_object_or_404(Recipe, pk=pk)
+        data = RecipeShortSerializer(
+            [link.similar for link in links],
+            many=True,
+            context={'request': request},
+        ).data
+        for item, link in zip(data, links):
+            item['similarity'] = round(link.score, 4)
+        return response.Response(data)
+
+    def add_recipe_relation(self, model, request, pk, error, on_added=None):
+        """Добавляет рецепт в избранное или корзину одним INSERT.
+
+        Повторное добавление ловится уникальным ограничением модели,
+        ``on_added`` выполняется в той же транзакции.
+        """
         recipe = get_object_or_404(
             Recipe,
             id=pk
         )
-        instance, created = ShoppingCart.objects.get_or_create(
-            user=request.user,
-            recipe=recipe
-        )
-
-        if not created:
+        try:
+            with transaction.atomic():
+                model.objects.create(
+                    user=request.user,
+                    recipe=recipe
+                )
+                if on_added:
+                    on_added(request.user.id, recipe.id)
+        except IntegrityError:
             return response.Response(
-                {"errors": f"Рецепт корзине уже есть"},
+                {"errors": error},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
@@ -366,96 +665,175 @@ class RecipeViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
 
-    @favorite.mapping.delete
-    def remove_from_favorite(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        cou, arg = Favorite.objects.filter(
-            user=request.user,
-            recipe=recipe
-        ).delete()
-        if cou == 0:
+    def remove_recipe_relation(
+            self, model, request, pk, error, on_removed=None
+    ):
+        """Удаляет рецепт из избранного или корзины одним DELETE."""
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                user=request.user,
+                recipe_id=pk
+            ).delete()
+            if deleted and on_removed:
+                on_removed(request.user.id, pk)
+        if not deleted:
+            get_object_or_404(Recipe, pk=pk)
             return response.Response(
-                {'errors': "fav is null"},
+                {'errors': error},
                 status=status.HTTP_400_BAD_REQUEST,
             )
         return response.Response(status=status.HTTP_204_NO_CONTENT)
 
+    def change_recipe_relations(
+            self, model, request, on_added=None, on_removed=None
+    ):
+        """Добавляет (POST) или убирает (DELETE) несколько рецептов.
+
+        Существование рецептов и их наличие у пользователя проверяются
+        одним SELECT, запись — один INSERT или один DELETE, поэтому число
+        запросов не зависит от длины списка. Статус каждого id:
+        added/exists или removed/absent, для чужих id — not_found.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        adding = request.method == 'POST'
+        with transaction.atomic():
+            present = dict(
+                Recipe.objects.filter(pk__in=recipe_ids).annotate(
+                    present=Exists(model.objects.filter(
+                        user=request.user, recipe=OuterRef('pk')
+                    ))
+                ).values_list('pk', 'present')
+            )
+            changed = [
+                recipe_id for recipe_id, is_present in present.items()
+                if is_present != adding
+            ]
+            if changed and adding:
+                model.objects.bulk_create(
+                    (
+                        model(user=request.user, recipe_id=recipe_id)
+                        for recipe_id in changed
+                    ),
+                    ignore_conflicts=True,
+                )
+                if on_added:
+                    on_added(request.user.id, changed)
+            elif changed:
+                model.objects.filter(
+                    user=request.user, recipe_id__in=changed
+                ).delete()
+                if on_removed:
+                    on_removed(request.user.id, changed)
+        done, skipped = (
+            ('added', 'exists') if adding else ('removed', 'absent')
+        )
+        changed = set(changed)
+        return response.Response({'results': [
+            {
+                'id': recipe_id,
+                'status': (
+                    'not_found' if recipe_id not in present
+                    else done if recipe_id in changed
+                    else skipped
+                ),
+            }
+            for recipe_id in recipe_ids
+        ]})
+
+    @action(
+        detail=True,
+        methods=["post"],
+        url_name="favorite",
+        permission_classes=[
+            IsAuthenticated
+        ],
+    )
+    def favorite(self, request, pk=None):
+        return self.add_recipe_relation(
+            Favorite, request, pk, "Fav is already"
+        )
+
+    @action(
+        detail=True,
+        methods=["post"],
+        url_name="shopping_cart",
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_cart(self, request, pk=None):
+        return self.add_recipe_relation(
+            ShoppingCart, request, pk, "Рецепт корзине уже есть",
+            on_added=add_to_shopping_list,
+        )
+
+    @favorite.mapping.delete
+    def remove_from_favorite(self, request, pk=None):
+        return self.remove_recipe_relation(
+            Favorite, request, pk, "fav is null"
+        )
+
     @shopping_cart.mapping.delete
     def remove_from_shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        c, *args = ShoppingCart.objects.filter(
-            user=request.user,
-            recipe=recipe
-        ).delete()
+        return self.remove_recipe_relation(
+            ShoppingCart, request, pk, "shop is null",
+            on_removed=remove_from_shopping_list,
+        )
 
-        if c == 0:
-            return response.Response(
-                {'errors': "shop is null"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_favorite(self, request):
+        return self.change_recipe_relations(Favorite, request)
 
-        return response.Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_shopping_cart(self, request):
+        return self.change_recipe_relations(
+            ShoppingCart, request,
+            on_added=add_recipes_to_shopping_list,
+            on_removed=remove_recipes_from_shopping_list,
+        )
 
     @action(
         detail=False,
         methods=["GET"],
         url_path="download_shopping_cart",
         permission_classes=[IsAuthenticated],
+        content_negotiation_class=FileDownloadNegotiation,
     )
     def export_shopping_list(self, request):
-        """Генерирует текстовый файл со списком покупок для авторизованного пользователя."""
-        current_time = timezone.now()
+        """Отдаёт файл со списком покупок авторизованного пользователя.
 
-        # Получаем рецепты из корзины пользователя
-        user_cart_recipes = Recipe.objects.filter(
-            shopping_cart__user=request.user
-        ).select_related('author').prefetch_related('recipe_ingredients__ingredient')
-
-        # Агрегируем ингредиенты с суммированием количества
-        aggregated_ingredients = (
-            RecipeIngredient.objects.filter(recipe__in=user_cart_recipes)
-            .values(
-                ingredient_name=F('ingredient__name'),
-                unit=F('ingredient__measurement_unit')
+        Формат выбирается параметром ``format``: txt (по умолчанию),
+        csv или pdf. Файл формируется по мере отдачи клиенту.
+        """
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return response.Response(
+                {'errors': f'Формат {file_format} не поддерживается'},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            .annotate(total=Sum('amount'))
-            .order_by('ingredient_name')
-        )
-
-        # Формируем содержимое файла
-        file_content = [
-            "=== Мой список покупок ===",
-            f"Создан: {current_time.strftime('%d.%m.%Y в %H:%M')}",
-            f"Количество рецептов: {user_cart_recipes.count()}",
-            f"Всего позиций: {aggregated_ingredients.count()}",
-            "",
-            "Необходимые ингредиенты:",
-        ]
-
-        # Добавляем ингредиенты с нумерацией
-        file_content.extend(
-            f"{i}. {item['ingredient_name'].title()} — {item['total']} {item['unit']}"
-            for i, item in enumerate(aggregated_ingredients, 1)
-        )
-
-        # Добавляем список рецептов
-        file_content.extend([
-            "",
-            "Рецепты в списке:",
-            *(
-                f"• {recipe.name} ({recipe.author.username})"
-                for recipe in user_cart_recipes
+        current_time = timezone.now()
+        try:
+            content, content_type = export_shopping_list(
+                request.user, file_format, current_time
             )
-        ])
-
-        # Создаем файловый ответ
-        response = HttpResponse(
-            content="\n".join(file_content),
-            content_type='text/plain; charset=utf-8'
+        except ExportUnavailable as error:
+            return response.Response(
+                {'errors': str(error)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        file_response = StreamingHttpResponse(
+            content,
+            content_type=content_type
         )
-        response['Content-Disposition'] = (
-            'attachment; '
-            f'filename="shopping_list_{current_time.strftime("%Y%m%d_%H%M")}.txt"'
+        file_response['Content-Disposition'] = (
+            f'attachment; filename="{get_filename(file_format, current_time)}"'
         )
-
-        return response
+        return file_response
@@ -0,0 +1,257 @@
+"""Пропускная способность чтения: синхронный WSGI против async ASGI.
+
+Оба приложения вызываются в одном процессе, без сетевого сервера:
+WSGI-приложение обслуживается пулом из ``--threads`` потоков (как
+gunicorn с gthread), ASGI-приложение — одним циклом событий. Каждый
+из ``--clients`` клиентов медленный: на приём каждого куска ответа
+уходит ``--client-delay`` секунд. В WSGI медленный клиент держит поток
+всё это время, в ASGI — только корутину.
+
+Для ASGI выводится пик числа потоков: Django заводит поток на каждый
+запрос под синхронные участки, но медленный клиент его не занимает,
+и очереди за фиксированным пулом нет.
+
+Запуск из каталога backend:
+
+    python -m benchmarks.async_reads --clients 200 --threads 8
+
+База — временная тестовая, заполняется случайными данными.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_config.settings')
+django.setup()
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    override_settings, setup_test_environment
+)
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from ingredients.models import Ingredient  # noqa: E402
+from recipes.models import Recipe, RecipeIngredient  # noqa: E402
+from users.models import Subscription, User  # noqa: E402
+
+ENDPOINTS = {
+    'recipes': '/api/recipes/',
+    'recipe': '/api/recipes/{recipe_id}/',
+    'ingredients': '/api/ingredients/',
+    'subscriptions': '/api/users/subscriptions/',
+    'download': '/api/recipes/download_shopping_cart/',
+}
+
+
+def seed(authors=20, recipes_per_author=10, ingredients=200):
+    """Данные для замеров; возвращает токен читателя и id рецепта."""
+    reader = User.objects.create_user(
+        email='reader@example.com',
+        username='reader',
+        first_name='Читатель',
+        last_name='Нагрузочный',
+        password='password',
+    )
+    catalog = Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+        for i in range(ingredients)
+    )
+    users = User.objects.bulk_create(
+        User(
+            email=f'author{i}@example.com',
+            username=f'author{i}',
+            first_name='Автор',
+            last_name=str(i),
+        )
+        for i in range(authors)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'рецепт {author.id}-{i}',
+            image='recipes/images/bench.png',
+            text='описание',
+            cooking_time=10,
+        )
+        for author in users
+        for i in range(recipes_per_author)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=catalog[(recipe.id * 7 + i) % len(catalog)],
+            amount=i + 1,
+        )
+        for recipe in recipes
+        for i in range(5)
+    )
+    Subscription.objects.bulk_create(
+        Subscription(user=reader, subscribed_to=author) for author in users
+    )
+    return Token.objects.create(user=reader).key, recipes[0].id
+
+
+def make_environ(path, token):
+    path, _, query = path.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'testserver',
+        'HTTP_AUTHORIZATION': f'Token {token}',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(),
+    }
+
+
+def run_wsgi(path, token, clients, requests, threads, delay):
+    application = get_wsgi_application()
+
+    def client(submitted):
+        latencies = []
+        # Первый запрос считается с постановки в очередь: ожидание
+        # свободного потока клиент тоже ощущает как задержку
+        started = submitted
+        for _ in range(requests):
+            status = []
+            body = application(
+                make_environ(path, token),
+                lambda code, headers, exc_info=None: status.append(code),
+            )
+            for _chunk in body:
+                time.sleep(delay)
+            if hasattr(body, 'close'):
+                body.close()
+            assert status[0].startswith('200'), status[0]
+            latencies.append(time.perf_counter() - started)
+            started = time.perf_counter()
+        return latencies
+
+    with override_settings(ROOT_URLCONF='foodgram_config.urls'):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = [
+                pool.submit(client, time.perf_counter())
+                for _ in range(clients)
+            ]
+            latencies = [
+                latency for result in results for latency in result.result()
+            ]
+        return time.perf_counter() - started, latencies, threads
+
+
+async def asgi_client(application, path, token, requests, delay):
+    path, _, query = path.partition('?')
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        status = []
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {token}'.encode()),
+            ],
+            'client': ('127.0.0.1', 50000),
+            'server': ('testserver', 80),
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body':
+                await asyncio.sleep(delay)
+
+        await application(scope, receive, send)
+        assert status[0] == 200, status[0]
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run_asgi(path, token, clients, requests, threads, delay):
+    application = get_asgi_application()
+    peak_threads = threading.active_count()
+
+    async def main():
+        nonlocal peak_threads
+        tasks = [
+            asyncio.create_task(
+                asgi_client(application, path, token, requests, delay)
+            )
+            for _ in range(clients)
+        ]
+        while not all(task.done() for task in tasks):
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.01)
+        return [latency for task in tasks for latency in task.result()]
+
+    with override_settings(ROOT_URLCONF='foodgram_config.asgi_urls'):
+        started = time.perf_counter()
+        latencies = asyncio.run(main())
+        return time.perf_counter() - started, latencies, peak_threads
+
+
+def report(name, elapsed, latencies, threads):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f'{name:<5} {len(latencies) / elapsed:>9.1f} req/s  '
+        f'p50 {statistics.median(latencies) * 1000:>7.1f} ms  '
+        f'p95 {p95 * 1000:>7.1f} ms  '
+        f'потоков {threads}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--endpoint', choices=ENDPOINTS, default='recipes')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--client-delay', type=float, default=0.2)
+    options = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        token, recipe_id = seed()
+        path = ENDPOINTS[options.endpoint].format(recipe_id=recipe_id)
+        print(
+            f'{path}: {options.clients} клиентов по {options.requests} '
+            f'запросов, задержка клиента {options.client_delay} с'
+        )
+        arguments = (
+            path, token, options.clients, options.requests,
+            options.threads, options.client_delay,
+        )
+        report('wsgi', *run_wsgi(*arguments))
+        report('asgi', *run_asgi(*arguments))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
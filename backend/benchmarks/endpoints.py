@@ -0,0 +1,522 @@
+"""Замеры всех маршрутов API с проверкой регрессий по базовой линии.
+
+Каждый маршрут из foodgram_config/urls.py (кроме админки и статики)
+прогоняется через тестовый клиент Django на данных seed_foodgram:
+для каждого запроса считаются перцентили задержки и число SQL-запросов.
+Итог сравнивается с benchmarks/baseline.json; скрипт завершается
+с кодом 1, если выросло число запросов или p95 вышел за допуск,
+а также если у маршрута нет сценария.
+
+Запуск из каталога backend:
+
+    python -m benchmarks.endpoints                    # проверка
+    python -m benchmarks.endpoints --update-baseline  # новая линия
+
+Время зависит от машины, поэтому базовую линию стоит снимать там же,
+где идёт проверка; число запросов от машины не зависит.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_config.settings')
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext, override_settings, setup_test_environment
+)
+from django.urls import URLPattern, get_resolver  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from cart.models import ShoppingCart  # noqa: E402
+from cart.services import add_to_shopping_list  # noqa: E402
+from feed.services import add_author_to_feed  # noqa: E402
+from recipes.models import Recipe  # noqa: E402
+from users.models import Subscription, User  # noqa: E402
+
+BASELINE = Path(__file__).with_name('baseline.json')
+# Маршруты, которые не замеряются: админка и раздача файлов
+SKIPPED_PREFIXES = ('admin/', 'media/', 'static/')
+IMAGE = (
+    'data:image/png;base64,'
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA'
+    '60e6kgAAAABJRU5ErkJggg=='
+)
+
+SCENARIOS = []
+
+
+def scenario(*url_names):
+    """Регистрирует сценарий, покрывающий маршруты ``url_names``."""
+    def register(function):
+        SCENARIOS.append((function, url_names))
+        return function
+    return register
+
+
+class Bench:
+    """Выполняет запросы сценариев и копит замеры по ключу запроса."""
+
+    def __init__(self, fixtures):
+        self.client = Client()
+        self.fixtures = fixtures
+        self.measure = True
+        self.samples = {}
+
+    def request(self, key, method, path, data=None, token=None,
+                anonymous=False):
+        headers = {}
+        if not anonymous:
+            token = token or self.fixtures['token']
+            headers['HTTP_AUTHORIZATION'] = f'Token {token}'
+        send = getattr(self.client, method.lower())
+        # Как timeit: паузы сборщика мусора не попадают в замер
+        gc.disable()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            if method == 'GET':
+                response = send(path, data, **headers)
+            else:
+                response = send(
+                    path, json.dumps(data or {}),
+                    content_type='application/json', **headers
+                )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        gc.enable()
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{key}: {response.status_code} {response.content[:200]}'
+            )
+        if self.measure:
+            timings, counts = self.samples.setdefault(key, ([], []))
+            timings.append(elapsed)
+            counts.append(len(queries))
+        return response
+
+    def get(self, path, data=None, **kwargs):
+        return self.request(f'GET {path}', 'GET', path, data, **kwargs)
+
+
+@scenario('api-root')
+def api_root(bench):
+    bench.get('/api/')
+
+
+@scenario('users-list')
+def users_list(bench):
+    bench.request('GET /api/users/', 'GET', '/api/users/', {'limit': 6})
+
+
+@scenario('users-detail')
+def users_detail(bench):
+    bench.request(
+        'GET /api/users/{id}/',
+        'GET', f'/api/users/{bench.fixtures["author"]}/'
+    )
+
+
+@scenario('users-me')
+def users_me(bench):
+    bench.get('/api/users/me/')
+
+
+@scenario('users-avatar')
+def users_avatar(bench):
+    bench.request(
+        'PUT /api/users/me/avatar/', 'PUT', '/api/users/me/avatar/',
+        {'avatar': IMAGE}
+    )
+    bench.request(
+        'DELETE /api/users/me/avatar/', 'DELETE', '/api/users/me/avatar/'
+    )
+
+
+@scenario('users-set-password')
+def users_set_password(bench):
+    passwords = (('password', 'password-2'), ('password-2', 'password'))
+    for current, new in passwords:
+        bench.request(
+            'POST /api/users/set_password/',
+            'POST', '/api/users/set_password/',
+            {'current_password': current, 'new_password': new},
+        )
+
+
+@scenario('users-subscribe')
+def users_subscribe(bench):
+    path = f'/api/users/{bench.fixtures["stranger"]}/subscribe/'
+    bench.request('POST /api/users/{id}/subscribe/', 'POST', path)
+    bench.request('DELETE /api/users/{id}/subscribe/', 'DELETE', path)
+
+
+@scenario('users-subscriptions')
+def users_subscriptions(bench):
+    bench.request(
+        'GET /api/users/subscriptions/', 'GET',
+        '/api/users/subscriptions/', {'recipes_limit': 3}
+    )
+
+
+@scenario('ingredients-list')
+def ingredients_list(bench):
+    bench.get('/api/ingredients/')
+    bench.request(
+        'GET /api/ingredients/?name=', 'GET', '/api/ingredients/',
+        {'name': 'мук'}
+    )
+
+
+@scenario('ingredients-detail')
+def ingredients_detail(bench):
+    bench.request(
+        'GET /api/ingredients/{id}/',
+        'GET', f'/api/ingredients/{bench.fixtures["ingredient"]}/'
+    )
+
+
+@scenario('recipes-list')
+def recipes_list(bench):
+    bench.get('/api/recipes/')
+    bench.request(
+        'GET /api/recipes/ (аноним)', 'GET', '/api/recipes/',
+        anonymous=True
+    )
+    bench.request(
+        'GET /api/recipes/?page=N', 'GET', '/api/recipes/',
+        {'page': bench.fixtures['deep_page']}
+    )
+    bench.request(
+        'GET /api/recipes/?pagination=cursor', 'GET', '/api/recipes/',
+        {'pagination': 'cursor'}
+    )
+    bench.request(
+        'GET /api/recipes/?author=', 'GET', '/api/recipes/',
+        {'author': bench.fixtures['author']}
+    )
+    bench.request(
+        'GET /api/recipes/?search=', 'GET', '/api/recipes/',
+        {'search': 'плов'}
+    )
+    bench.request(
+        'GET /api/recipes/?have=', 'GET', '/api/recipes/',
+        {
+            'have': ','.join(map(str, bench.fixtures['ingredients'])),
+            'missing_max': 2,
+        }
+    )
+
+
+@scenario('recipes-detail')
+def recipes_detail(bench):
+    recipe_id = bench.fixtures['recipe']
+    bench.request(
+        'GET /api/recipes/{id}/', 'GET', f'/api/recipes/{recipe_id}/'
+    )
+    ingredients = [
+        {'id': ingredient_id, 'amount': amount}
+        for amount, ingredient_id in enumerate(
+            bench.fixtures['ingredients'], 1
+        )
+    ]
+    created = bench.request(
+        'POST /api/recipes/', 'POST', '/api/recipes/', {
+            'name': 'замер',
+            'text': 'описание',
+            'cooking_time': 10,
+            'image': IMAGE,
+            'ingredients': ingredients,
+        }
+    ).json()
+    path = f'/api/recipes/{created["id"]}/'
+    bench.request(
+        'PATCH /api/recipes/{id}/', 'PATCH', path, {
+            'name': 'замер 2',
+            'text': 'описание',
+            'cooking_time': 15,
+            'ingredients': ingredients[::-1],
+        }
+    )
+    # Первый ингредиент убран, у остальных другое количество
+    bench.request(
+        'PATCH /api/recipes/{id}/ (ingredients)', 'PATCH', path, {
+            'name': 'замер 2',
+            'text': 'описание',
+            'cooking_time': 15,
+            'ingredients': [
+                {'id': ingredient['id'], 'amount': ingredient['amount'] + 1}
+                for ingredient in ingredients[1:]
+            ],
+        }
+    )
+    bench.request('DELETE /api/recipes/{id}/', 'DELETE', path)
+
+
+@scenario('recipes-link')
+def recipes_link(bench):
+    bench.request(
+        'GET /api/recipes/{id}/get-link/',
+        'GET', f'/api/recipes/{bench.fixtures["recipe"]}/get-link/'
+    )
+
+
+@scenario('recipes-feed')
+def recipes_feed(bench):
+    bench.request('GET /api/recipes/feed/', 'GET', '/api/recipes/feed/')
+
+
+@scenario('recipes-similar')
+def recipes_similar(bench):
+    bench.request(
+        'GET /api/recipes/{id}/similar/',
+        'GET', f'/api/recipes/{bench.fixtures["recipe"]}/similar/'
+    )
+
+
+@scenario('recipes-favorite', 'recipes-shopping_cart')
+def recipes_toggles(bench):
+    for relation in ('favorite', 'shopping_cart'):
+        path = f'/api/recipes/{bench.fixtures["recipe"]}/{relation}/'
+        for method in ('POST', 'DELETE'):
+            bench.request(
+                f'{method} /api/recipes/{{id}}/{relation}/', method, path
+            )
+
+
+@scenario('recipes-bulk-favorite', 'recipes-bulk-shopping-cart')
+def recipes_bulk(bench):
+    for relation in ('favorite', 'shopping_cart'):
+        path = f'/api/recipes/bulk_{relation}/'
+        for method in ('POST', 'DELETE'):
+            bench.request(
+                f'{method} {path} (20)', method, path,
+                {'recipes': bench.fixtures['batch']},
+            )
+
+
+@scenario('recipes-export-shopping-list')
+def recipes_export(bench):
+    for file_format in ('txt', 'csv'):
+        bench.request(
+            f'GET /api/recipes/download_shopping_cart/?format={file_format}',
+            'GET', '/api/recipes/download_shopping_cart/',
+            {'format': file_format},
+        )
+
+
+@scenario('login', 'logout')
+def auth_token(bench):
+    token = bench.request(
+        'POST /api/auth/token/login/', 'POST', '/api/auth/token/login/',
+        {'email': bench.fixtures['login'], 'password': 'password'},
+        anonymous=True,
+    ).json()['auth_token']
+    bench.request(
+        'POST /api/auth/token/logout/', 'POST', '/api/auth/token/logout/',
+        token=token,
+    )
+
+
+@scenario('short-link')
+def short_link(bench):
+    bench.request('GET /r/{code}', 'GET', f'/r/{bench.fixtures["code"]}')
+
+
+def route_names(patterns=None, prefix=''):
+    """Имена маршрутов приложения без админки и format-суффиксов."""
+    names = set()
+    for pattern in patterns or get_resolver().url_patterns:
+        route = prefix + str(pattern.pattern)
+        if route.startswith(SKIPPED_PREFIXES) or 'format' in route:
+            continue
+        if isinstance(pattern, URLPattern):
+            names.add(pattern.name or route)
+        else:
+            names |= route_names(pattern.url_patterns, route)
+    return names
+
+
+def prepare(options):
+    """Синтетическая база и пользователи для сценариев."""
+    call_command(
+        'seed_foodgram',
+        seed=options.seed,
+        users=options.users,
+        ingredients=options.ingredients,
+        recipes=options.recipes,
+        stdout=open(os.devnull, 'w'),
+    )
+    call_command(
+        'update_similar_recipes', all=True, stdout=open(os.devnull, 'w')
+    )
+    reader = User.objects.create_user(
+        email='bench@example.com',
+        username='bench',
+        first_name='Замер',
+        last_name='Нагрузочный',
+        password='password',
+    )
+    login = User.objects.create_user(
+        email='bench-login@example.com',
+        username='bench-login',
+        first_name='Вход',
+        last_name='Нагрузочный',
+        password='password',
+    )
+    authors = list(
+        User.objects.filter(recipes__isnull=False).distinct().order_by('id')
+    )
+    Subscription.objects.bulk_create(
+        Subscription(user=reader, subscribed_to=author)
+        for author in authors[:10]
+    )
+    for author in authors[:10]:
+        add_author_to_feed(reader.id, author.id)
+    for recipe in Recipe.objects.order_by('id')[1:6]:
+        ShoppingCart.objects.create(user=reader, recipe=recipe)
+        add_to_shopping_list(reader.id, recipe.id)
+    recipe = Recipe.objects.order_by('id').first()
+    return {
+        'token': Token.objects.create(user=reader).key,
+        'login': login.email,
+        'author': authors[0].id,
+        'stranger': authors[-1].id,
+        'recipe': recipe.id,
+        'code': recipe.short_code,
+        # Страница из середины ленты: OFFSET растёт с объёмом данных
+        'deep_page': Recipe.objects.count() // 12 + 1,
+        'ingredient': recipe.recipe_ingredients.first().ingredient_id,
+        'ingredients': list(
+            recipe.recipe_ingredients.values_list('ingredient_id', flat=True)
+        ),
+        # Рецепты, которых у читателя нет ни в избранном, ни в корзине
+        'batch': list(
+            Recipe.objects.order_by('id').values_list('id', flat=True)[6:26]
+        ),
+    }
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def summarize(samples):
+    return {
+        key: {
+            'p50': round(statistics.median(timings) * 1000, 2),
+            'p95': round(percentile(timings, 0.95) * 1000, 2),
+            'p99': round(percentile(timings, 0.99) * 1000, 2),
+            'queries': max(counts),
+        }
+        for key, (timings, counts) in sorted(samples.items())
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Строки отчёта и список регрессий."""
+    rows, regressions = [], []
+    for key, result in results.items():
+        base = baseline.get(key)
+        verdict = 'новый'
+        if base:
+            verdict = 'ok'
+            if result['queries'] > base['queries']:
+                verdict = f'запросов {base["queries"]} -> {result["queries"]}'
+            elif (
+                result['p95'] > base['p95'] * (1 + tolerance)
+                and result['p95'] - base['p95'] > min_delta
+            ):
+                verdict = f'p95 {base["p95"]} -> {result["p95"]} мс'
+            if verdict != 'ok':
+                regressions.append(f'{key}: {verdict}')
+        rows.append(
+            f'{key:<58} {result["p50"]:>8.2f} {result["p95"]:>8.2f} '
+            f'{result["p99"]:>8.2f} {result["queries"]:>4}  {verdict}'
+        )
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--recipes', type=int, default=1500)
+    parser.add_argument(
+        '--tolerance', type=float, default=0.5,
+        help='допустимый рост p95 в долях базовой линии',
+    )
+    parser.add_argument(
+        '--min-delta', type=float, default=5.0,
+        help='рост p95 меньше этого числа мс не считается регрессией',
+    )
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    options = parser.parse_args()
+
+    covered = {name for _, names in SCENARIOS for name in names}
+    uncovered = sorted(route_names() - covered)
+    if uncovered:
+        sys.exit(f'Нет сценариев для маршрутов: {", ".join(uncovered)}')
+
+    setup_test_environment()
+    media_root = tempfile.mkdtemp()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        # Хэшер как в тестах: замеряется код API, а не PBKDF2
+        with override_settings(
+            MEDIA_ROOT=media_root,
+            PASSWORD_HASHERS=[
+                'django.contrib.auth.hashers.MD5PasswordHasher'
+            ],
+        ):
+            bench = Bench(prepare(options))
+            for measure, rounds in (
+                (False, options.warmup), (True, options.iterations)
+            ):
+                bench.measure = measure
+                for _ in range(rounds):
+                    for function, _ in SCENARIOS:
+                        function(bench)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    results = summarize(bench.samples)
+    if options.update_baseline:
+        options.baseline.write_text(
+            json.dumps(results, ensure_ascii=False, indent=2) + '\n',
+            encoding='utf-8',
+        )
+        print(f'Базовая линия записана в {options.baseline}')
+        return
+    baseline = {}
+    if options.baseline.exists():
+        baseline = json.loads(options.baseline.read_text(encoding='utf-8'))
+    rows, regressions = compare(
+        results, baseline, options.tolerance, options.min_delta
+    )
+    print(f'{"запрос":<58} {"p50":>8} {"p95":>8} {"p99":>8} {"SQL":>4}')
+    print('\n'.join(rows))
+    if regressions:
+        sys.exit('Регрессии:\n' + '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+    main()
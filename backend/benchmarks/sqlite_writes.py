@@ -0,0 +1,207 @@
+"""Конкурентные записи в SQLite: прежние настройки против профиля.
+
+Несколько процессов (как воркеры gunicorn) через WSGI-приложение
+добавляют и убирают рецепты из избранного и корзины на общем файле БД.
+Каждый профиль запускается на своей свежей базе, после чего
+сравниваются пропускная способность записей и число ошибок
+«database is locked».
+
+Запуск из каталога backend:
+
+    python -m benchmarks.sqlite_writes --workers 4 --toggles 100
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from io import BytesIO
+
+# Прежний settings.DATABASES: журнал отката, умолчания PRAGMA,
+# BEGIN DEFERRED и новое соединение на каждый запрос
+PROFILES = {
+    'default': {
+        'SQLITE_JOURNAL_MODE': '',
+        'SQLITE_SYNCHRONOUS': '',
+        'SQLITE_CACHE_SIZE': '',
+        'SQLITE_MMAP_SIZE': '',
+        'SQLITE_BUSY_TIMEOUT': '',
+        'SQLITE_TEMP_STORE': '',
+        'SQLITE_TRANSACTION_MODE': 'DEFERRED',
+        'DB_CONN_MAX_AGE': '0',
+    },
+    'tuned': {},
+}
+
+
+def setup_django(path, profile):
+    os.environ.update(PROFILES[profile])
+    os.environ['SQLITE_PATH'] = path
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'foodgram_config.settings'
+    )
+    import django
+    django.setup()
+
+
+def prepare(path, profile, workers, recipes):
+    """Схема и данные: по пользователю с токеном на воркер."""
+    setup_django(path, profile)
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from ingredients.models import Ingredient
+    from recipes.models import Recipe, RecipeIngredient
+    from users.models import User
+
+    call_command('migrate', verbosity=0)
+    author = User.objects.create_user(
+        email='author@example.com',
+        username='author',
+        first_name='Автор',
+        last_name='Нагрузочный',
+        password='password',
+    )
+    ingredient = Ingredient.objects.create(name='соль', measurement_unit='г')
+    created = Recipe.objects.bulk_create(
+        Recipe(
+            author=author,
+            name=f'рецепт {i}',
+            image='recipes/images/bench.png',
+            text='описание',
+            cooking_time=10,
+        )
+        for i in range(recipes)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=5)
+        for recipe in created
+    )
+    tokens = []
+    for number in range(workers):
+        user = User.objects.create_user(
+            email=f'worker{number}@example.com',
+            username=f'worker{number}',
+            first_name='Воркер',
+            last_name=str(number),
+            password='password',
+        )
+        tokens.append(Token.objects.create(user=user).key)
+    return tokens, [recipe.id for recipe in created]
+
+
+def call(application, method, path, token):
+    status = []
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'testserver',
+        'HTTP_AUTHORIZATION': f'Token {token}',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(),
+    }
+    body = application(
+        environ, lambda code, headers, exc_info=None: status.append(code)
+    )
+    b''.join(body)
+    body.close()
+    return int(status[0].split()[0])
+
+
+def worker(path, profile, token, recipe_ids, toggles, start, results):
+    setup_django(path, profile)
+    from django.core.wsgi import get_wsgi_application
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    # Трассировки «database is locked» считаются, а не печатаются
+    logging.disable(logging.CRITICAL)
+    application = get_wsgi_application()
+    writes = errors = 0
+    start.wait()
+    started = time.perf_counter()
+    for number in range(toggles):
+        recipe_id = recipe_ids[number % len(recipe_ids)]
+        for relation in ('favorite', 'shopping_cart'):
+            for method in ('POST', 'DELETE'):
+                status = call(
+                    application,
+                    method,
+                    f'/api/recipes/{recipe_id}/{relation}/',
+                    token,
+                )
+                if status < 300:
+                    writes += 1
+                else:
+                    # 500 — это «database is locked»
+                    errors += 1
+    results.put((writes, errors, time.perf_counter() - started))
+
+
+def run_profile(profile, workers, toggles, recipes, results):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        tokens, recipe_ids = prepare(path, profile, workers, recipes)
+        context = multiprocessing.get_context('spawn')
+        start = context.Event()
+        worker_results = context.Queue()
+        processes = [
+            context.Process(
+                target=worker,
+                args=(
+                    path, profile, token, recipe_ids, toggles,
+                    start, worker_results,
+                ),
+            )
+            for token in tokens
+        ]
+        for process in processes:
+            process.start()
+        start.set()
+        totals = [worker_results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    writes = sum(total[0] for total in totals)
+    errors = sum(total[1] for total in totals)
+    elapsed = max(total[2] for total in totals)
+    results.put((profile, writes, errors, elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--toggles', type=int, default=100)
+    parser.add_argument('--recipes', type=int, default=20)
+    options = parser.parse_args()
+    print(
+        f'{options.workers} процессов, по {options.toggles} циклов '
+        'избранное+корзина (4 записи за цикл)'
+    )
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    for profile in PROFILES:
+        # Каждый профиль в отдельном процессе: настройки Django
+        # читаются из окружения один раз
+        process = context.Process(
+            target=run_profile,
+            args=(
+                profile, options.workers, options.toggles,
+                options.recipes, results,
+            ),
+        )
+        process.start()
+        profile, writes, errors, elapsed = results.get()
+        process.join()
+        print(
+            f'{profile:<8} {writes / elapsed:>8.1f} записей/с  '
+            f'ошибок {errors:>4}  за {elapsed:.2f} с'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from cart.models import ShoppingCart
+from cart.models import ShoppingCart, ShoppingListItem
+from cart.services import add_to_shopping_list, remove_from_shopping_list
 
 
 @admin.register(ShoppingCart)
@@ -8,3 +9,29 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     list_filter = ('user',)
     search_fields = ('user__username', 'recipe__name')
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            remove_from_shopping_list(
+                form.initial['user'], form.initial['recipe']
+            )
+        super().save_model(request, obj, form, change)
+        add_to_shopping_list(obj.user_id, obj.recipe_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        remove_from_shopping_list(obj.user_id, obj.recipe_id)
+
+    def delete_queryset(self, request, queryset):
+        removed = list(queryset.values_list('user_id', 'recipe_id'))
+        super().delete_queryset(request, queryset)
+        for user_id, recipe_id in removed:
+            remove_from_shopping_list(user_id, recipe_id)
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'total')
+    list_filter = ('user',)
+    search_fields = ('user__username', 'ingredient__name')
+    readonly_fields = ('user', 'ingredient', 'total')
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cart.models import ShoppingListItem
+from cart.services import get_expected_totals
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает итоги списков покупок (ShoppingListItem) по корзинам. '
+        'С --verify только сверяет таблицу и сообщает о расхождениях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='только проверить, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = get_expected_totals()
+            actual = {
+                (user_id, ingredient_id): total
+                for user_id, ingredient_id, total in
+                ShoppingListItem.objects.values_list(
+                    'user_id', 'ingredient_id', 'total'
+                )
+            }
+            mismatched = {
+                key for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            }
+            if options['verify']:
+                for user_id, ingredient_id in sorted(mismatched):
+                    self.stdout.write(
+                        f'user={user_id} ingredient={ingredient_id}: '
+                        f'ожидается {expected.get((user_id, ingredient_id))}, '
+                        f'в таблице {actual.get((user_id, ingredient_id))}'
+                    )
+                if mismatched:
+                    raise CommandError(
+                        f'Расхождений в списках покупок: {len(mismatched)}'
+                    )
+                self.stdout.write(self.style.SUCCESS(
+                    f'Списки покупок согласованы, позиций: {len(actual)}'
+                ))
+                return
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total=total,
+                    )
+                    for (user_id, ingredient_id), total in expected.items()
+                ),
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, позиций: {len(expected)}, '
+            f'исправлено: {len(mismatched)}'
+        ))
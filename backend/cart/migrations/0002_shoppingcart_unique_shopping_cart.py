@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+from foodgram_config.migration_operations import remove_duplicates
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicates('cart.ShoppingCart', ('user', 'recipe')),
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 
 from users.models import User
+from ingredients.models import Ingredient
 from recipes.models import Recipe
 
 
@@ -21,6 +22,48 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_shopping_cart',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """Итоговое количество ингредиента в списке покупок пользователя.
+
+    Поддерживается инкрементально при изменении корзины и рецептов в ней,
+    пересобирается командой rebuild_shopping_lists.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='ингредиент',
+    )
+    total = models.PositiveIntegerField(
+        verbose_name='количество',
+    )
+
+    class Meta:
+        verbose_name = 'позиция списка покупок'
+        verbose_name_plural = 'позиции списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient} {self.total}'
@@ -0,0 +1,133 @@
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import F, IntegerField, Sum
+from django.db.models.expressions import RawSQL
+
+from cart.models import ShoppingCart, ShoppingListItem
+from recipes.models import RecipeIngredient
+
+
+def get_recipe_amounts(recipe_id):
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+def delta_case(deltas):
+    """``CASE ingredient_id WHEN … THEN … END`` для UPDATE итогов.
+
+    Собирается строкой: сотни ``When`` (корзина из десятков рецептов)
+    ORM разбирает на порядок дольше, чем база выполняет сам UPDATE.
+    """
+    column = connection.ops.quote_name(
+        ShoppingListItem._meta.get_field('ingredient').column
+    )
+    return RawSQL(
+        'CASE {} {} END'.format(
+            column, ' '.join(['WHEN %s THEN %s'] * len(deltas))
+        ),
+        [value for pair in deltas.items() for value in pair],
+        output_field=IntegerField(),
+    )
+
+
+def change_totals(user_ids, deltas):
+    """Прибавляет ``deltas`` {ingredient_id: amount} к спискам покупок.
+
+    Недостающие позиции создаются с нулём, затем все итоги меняются
+    одним UPDATE через F(), обнулившиеся позиции удаляются.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    with transaction.atomic(savepoint=False):
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, total=0
+                )
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items() if delta > 0
+            ),
+            ignore_conflicts=True,
+        )
+        ShoppingListItem.objects.filter(
+            user_id__in=user_ids,
+            ingredient_id__in=deltas,
+        ).update(total=F('total') + delta_case(deltas))
+        if any(delta < 0 for delta in deltas.values()):
+            ShoppingListItem.objects.filter(
+                user_id__in=user_ids,
+                total=0,
+            ).delete()
+
+
+def add_to_shopping_list(user_id, recipe_id):
+    change_totals([user_id], get_recipe_amounts(recipe_id))
+
+
+def remove_from_shopping_list(user_id, recipe_id):
+    change_totals([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+def get_recipes_amounts(recipe_ids):
+    """Суммарные количества ингредиентов нескольких рецептов."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id').annotate(
+            total=Sum('amount')
+        ).order_by()
+    )
+
+
+def add_recipes_to_shopping_list(user_id, recipe_ids):
+    change_totals([user_id], get_recipes_amounts(recipe_ids))
+
+
+def remove_recipes_from_shopping_list(user_id, recipe_ids):
+    change_totals([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipes_amounts(recipe_ids).items()
+    })
+
+
+def get_cart_user_ids(recipe_id):
+    return list(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)
+    )
+
+
+def recipe_amounts_changed(recipe_id, old_amounts, new_amounts):
+    """Переносит изменение ингредиентов рецепта в списки покупок."""
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    if any(deltas.values()):
+        change_totals(get_cart_user_ids(recipe_id), deltas)
+
+
+def get_expected_totals():
+    """Итоги, вычисленные заново по корзинам: {(user, ingredient): total}."""
+    rows = RecipeIngredient.objects.values_list(
+        'recipe__shopping_cart__user_id',
+        'ingredient_id',
+    ).filter(
+        recipe__shopping_cart__isnull=False
+    ).annotate(
+        total=Sum('amount')
+    ).order_by()
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in rows
+    }
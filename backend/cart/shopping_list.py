@@ -0,0 +1,195 @@
+import csv
+from tempfile import SpooledTemporaryFile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+
+from cart.models import ShoppingListItem
+from recipes.models import Recipe
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ExportUnavailable(Exception):
+    """Формат нельзя собрать на этом сервере, например нет шрифта."""
+
+
+def get_cart_recipes(user):
+    """Названия рецептов из корзины и логины их авторов."""
+    return Recipe.objects.filter(
+        shopping_cart__user=user
+    ).values_list('name', 'author__username')
+
+
+def get_cart_ingredients(user):
+    """Итоги списка покупок по названию ингредиента."""
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'total',
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    )
+
+
+def render_txt(recipes, ingredients, created):
+    yield '=== Мой список покупок ===\n'
+    yield f"Создан: {created.strftime('%d.%m.%Y в %H:%M')}\n"
+    yield f'Количество рецептов: {len(recipes)}\n'
+    yield '\n'
+    yield 'Необходимые ингредиенты:\n'
+    position = 0
+    for position, (name, unit, total) in enumerate(ingredients, 1):
+        yield f'{position}. {name.title()} — {total} {unit}\n'
+    yield f'Всего позиций: {position}\n'
+    yield '\n'
+    yield 'Рецепты в списке:\n'
+    for name, author in recipes:
+        yield f'• {name} ({author})\n'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(recipes, ingredients, created):
+    writer = csv.writer(Echo())
+    # BOM, чтобы Excel распознал кириллицу в UTF-8
+    yield '\ufeff'
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for name, unit, total in ingredients:
+        yield writer.writerow((name, total, unit))
+
+
+def get_pdf_font_name():
+    # Имя зависит от пути: после смены настройки шрифт регистрируется заново
+    return f'ShoppingList {settings.SHOPPING_LIST_PDF_FONT}'
+
+
+def register_pdf_font():
+    """Регистрирует шрифт PDF до начала ответа.
+
+    Внутри генератора ошибка случилась бы уже после статуса 200
+    и заголовков, и клиент получил бы обрезанный файл.
+    """
+    font_name = get_pdf_font_name()
+    if font_name in pdfmetrics.getRegisteredFontNames():
+        return
+    try:
+        pdfmetrics.registerFont(
+            TTFont(font_name, settings.SHOPPING_LIST_PDF_FONT)
+        )
+    except TTFError as error:
+        raise ExportUnavailable(
+            'PDF недоступен: не найден шрифт '
+            f'{settings.SHOPPING_LIST_PDF_FONT}'
+        ) from error
+
+
+def render_pdf(recipes, ingredients, created):
+    """PDF собирается во временный файл и отдаётся кусками.
+
+    Файл держится в памяти только до 1 МБ, дальше уходит на диск.
+    Шрифт регистрирует ``prepare_export``.
+    """
+    font_name = get_pdf_font_name()
+    font_size = 11
+    line_height = font_size * 1.5
+    margin = 50
+    width, height = A4
+
+    with SpooledTemporaryFile(max_size=1024 * 1024) as file:
+        pdf = canvas.Canvas(file, pagesize=A4)
+        pdf.setFont(font_name, font_size)
+        y = height - margin
+        for line in render_txt(recipes, ingredients, created):
+            if y < margin:
+                pdf.showPage()
+                pdf.setFont(font_name, font_size)
+                y = height - margin
+            pdf.drawString(margin, y, line.rstrip('\n'))
+            y -= line_height
+        pdf.save()
+        file.seek(0)
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+
+
+def get_filename(file_format, created):
+    return f'shopping_list_{created.strftime("%Y%m%d_%H%M")}.{file_format}'
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
+
+
+def prepare_export(file_format):
+    """Проверяет, что формат можно собрать; иначе ExportUnavailable."""
+    if file_format == 'pdf':
+        register_pdf_font()
+
+
+def export_shopping_list(user, file_format, created):
+    """Генератор содержимого файла и его content type.
+
+    Весь экспорт укладывается в два запроса: рецепты корзины
+    и готовые итоги из ShoppingListItem.
+    """
+    prepare_export(file_format)
+    render, content_type = SHOPPING_LIST_FORMATS[file_format]
+    recipes = list(get_cart_recipes(user))
+    # Итоги читаются из курсора по мере отдачи файла
+    return (
+        render(recipes, get_cart_ingredients(user).iterator(), created),
+        content_type,
+    )
+
+
+def next_block(chunks):
+    """Следующие куски файла общим размером до CHUNK_SIZE.
+
+    Пустой список означает, что файл собран целиком.
+    """
+    block, size = [], 0
+    for chunk in chunks:
+        block.append(chunk)
+        size += len(chunk)
+        if size >= CHUNK_SIZE:
+            break
+    return block
+
+
+async def aexport_shopping_list(user, file_format, created):
+    """Асинхронный вариант export_shopping_list для ASGI.
+
+    Данные читаются асинхронным ORM, а файл (для PDF это заметная
+    работа CPU) собирается в потоке по мере отдачи: за один переход
+    в поток берётся не больше CHUNK_SIZE, и весь файл в памяти
+    не лежит.
+    """
+    prepare_export(file_format)
+    render, content_type = SHOPPING_LIST_FORMATS[file_format]
+    recipes = [recipe async for recipe in get_cart_recipes(user)]
+    ingredients = [item async for item in get_cart_ingredients(user)]
+    chunks = render(recipes, ingredients, created)
+    read_block = sync_to_async(next_block, thread_sensitive=False)
+
+    async def content():
+        while block := await read_block(chunks):
+            for chunk in block:
+                yield chunk
+
+    return content(), content_type
@@ -0,0 +1,13 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from cart.services import get_recipe_amounts, recipe_amounts_changed
+from recipes.models import Recipe
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_deleted_recipe_from_shopping_lists(instance, **kwargs):
+    # Корзины удаляются каскадом, итоги нужно вычесть до этого
+    recipe_amounts_changed(
+        instance.id, get_recipe_amounts(instance.id), {}
+    )
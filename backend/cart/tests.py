@@ -1,3 +1,184 @@
-from django.test import TestCase
+import io
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from cart.models import ShoppingCart, ShoppingListItem
+from cart.services import add_to_shopping_list
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredient
+from users.models import User
+
+
+class ShoppingListExportTest(APITestCase):
+    url = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='buyer@example.com',
+            username='buyer',
+            first_name='Покупатель',
+            last_name='Тестовый',
+            password='password',
+        )
+        flour, eggs = Ingredient.objects.bulk_create([
+            Ingredient(name='мука', measurement_unit='г'),
+            Ingredient(name='яйца', measurement_unit='шт'),
+        ])
+        for i, amounts in enumerate(((200, 2), (300, 1))):
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name=f'блины {i}',
+                image='recipes/images/test.png',
+                text='описание',
+                cooking_time=10,
+            )
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe, ingredient=flour, amount=amounts[0]
+                ),
+                RecipeIngredient(
+                    recipe=recipe, ingredient=eggs, amount=amounts[1]
+                ),
+            ])
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+            add_to_shopping_list(cls.user.id, recipe.id)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def download(self, **params):
+        response = self.client.get(self.url, params)
+        return response, b''.join(response.streaming_content)
+
+    def test_txt_is_default_and_costs_two_queries(self):
+        with self.assertNumQueries(2):
+            response, content = self.download()
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; charset=utf-8'
+        )
+        text = content.decode()
+        self.assertIn('Количество рецептов: 2', text)
+        self.assertIn('1. Мука — 500 г', text)
+        self.assertIn('2. Яйца — 3 шт', text)
+        self.assertIn('Всего позиций: 2', text)
+        self.assertIn('• блины 1 (buyer)', text)
+
+    def test_csv(self):
+        response, content = self.download(format='csv')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv"'))
+        self.assertEqual(
+            content.decode('utf-8-sig').splitlines(),
+            [
+                'Ингредиент,Количество,Единица измерения',
+                'мука,500,г',
+                'яйца,3,шт',
+            ]
+        )
+
+    def test_pdf(self):
+        response, content = self.download(format='pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+
+    @override_settings(SHOPPING_LIST_PDF_FONT='/nonexistent/font.ttf')
+    def test_pdf_without_font_fails_before_streaming(self):
+        response = self.client.get(self.url, {'format': 'pdf'})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.streaming)
+        self.assertIn('/nonexistent/font.ttf', response.data['errors'])
+
+    def test_unknown_format(self):
+        response = self.client.get(self.url, {'format': 'docx'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class ShoppingListTotalsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@example.com',
+            username='cook',
+            first_name='Повар',
+            last_name='Тестовый',
+            password='password',
+        )
+        cls.flour, cls.milk = Ingredient.objects.bulk_create([
+            Ingredient(name='мука', measurement_unit='г'),
+            Ingredient(name='молоко', measurement_unit='мл'),
+        ])
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='блины',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.flour, amount=200
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(f'/api/recipes/{self.recipe.id}/shopping_cart/')
+
+    def totals(self):
+        return dict(
+            ShoppingListItem.objects.filter(
+                user=self.user
+            ).values_list('ingredient__name', 'total')
+        )
+
+    def verify(self):
+        call_command(
+            'rebuild_shopping_lists', verify=True, stdout=io.StringIO()
+        )
+
+    def test_editing_carted_recipe_updates_totals(self):
+        self.assertEqual(self.totals(), {'мука': 200})
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {'ingredients': [{'id': self.milk.id, 'amount': 500}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.totals(), {'молоко': 500})
+        self.verify()
+
+    def test_recipe_ingredient_admin_updates_totals(self):
+        self.client.force_login(User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            first_name='Админ',
+            last_name='Тестовый',
+            password='password',
+        ))
+        row = self.recipe.recipe_ingredients.get()
+        url = f'/admin/recipes/recipeingredient/{row.id}/'
+        response = self.client.post(f'{url}change/', {
+            'recipe': self.recipe.id,
+            'ingredient': self.milk.id,
+            'amount': 300,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.totals(), {'молоко': 300})
+        self.verify()
+        self.client.post(f'{url}delete/', {'post': 'yes'})
+        self.assertEqual(self.totals(), {})
+        self.verify()
+
+    def test_rebuild_fixes_drift(self):
+        ShoppingListItem.objects.update(total=1)
+        with self.assertRaises(CommandError):
+            self.verify()
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        self.assertEqual(self.totals(), {'мука': 200})
+        self.verify()
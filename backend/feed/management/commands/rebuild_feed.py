@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from feed.models import FeedItem
+from feed.services import get_expected_feed, rebuild_feed
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает ленты подписок (FeedItem) по подпискам и рецептам. '
+        'С --verify только сверяет таблицу и сообщает о расхождениях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='только проверить, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = get_expected_feed()
+            actual = set(
+                FeedItem.objects.values_list('user_id', 'recipe_id')
+            )
+            missing = expected.keys() - actual
+            extra = actual - expected.keys()
+            if options['verify']:
+                for user_id, recipe_id in sorted(missing):
+                    self.stdout.write(
+                        f'user={user_id} recipe={recipe_id}: нет в ленте'
+                    )
+                for user_id, recipe_id in sorted(extra):
+                    self.stdout.write(
+                        f'user={user_id} recipe={recipe_id}: лишний в ленте'
+                    )
+                if missing or extra:
+                    raise CommandError(
+                        f'Расхождений в лентах: {len(missing) + len(extra)}'
+                    )
+                self.stdout.write(self.style.SUCCESS(
+                    f'Ленты согласованы, записей: {len(actual)}'
+                ))
+                return
+            rebuild_feed(expected)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, записей: {len(expected)}, '
+            f'исправлено: {len(missing) + len(extra)}'
+        ))
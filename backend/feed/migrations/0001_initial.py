@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-18 21:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feed(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedItem = apps.get_model('feed', 'FeedItem')
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id, recipe_id, author_id, pub_date in Recipe.objects.filter(
+                author__users_subscribers__isnull=False
+            ).values_list(
+                'author__users_subscribers__user_id', 'id', 'author_id',
+                'pub_date',
+            ).order_by().iterator()
+        ),
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0010_similar_recipes'),
+        ('users', '0005_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='рецепт')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='подписчик')),
+            ],
+            options={
+                'verbose_name': 'рецепт в ленте',
+                'verbose_name_plural': 'ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-id'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_item'),
+        ),
+        migrations.RunPython(
+            fill_feed,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import models
+
+from users.models import User
+from recipes.models import Recipe
+
+
+class FeedItem(models.Model):
+    """Рецепт в ленте подписчика.
+
+    Раскладывается подписчикам автора при публикации рецепта,
+    добавляется и убирается при подписке и отписке, пересобирается
+    командой rebuild_feed. Лента читается по индексу
+    (user, -pub_date, -id) без соединения с подписками.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='подписчик',
+        # Покрыт индексами ленты и уникальности
+        db_index=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='дата публикации',
+    )
+
+    class Meta:
+        verbose_name = 'рецепт в ленте'
+        verbose_name_plural = 'ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_item',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-id'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipe_id}'
@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from feed.models import FeedItem
+from recipes.models import Recipe
+from users.models import Subscription
+
+BATCH_SIZE = 1000
+
+
+def fan_out(recipes):
+    """Раскладывает новые рецепты по лентам подписчиков их авторов."""
+    followers = defaultdict(list)
+    for author_id, user_id in Subscription.objects.filter(
+        subscribed_to_id__in={recipe.author_id for recipe in recipes}
+    ).values_list('subscribed_to_id', 'user_id'):
+        followers[author_id].append(user_id)
+    items = [
+        FeedItem(
+            user_id=user_id,
+            recipe_id=recipe.id,
+            author_id=recipe.author_id,
+            pub_date=recipe.pub_date,
+        )
+        for recipe in recipes
+        for user_id in followers[recipe.author_id]
+    ]
+    # Пустой bulk_create всё равно открывает транзакцию
+    if items:
+        FeedItem.objects.bulk_create(
+            items, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+
+
+def add_author_to_feed(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные рецепты автора."""
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in Recipe.objects.filter(
+                author_id=author_id
+            ).values_list('id', 'pub_date')
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_expected_feed():
+    """Ленты, вычисленные заново по подпискам.
+
+    {(user, recipe): (author, pub_date)}
+    """
+    return {
+        (user_id, recipe_id): (author_id, pub_date)
+        for user_id, recipe_id, author_id, pub_date in Recipe.objects.filter(
+            author__users_subscribers__isnull=False
+        ).values_list(
+            'author__users_subscribers__user_id', 'id', 'author_id',
+            'pub_date',
+        ).order_by().iterator()
+    }
+
+
+def rebuild_feed(expected=None):
+    if expected is None:
+        expected = get_expected_feed()
+    with transaction.atomic():
+        FeedItem.objects.all().delete()
+        FeedItem.objects.bulk_create(
+            (
+                FeedItem(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for (user_id, recipe_id), (author_id, pub_date)
+                in expected.items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
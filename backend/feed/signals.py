@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from feed.services import fan_out
+from recipes.models import Recipe
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_created_recipe(instance, created, **kwargs):
+    if created:
+        fan_out([instance])
@@ -0,0 +1,141 @@
+import io
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APITestCase
+
+from feed.models import FeedItem
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredient
+from users.models import Subscription, User
+
+
+class FeedTest(APITestCase):
+    url = '/api/recipes/feed/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.cook, cls.baker, cls.stranger = (
+            User.objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name='Пользователь',
+                last_name='Тестовый',
+                password='password',
+            )
+            for username in ('reader', 'cook', 'baker', 'stranger')
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        cls.soup = cls.create_recipe(cls.cook, 'суп')
+        cls.stew = cls.create_recipe(cls.cook, 'рагу')
+        cls.bread = cls.create_recipe(cls.baker, 'хлеб')
+        cls.create_recipe(cls.stranger, 'чужой')
+
+    @classmethod
+    def create_recipe(cls, author, name):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=name,
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=cls.ingredient, amount=100
+        )
+        return recipe
+
+    def setUp(self):
+        self.client.force_authenticate(self.reader)
+
+    def subscribe(self, author, method='post'):
+        response = getattr(self.client, method)(
+            f'/api/users/{author.id}/subscribe/'
+        )
+        self.assertIn(response.status_code, (201, 204))
+
+    def feed(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def names(self, **params):
+        return [recipe['name'] for recipe in self.feed(**params)['results']]
+
+    def test_subscribe_backfills_and_unsubscribe_prunes(self):
+        self.assertEqual(self.names(), [])
+        self.subscribe(self.cook)
+        self.assertEqual(self.names(), ['рагу', 'суп'])
+        self.subscribe(self.baker)
+        self.assertEqual(self.names(), ['хлеб', 'рагу', 'суп'])
+        self.subscribe(self.cook, 'delete')
+        self.assertEqual(self.names(), ['хлеб'])
+
+    def test_new_recipe_fanned_out(self):
+        self.subscribe(self.cook)
+        other = User.objects.create_user(
+            email='other@example.com',
+            username='other',
+            first_name='Другой',
+            last_name='Тестовый',
+            password='password',
+        )
+        Subscription.objects.create(user=other, subscribed_to=self.cook)
+        porridge = self.create_recipe(self.cook, 'каша')
+        self.assertEqual(
+            set(FeedItem.objects.filter(
+                recipe=porridge
+            ).values_list('user_id', flat=True)),
+            {self.reader.id, other.id},
+        )
+        self.assertEqual(self.names(), ['каша', 'рагу', 'суп'])
+        porridge.delete()
+        self.assertEqual(self.names(), ['рагу', 'суп'])
+
+    def test_cursor_pages(self):
+        self.subscribe(self.cook)
+        self.subscribe(self.baker)
+        names = []
+        params = {'limit': 2}
+        while True:
+            # лента, рецепты страницы, их ингредиенты
+            with self.assertNumQueries(3):
+                data = self.feed(**params)
+            names += [recipe['name'] for recipe in data['results']]
+            if data['next'] is None:
+                break
+            params['cursor'] = parse_qs(urlparse(data['next']).query)[
+                'cursor'
+            ][0]
+        self.assertEqual(names, ['хлеб', 'рагу', 'суп'])
+
+    def test_flags_for_reader(self):
+        self.subscribe(self.cook)
+        recipe = self.feed()['results'][0]
+        self.assertTrue(recipe['author']['is_subscribed'])
+        self.assertFalse(recipe['is_favorited'])
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_rebuild_fixes_drift(self):
+        self.subscribe(self.cook)
+        Subscription.objects.create(user=self.reader, subscribed_to=self.baker)
+        FeedItem.objects.filter(recipe=self.soup).delete()
+        FeedItem.objects.create(
+            user=self.reader,
+            recipe=self.stranger.recipes.get(),
+            author=self.stranger,
+            pub_date=self.soup.pub_date,
+        )
+        output = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_feed', verify=True, stdout=output)
+        self.assertIn('лишний', output.getvalue())
+        call_command('rebuild_feed', stdout=io.StringIO())
+        call_command('rebuild_feed', verify=True, stdout=io.StringIO())
+        self.assertEqual(self.names(), ['хлеб', 'рагу', 'суп'])
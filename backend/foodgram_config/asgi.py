@@ -3,5 +3,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_config.settings')
+# Под ASGI чтение рецептов, ингредиентов и подписок идёт через
+# async-представления; ROOT_URLCONF=foodgram_config.urls их отключает
+os.environ.setdefault('ROOT_URLCONF', 'foodgram_config.asgi_urls')
+# sync_to_async открывает соединение в потоке исполнителя, и постоянные
+# соединения там не закрываются по окончании запроса
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
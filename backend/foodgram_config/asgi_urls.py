@@ -0,0 +1,27 @@
+"""URL-схема ASGI: горячие GET-эндпоинты обслуживаются async-представлениями.
+
+Пути совпадают с роутером DRF и стоят перед ним; прочие методы
+на тех же путях async-представления передают синхронным вьюсетам.
+"""
+from django.urls import path
+
+from api.async_views import (
+    IngredientListView,
+    RecipeDetailView,
+    RecipeListView,
+    ShoppingListDownloadView,
+    SubscriptionsView,
+)
+from foodgram_config.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/recipes/', RecipeListView.as_view()),
+    path(
+        'api/recipes/download_shopping_cart/',
+        ShoppingListDownloadView.as_view()
+    ),
+    path('api/recipes/<int:pk>/', RecipeDetailView.as_view()),
+    path('api/ingredients/', IngredientListView.as_view()),
+    path('api/users/subscriptions/', SubscriptionsView.as_view()),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,61 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Сильный ETag из произвольных значений, влияющих на ответ."""
+    digest = hashlib.md5(
+        repr(parts).encode(), usedforsecurity=False
+    ).hexdigest()
+    return quote_etag(digest)
+
+
+def is_conditional(request):
+    return (
+        'HTTP_IF_NONE_MATCH' in request.META
+        or 'HTTP_IF_MODIFIED_SINCE' in request.META
+    )
+
+
+class ConditionalGetMixin:
+    """Ответ 304 на If-None-Match / If-Modified-Since без сериализации.
+
+    Представление вычисляет валидаторы и вызывает
+    ``conditional_response``: если клиентская копия актуальна, сразу
+    возвращается 304, иначе валидаторы добавляются к ответу 200.
+    Last-Modified отдаётся только анонимам: у авторизованных в ответе
+    есть поля зрителя (is_favorited и т.п.), которые дата изменения
+    объекта не отражает, а в ETag они учтены.
+    """
+
+    validators = None
+
+    def conditional_response(self, request, etag, last_modified=None):
+        if request.user.is_authenticated:
+            last_modified = None
+        self.validators = (etag, last_modified)
+        not_modified = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified and int(last_modified.timestamp()),
+        )
+        if not_modified is not None:
+            self.set_validators(not_modified)
+        return not_modified
+
+    def set_validators(self, response):
+        etag, last_modified = self.validators
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_vary_headers(response, ('Authorization',))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if self.validators and response.status_code == 200:
+            self.set_validators(response)
+        return response
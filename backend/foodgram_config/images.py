@@ -0,0 +1,224 @@
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models
+from drf_extra_fields.fields import Base64ImageField
+from PIL import features, Image, ImageOps
+from rest_framework import serializers
+
+# Формат файла -> (расширение, параметры сохранения Pillow)
+FORMAT_OPTIONS = {
+    'avif': ('avif', {'quality': 60}),
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+# Формат основной ссылки: его понимает любой клиент
+BASELINE_FORMAT = 'jpeg'
+
+
+def get_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые умеет текущий Pillow."""
+    return [
+        image_format for image_format in settings.IMAGE_VARIANT_FORMATS
+        if image_format == 'jpeg' or features.check(image_format)
+    ]
+
+
+def variant_name(name, variant, image_format):
+    """recipes/images/abc.png -> recipes/images/abc.card.webp"""
+    root, _ = posixpath.splitext(name)
+    extension, _ = FORMAT_OPTIONS[image_format]
+    return f'{root}.{variant}.{extension}'
+
+
+def variant_names(name):
+    return [
+        variant_name(name, variant, image_format)
+        for variant in settings.IMAGE_VARIANTS
+        for image_format in get_formats()
+    ]
+
+
+def ready_formats(field_file):
+    """Форматы, в которых копии уже построены, в порядке get_formats().
+
+    Читается из поля модели ``variants_field`` без обращений к хранилищу.
+    Для старых файлов до generate_image_variants и для загруженных
+    load_recipes копий ещё нет.
+    """
+    built = getattr(
+        field_file.instance, field_file.field.variants_field
+    ) or ''
+    built = built.split(',')
+    return [
+        image_format for image_format in get_formats()
+        if image_format in built
+    ]
+
+
+def find_built_formats(storage, name):
+    """Форматы, во всех размерах которых копии лежат в хранилище.
+
+    Обходит хранилище, поэтому нужна только для бэкфилла, не для запросов.
+    """
+    return ','.join(
+        image_format for image_format in get_formats()
+        if all(
+            storage.exists(variant_name(name, variant, image_format))
+            for variant in settings.IMAGE_VARIANTS
+        )
+    )
+
+
+def mark_built_variants(model_name, field_name):
+    """Операция RunPython: заполняет variants_field по готовым копиям."""
+    def operation(apps, schema_editor):
+        model = apps.get_model(*model_name.split('.'))
+        field = model._meta.get_field(field_name)
+        files = model.objects.exclude(
+            **{field_name: ''}
+        ).exclude(
+            **{f'{field_name}__isnull': True}
+        ).values_list('pk', field_name).iterator()
+        for pk, name in files:
+            formats = find_built_formats(field.storage, name)
+            if formats:
+                model.objects.filter(pk=pk).update(
+                    **{field.variants_field: formats}
+                )
+    return operation
+
+
+def generate_variants(field_file):
+    """Сохраняет рядом с оригиналом уменьшенные копии во всех форматах.
+
+    Возвращает значение для ``variants_field``: построенные форматы.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    for variant, max_side in settings.IMAGE_VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        for image_format in get_formats():
+            _, options = FORMAT_OPTIONS[image_format]
+            converted = image
+            if image_format == 'jpeg' and image.mode != 'RGB':
+                # JPEG без прозрачности: подкладываем белый фон
+                rgba = image.convert('RGBA')
+                converted = Image.new('RGB', image.size, 'white')
+                converted.paste(rgba, mask=rgba.getchannel('A'))
+            buffer = BytesIO()
+            converted.save(buffer, format=image_format.upper(), **options)
+            name = variant_name(field_file.name, variant, image_format)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+    return ','.join(get_formats())
+
+
+def delete_variants(field_file):
+    for name in variant_names(field_file.name):
+        if field_file.storage.exists(name):
+            field_file.storage.delete(name)
+
+
+class VariantImageField(models.ImageField):
+    """ImageField, который при загрузке нового файла строит его варианты.
+
+    Как ``width_field`` у ImageField, ``variants_field`` — имя поля
+    модели, где хранятся построенные форматы. Его нужно объявить после
+    самой картинки: оно заполняется в pre_save.
+    """
+
+    # Смена variants_field не меняет схему: на SQLite иначе таблица
+    # пересоздаётся и теряет триггеры полнотекстового индекса
+    non_db_attrs = models.ImageField.non_db_attrs + ('variants_field',)
+
+    def __init__(self, *args, variants_field=None, **kwargs):
+        self.variants_field = variants_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.variants_field:
+            kwargs['variants_field'] = self.variants_field
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        file = getattr(model_instance, self.attname)
+        uploaded = bool(file) and not file._committed
+        file = super().pre_save(model_instance, add)
+        if uploaded:
+            formats = generate_variants(file)
+            setattr(model_instance, self.variants_field, formats)
+        elif not file:
+            setattr(model_instance, self.variants_field, None)
+        return file
+
+
+class VariantFieldMixin:
+    """Выбор варианта копии: ``detail_variant`` — для действия retrieve."""
+
+    def __init__(self, variant, detail_variant=None, **kwargs):
+        self.variant = variant
+        self.detail_variant = detail_variant or variant
+        super().__init__(**kwargs)
+
+    def get_variant(self):
+        view = self.context.get('view')
+        if getattr(view, 'action', None) == 'retrieve':
+            return self.detail_variant
+        return self.variant
+
+    def build_url(self, url):
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class ImageVariantSerializerField(VariantFieldMixin, Base64ImageField):
+    """Base64ImageField, отдающий ссылку на JPEG-копию нужного размера.
+
+    Пока копий нет, отдаётся ссылка на оригинал. Современные форматы
+    отдаёт ``ImageSourcesField``.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        variant = self.get_variant()
+        if BASELINE_FORMAT in ready_formats(value):
+            url = value.storage.url(
+                variant_name(value.name, variant, BASELINE_FORMAT)
+            )
+        else:
+            url = value.url
+        return self.build_url(url)
+
+
+class ImageSourcesField(VariantFieldMixin, serializers.Field):
+    """Ссылки на копию во всех форматах: {"avif": ..., "webp": ..., ...}.
+
+    Порядок — из IMAGE_VARIANT_FORMATS, клиент выбирает первый, который
+    умеет показать (например, через <picture>). Пока копий нет — {}.
+    """
+
+    def __init__(self, variant, detail_variant=None, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(variant, detail_variant, **kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return {}
+        variant = self.get_variant()
+        return {
+            image_format: self.build_url(value.storage.url(
+                variant_name(value.name, variant, image_format)
+            ))
+            for image_format in ready_formats(value)
+        }
@@ -0,0 +1,134 @@
+import csv
+import json
+import time
+from abc import ABCMeta, abstractmethod
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+SEPARATORS = ' \t\r\n,'
+
+
+def iter_csv(file):
+    """Строки CSV-файла без пустых строк."""
+    for row in csv.reader(file):
+        if row:
+            yield row
+
+
+def iter_json(file, chunk_size=1 << 16):
+    """Элементы JSON-массива или JSON Lines, прочитанные по кускам.
+
+    Файл целиком в память не загружается: в буфере держится только
+    текущий кусок и недочитанный хвост последнего объекта.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    opened = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in SEPARATORS:
+            position += 1
+        if position < len(buffer):
+            if not opened and buffer[position] == '[':
+                position += 1
+                opened = True
+                continue
+            if buffer[position] == ']':
+                return
+            opened = True
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                continue
+        elif eof:
+            return
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class BulkLoadCommand(BaseCommand, metaclass=ABCMeta):
+    """Основа команд загрузки данных пачками через bulk_create.
+
+    Наследник определяет ``parse_rows`` (генератор записей из файла)
+    и ``load_batch`` (сохранение одной пачки, возвращает число
+    добавленных строк). Каждая пачка сохраняется в своей транзакции.
+    """
+
+    formats = ('csv', 'json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='путь к файлу с данными')
+        parser.add_argument(
+            '--format',
+            choices=self.formats,
+            help='формат файла, по умолчанию берётся из расширения',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='сколько строк сохранять за один bulk_create',
+        )
+
+    def get_format(self, path, file_format):
+        file_format = file_format or Path(path).suffix.lstrip('.').lower()
+        if file_format not in self.formats:
+            raise CommandError(
+                f'Неизвестный формат файла: {file_format or path}'
+            )
+        return file_format
+
+    def read(self, file, file_format):
+        if file_format == 'csv':
+            return iter_csv(file)
+        return iter_json(file)
+
+    @abstractmethod
+    def parse_rows(self, records):
+        """Записи для load_batch из прочитанных строк файла."""
+
+    @abstractmethod
+    def load_batch(self, batch):
+        """Сохраняет пачку, возвращает число добавленных строк."""
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        path = options['path']
+        file_format = self.get_format(path, options['format'])
+        started = time.perf_counter()
+        read = created = 0
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = self.parse_rows(self.read(file, file_format))
+                for batch in batched(rows, batch_size):
+                    read += len(batch)
+                    created += self.load_batch(batch)
+                    self.stdout.write(
+                        f'Обработано {read}, добавлено {created}',
+                        ending='\r',
+                    )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Ошибка после строки {read}: {error}')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {read}, добавлено {created}, '
+            f'пропущено {read - created} за {elapsed:.2f} с '
+            f'({read / elapsed if elapsed else read:.0f} строк/с)'
+        ))
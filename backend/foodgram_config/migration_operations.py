@@ -0,0 +1,28 @@
+from django.db import models
+
+
+def remove_duplicates(model_name, fields, sum_fields=()):
+    """Операция RunPython: по одной строке на каждое сочетание полей.
+
+    Остаётся строка с наименьшим id. Поля из ``sum_fields`` в ней
+    заменяются суммой по всем дублям, например количество ингредиента.
+    """
+    def operation(apps, schema_editor):
+        model = apps.get_model(*model_name.split('.'))
+        groups = model.objects.values(*fields).annotate(
+            keep_id=models.Min('id')
+        )
+        if sum_fields:
+            totals = groups.annotate(
+                rows=models.Count('id'),
+                **{
+                    f'total_{name}': models.Sum(name)
+                    for name in sum_fields
+                },
+            ).filter(rows__gt=1)
+            for group in totals.iterator():
+                model.objects.filter(pk=group['keep_id']).update(**{
+                    name: group[f'total_{name}'] for name in sum_fields
+                })
+        model.objects.exclude(id__in=groups.values('keep_id')).delete()
+    return operation
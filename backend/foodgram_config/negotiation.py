@@ -0,0 +1,13 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FileDownloadNegotiation(DefaultContentNegotiation):
+    """Не даёт DRF трактовать ?format= как выбор рендерера.
+
+    Для выгрузки файлов формат выбирает само представление,
+    а ответы с ошибками отдаются первым рендерером (JSON).
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
@@ -0,0 +1,155 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import response, status
+
+
+class AnonymousPageCache:
+    """Кэш готовых ответов API для анонимных пользователей.
+
+    Ключ ответа включает поколения: общее для всех страниц (сдвигается,
+    когда меняются данные, входящие в любой ответ, например каталог
+    ингредиентов), общее для списка и отдельное для каждого объекта.
+    Инвалидация не ищет и не удаляет ключи, а сдвигает
+    поколение, старые записи просто вытесняются бэкендом по TTL.
+    Тела ответов хранятся в кэше ``PAGE_CACHE_ALIAS`` (может быть своим
+    у каждого процесса), поколения и счётчики попаданий и промахов —
+    в общем для процессов ``PAGE_GENERATION_CACHE_ALIAS``. Поколение
+    живёт столько же, сколько ответ: после его истечения создаётся
+    новое, и это лишь промах.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[settings.PAGE_CACHE_ALIAS]
+
+    @property
+    def shared(self):
+        return caches[settings.PAGE_GENERATION_CACHE_ALIAS]
+
+    def generation_key(self, pk=None):
+        if pk is None:
+            return f'{self.prefix}:generation:list'
+        return f'{self.prefix}:generation:{pk}'
+
+    def common_generation_key(self):
+        return f'{self.prefix}:generation-common'
+
+    def get_generations(self, pk=None):
+        """Общее поколение и поколение списка или объекта."""
+        keys = (self.common_generation_key(), self.generation_key(pk))
+        found = self.shared.get_many(keys)
+        return [
+            found[key] if key in found else self.shared.get_or_set(
+                key, time.time_ns, timeout=settings.PAGE_CACHE_TIMEOUT
+            )
+            for key in keys
+        ]
+
+    def get_generation(self, pk=None):
+        return self.shared.get_or_set(
+            self.generation_key(pk), time.time_ns,
+            timeout=settings.PAGE_CACHE_TIMEOUT,
+        )
+
+    def invalidate(self, pks=()):
+        """Сдвигает поколение списка и перечисленных объектов."""
+        self.shared.set_many(
+            {
+                self.generation_key(pk): time.time_ns()
+                for pk in (None, *pks)
+            },
+            timeout=settings.PAGE_CACHE_TIMEOUT,
+        )
+
+    def invalidate_all(self):
+        """Сдвигает общее поколение: устаревают все страницы."""
+        self.shared.set(
+            self.common_generation_key(), time.time_ns(),
+            timeout=settings.PAGE_CACHE_TIMEOUT,
+        )
+
+    def make_key(self, request, pk=None):
+        query = sorted(request.GET.lists())
+        digest = hashlib.md5(
+            repr((request.get_host(), request.path, query)).encode(),
+            usedforsecurity=False
+        ).hexdigest()
+        common, generation = self.get_generations(pk)
+        return (
+            f'{self.prefix}:page:{pk or "list"}:'
+            f'{common}:{generation}:{digest}'
+        )
+
+    def count(self, counter):
+        key = f'{self.prefix}:stats:{counter}'
+        try:
+            self.shared.incr(key)
+        except ValueError:
+            if not self.shared.add(key, 1, timeout=None):
+                self.shared.incr(key)
+
+    def stats(self):
+        keys = {
+            counter: f'{self.prefix}:stats:{counter}'
+            for counter in ('hits', 'misses')
+        }
+        values = self.shared.get_many(keys.values())
+        return {
+            counter: values.get(key, 0) for counter, key in keys.items()
+        }
+
+    def reset_stats(self):
+        self.shared.delete_many([
+            f'{self.prefix}:stats:{counter}'
+            for counter in ('hits', 'misses')
+        ])
+
+    def get(self, request, pk=None):
+        """(ключ, (данные, валидаторы) или None) с учётом в счётчиках."""
+        key = self.make_key(request, pk)
+        cached = self.cache.get(key)
+        self.count('misses' if cached is None else 'hits')
+        return key, cached
+
+    def set(self, key, data, validators):
+        self.cache.set(
+            key, (data, validators), settings.PAGE_CACHE_TIMEOUT
+        )
+
+    def cache_anonymous(self, action):
+        """Декоратор list/retrieve вьюсета.
+
+        Вместе с данными хранятся валидаторы ConditionalGetMixin,
+        так что и 304 из кэша отдаётся без запросов к БД.
+        """
+        @functools.wraps(action)
+        def wrapper(view, request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return action(view, request, *args, **kwargs)
+            key, cached = self.get(request, kwargs.get(view.lookup_field))
+            if cached is not None:
+                data, validators = cached
+                not_modified = view.conditional_response(
+                    request, *validators
+                )
+                if not_modified is not None:
+                    return not_modified
+                result = response.Response(data)
+                result['X-Cache'] = 'HIT'
+                return result
+            result = action(view, request, *args, **kwargs)
+            if result.status_code == status.HTTP_200_OK:
+                self.set(key, result.data, view.validators)
+            result['X-Cache'] = 'MISS'
+            return result
+        return wrapper
+
+
+recipe_page_cache = AnonymousPageCache('recipes')
@@ -1,13 +1,193 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 
+from django.core import exceptions
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-class UserPagination(PageNumberPagination):
+
+class AsyncPageNumberMixin:
+    """Асинхронный paginate_queryset для PageNumberPagination.
+
+    COUNT(*) и страница читаются через асинхронный ORM, а Paginator
+    получает готовое число записей, поэтому сам в БД не ходит.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.page.object_list = [
+            row async for row in self.page.object_list
+        ]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+
+class UserPagination(AsyncPageNumberMixin, PageNumberPagination):
+    page_size_query_param = 'limit'
+    max_page_size = 25
+    page_size = 6
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу (ordering_field, id) в порядке убывания.
+
+    Курсор хранит ключ последней записи страницы, следующая страница
+    выбирается условием WHERE по этому ключу, без OFFSET и COUNT(*),
+    поэтому любая страница стоит столько же, сколько первая.
+    """
+
+    cursor_query_param = 'cursor'
     page_size_query_param = 'limit'
     max_page_size = 25
     page_size = 6
+    ordering_field = 'pub_date'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, instance):
+        value = getattr(instance, self.ordering_field).isoformat()
+        return urlsafe_b64encode(
+            f'{value}|{instance.pk}'.encode()
+        ).decode()
 
+    def decode_cursor(self, queryset, cursor):
+        try:
+            value, pk = urlsafe_b64decode(cursor.encode()).decode().split('|')
+            field = queryset.model._meta.get_field(self.ordering_field)
+            return field.to_python(value), int(pk)
+        except (
+            ValueError, UnicodeDecodeError, exceptions.ValidationError
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_page_queryset(self, queryset, request):
+        """Запрос страницы с одной лишней записью для признака next."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(
+            f'-{self.ordering_field}', '-pk'
+        )
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(queryset, cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.ordering_field}__lt': value})
+                | Q(**{self.ordering_field: value, 'pk__lt': pk})
+            )
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(
+            list(self.get_page_queryset(queryset, request))
+        )
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.last),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class RecipePagination(AsyncPageNumberMixin, PageNumberPagination):
+    """Постраничная пагинация с включаемым режимом курсора.
+
+    По умолчанию работает как раньше (page/limit и count) для текущего
+    фронтенда. Параметры ``cursor`` или ``pagination=cursor`` включают
+    KeysetPagination. Курсор держит только (pub_date, id), поэтому
+    с фильтрами, которые сортируют по релевантности (search, have),
+    он отклоняется: следующая страница потеряла бы порядок.
+    """
 
-class RecipePagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 25
     page_size = 6
+    keyset_class = KeysetPagination
+    keyset = None
+    ranked_query_params = ('search', 'have')
+    ranked_cursor_message = (
+        'Cursor pagination is not available with {params}, '
+        'use page numbers.'
+    )
+
+    def use_keyset(self, request):
+        if not (
+            self.keyset_class.cursor_query_param in request.query_params
+            or request.query_params.get('pagination') == 'cursor'
+        ):
+            return False
+        ranked = [
+            param for param in self.ranked_query_params
+            if request.query_params.get(param)
+        ]
+        if ranked:
+            raise ValidationError({
+                'pagination': self.ranked_cursor_message.format(
+                    params=', '.join(ranked)
+                )
+            })
+        return True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_keyset(request):
+            return super().paginate_queryset(queryset, request, view)
+        self.keyset = self.keyset_class()
+        return self.keyset.paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if not self.use_keyset(request):
+            return await super().apaginate_queryset(queryset, request, view)
+        self.keyset = self.keyset_class()
+        return await self.keyset.apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
@@ -1,6 +1,13 @@
+from django.conf import settings
 from django_filters import rest_framework as filters
 
 from recipes.models import Recipe
+from recipes.pantry import cook_from
+from recipes.search import search_recipes, search_terms
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
@@ -10,13 +17,28 @@ class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(
         method='filter_favorited'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
+    # «Приготовить из того, что есть»: have=1,5,9&missing_max=2
+    have = NumberInFilter(
+        method='filter_have'
+    )
+    missing_max = filters.NumberFilter(
+        method='filter_missing_max',
+        min_value=0,
+        max_value=settings.PANTRY_MAX_MISSING,
+    )
 
     class Meta:
         model = Recipe
         fields = (
             'author',
             'is_in_shopping_cart',
-            'is_favorited'
+            'is_favorited',
+            'search',
+            'have',
+            'missing_max',
         )
 
     def filter_favorited(self, queryset, name, value):
@@ -32,3 +54,19 @@ class RecipeFilter(filters.FilterSet):
                 return queryset.filter(shopping_cart__user=self.request.user)
             return queryset.none()
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        terms = search_terms(value)
+        if not terms:
+            return queryset
+        return search_recipes(queryset, terms)
+
+    def filter_have(self, queryset, name, value):
+        missing_max = self.form.cleaned_data.get('missing_max') or 0
+        return cook_from(
+            queryset, [int(pk) for pk in value], int(missing_max)
+        )
+
+    def filter_missing_max(self, queryset, name, value):
+        # Учитывается в filter_have, без have ничего не меняет
+        return queryset
@@ -30,9 +30,12 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
     'cart.apps.CartConfig',
+    'feed.apps.FeedConfig',
+    'profiling.apps.ProfilingConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram_config.sql_budget.SQLBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,9 +43,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'profiling.middleware.ProfilerMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram_config.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'foodgram_config.urls')
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -64,10 +68,35 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram_config.wsgi.application'
 
+# Профиль SQLite для нескольких воркеров: WAL (читатели не ждут
+# писателя), synchronous=NORMAL (в WAL не теряет целостность), кэш
+# страниц 64 МБ, mmap 256 МБ и ожидание блокировки вместо ошибки.
+# Пустое значение переменной оставляет умолчание SQLite
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'normal'),
+    'cache_size': os.getenv('SQLITE_CACHE_SIZE', '-64000'),
+    'mmap_size': os.getenv('SQLITE_MMAP_SIZE', '268435456'),
+    'busy_timeout': os.getenv('SQLITE_BUSY_TIMEOUT', '5000'),
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'memory'),
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': 'foodgram_config.sqlite',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Постоянные соединения; asgi.py по умолчанию выставляет 0
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': {
+                pragma: value
+                for pragma, value in SQLITE_PRAGMAS.items() if value
+            },
+            'transaction_mode': os.getenv(
+                'SQLITE_TRANSACTION_MODE', 'IMMEDIATE'
+            ),
+        },
     }
 }
 
@@ -97,7 +126,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.AllowAny',),
 }
@@ -121,4 +150,127 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Наибольшая сторона уменьшенных копий картинок, px
+IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'card': 600,
+    'full': 1600,
+}
+
+# Форматы копий в порядке предпочтения (те, что умеет Pillow): основная
+# ссылка ведёт на JPEG, остальные отдаются в *_sources
+IMAGE_VARIANT_FORMATS = ('avif', 'webp', 'jpeg')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Поиск рецептов через FTS5; False — icontains по названию и описанию
+RECIPE_SEARCH_FTS = os.getenv('RECIPE_SEARCH_FTS', 'True').lower() == 'true'
+
+# Поиск «из того, что есть»: обратный индекс в памяти процесса
+PANTRY_INDEX_TTL = int(os.getenv('PANTRY_INDEX_TTL', 300))
+
+PANTRY_MAX_MISSING = int(os.getenv('PANTRY_MAX_MISSING', 10))
+
+PANTRY_MAX_RESULTS = int(os.getenv('PANTRY_MAX_RESULTS', 1000))
+
+# Похожие рецепты: соседей на рецепт и длина столбца матрицы,
+# по которому ищутся кандидаты (update_similar_recipes)
+SIMILAR_RECIPES_COUNT = int(os.getenv('SIMILAR_RECIPES_COUNT', 10))
+
+SIMILAR_RECIPES_POSTINGS = int(os.getenv('SIMILAR_RECIPES_POSTINGS', 500))
+
+# Сколько рецептов можно добавить в избранное или корзину одним запросом
+BULK_RECIPES_MAX = int(os.getenv('BULK_RECIPES_MAX', 100))
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+
+# Кэш ответов для анонимов. Тела ответов лежат в памяти процесса: ключ
+# включает поколение, так что устаревшее тело не найдётся. Поколения
+# и счётчики должны быть общими для всех процессов, иначе сохранение
+# рецепта сбросит кэш только в одном из них: по умолчанию это файловый
+# кэш на машине, для нескольких машин — Redis или Memcached
+# через PAGE_GENERATION_CACHE_BACKEND
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'pages': {
+        'BACKEND': os.getenv(
+            'PAGE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('PAGE_CACHE_LOCATION', 'foodgram-pages'),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'page_generations': {
+        'BACKEND': os.getenv(
+            'PAGE_GENERATION_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        # Файлы кэша — pickle: каталог должен принадлежать только
+        # приложению, общий временный каталог для этого не годится
+        'LOCATION': os.getenv(
+            'PAGE_GENERATION_CACHE_LOCATION',
+            BASE_DIR / 'cache' / 'page-generations',
+        ),
+    },
+    'tokens': {
+        'BACKEND': os.getenv(
+            'TOKEN_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('TOKEN_CACHE_LOCATION', 'foodgram-tokens'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+PAGE_CACHE_ALIAS = 'pages'
+
+PAGE_GENERATION_CACHE_ALIAS = 'page_generations'
+
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 600))
+
+# Кэш токенов авторизации. В бэкенде лежат только хэши ключей и id
+# пользователей. При нескольких процессах он должен быть общим (Redis,
+# Memcached через TOKEN_CACHE_BACKEND), иначе выход и смена пароля
+# выселят токен только в одном из них; locmem без DEBUG отмечает
+# предупреждение users.W001
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS', 'tokens')
+
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+
+# Сколько пользователей по токенам держать в памяти процесса
+TOKEN_USER_CACHE_SIZE = int(os.getenv('TOKEN_USER_CACHE_SIZE', 10000))
+
+# Учёт SQL на запрос: доля учитываемых запросов (без DEBUG — малая,
+# учёт замедляет каждый запрос к БД), заголовки Server-Timing/X-DB-*
+# (только при DEBUG и для staff) и порог, сверх которого запрос пишется
+# в журнал
+SQL_BUDGET_SAMPLE_RATE = float(
+    os.getenv('SQL_BUDGET_SAMPLE_RATE', 1 if DEBUG else 0.01)
+)
+
+SQL_BUDGET_HEADERS = (
+    os.getenv('SQL_BUDGET_HEADERS', 'True').lower() == 'true'
+)
+
+SQL_BUDGET_MAX_QUERIES = int(os.getenv('SQL_BUDGET_MAX_QUERIES', 20))
+
+SQL_BUDGET_MAX_TIME_MS = float(os.getenv('SQL_BUDGET_MAX_TIME_MS', 200))
+
+# Профилирование запросов под WSGI: заголовок X-Profile от staff или доля
+# всех запросов; файлы pstats и collapsed хранятся в PROFILER_DIR
+PROFILER_DIR = os.getenv('PROFILER_DIR', BASE_DIR / 'profiles')
+
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+
+PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', 0.005))
+
+PROFILER_KEEP = int(os.getenv('PROFILER_KEEP', 50))
@@ -0,0 +1,199 @@
+import contextlib
+import contextvars
+import logging
+import random
+import time
+from collections import Counter
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async
+)
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('foodgram.sql_budget')
+
+# Активные записи текущего запроса; ContextVar переходит и в потоки
+# sync_to_async, поэтому запросы async-представлений тоже учитываются
+recorders = contextvars.ContextVar('sql_budget_recorders', default=())
+
+
+class QueryRecorder:
+    """Счётчики SQL одного запроса или блока кода.
+
+    Одинаковые тексты запросов (параметры не входят в текст)
+    группируются: повторы одного запроса — признак N+1.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = (0.0, '')
+        self.statements = Counter()
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[sql] += 1
+        if duration > self.slowest[0]:
+            self.slowest = (duration, sql)
+
+    @property
+    def duplicates(self):
+        """Повторы: (число выполнений, текст), начиная с частых."""
+        return [
+            (count, sql)
+            for sql, count in self.statements.most_common()
+            if count > 1
+        ]
+
+    @property
+    def repeated(self):
+        """Сколько запросов лишние: всё сверх первого в каждой группе."""
+        return sum(count - 1 for count, _ in self.duplicates)
+
+    def summary(self):
+        duplicates = '; '.join(
+            f'{count}× {sql[:120]}' for count, sql in self.duplicates[:3]
+        )
+        return (
+            f'{self.count} запросов, {self.duration * 1000:.1f} мс, '
+            f'самый долгий {self.slowest[0] * 1000:.1f} мс: '
+            f'{self.slowest[1][:200]}'
+            + (f'; повторы: {duplicates}' if duplicates else '')
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    active = recorders.get()
+    if not active:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for recorder in active:
+            recorder.add(sql, duration)
+
+
+def install(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Соединения каждого потока получают обёртку при открытии
+connection_created.connect(install, dispatch_uid='sql_budget_install')
+
+
+@contextlib.contextmanager
+def recording():
+    """Записывает все SQL-запросы внутри блока."""
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+    recorder = QueryRecorder()
+    token = recorders.set((*recorders.get(), recorder))
+    try:
+        yield recorder
+    finally:
+        recorders.reset(token)
+
+
+@contextlib.contextmanager
+def assert_sql_budget(queries=None, duplicates=0, milliseconds=None):
+    """Проверка бюджета эндпоинта в тестах.
+
+    ``duplicates`` — сколько повторов одного текста запроса допустимо;
+    ``None`` в любом пороге отключает проверку.
+    """
+    with recording() as recorder:
+        yield recorder
+    problems = []
+    if queries is not None and recorder.count > queries:
+        problems.append(f'запросов {recorder.count} > {queries}')
+    if duplicates is not None and recorder.repeated > duplicates:
+        problems.append(f'повторов {recorder.repeated} > {duplicates}')
+    if milliseconds is not None and recorder.duration * 1000 > milliseconds:
+        problems.append(
+            f'время SQL {recorder.duration * 1000:.1f} > {milliseconds} мс'
+        )
+    if problems:
+        raise AssertionError(
+            f'Бюджет SQL превышен ({", ".join(problems)}): '
+            f'{recorder.summary()}'
+        )
+
+
+class SQLBudgetMiddleware:
+    """Учёт SQL на запрос: заголовки ответа и журнал превышений.
+
+    Учитывается доля запросов ``SQL_BUDGET_SAMPLE_RATE``; у остальных
+    обёртка курсора сводится к чтению пустого ContextVar. Заголовки
+    ``Server-Timing`` и ``X-DB-*`` включаются ``SQL_BUDGET_HEADERS`` и
+    отдаются только при DEBUG или staff-пользователю. Запросы сверх
+    ``SQL_BUDGET_MAX_QUERIES`` запросов или ``SQL_BUDGET_MAX_TIME_MS``
+    миллисекунд SQL пишутся в журнал ``foodgram.sql_budget``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        with recording() as recorder:
+            response = self.get_response(request)
+        headers = settings.SQL_BUDGET_HEADERS and (
+            settings.DEBUG or self.is_staff(request)
+        )
+        return self.report(request, response, recorder, headers)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        with recording() as recorder:
+            response = await self.get_response(request)
+        # Пользователь из сессии ленивый и читается из БД
+        headers = settings.SQL_BUDGET_HEADERS and (
+            settings.DEBUG or await sync_to_async(self.is_staff)(request)
+        )
+        return self.report(request, response, recorder, headers)
+
+    @staticmethod
+    def sampled():
+        rate = settings.SQL_BUDGET_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+    @staticmethod
+    def is_staff(request):
+        # DRF записывает пользователя по токену и в исходный запрос
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def report(self, request, response, recorder, headers):
+        if headers:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.2f};'
+                f'desc="{recorder.count} queries"'
+            )
+            response['X-DB-Queries'] = recorder.count
+            response['X-DB-Time'] = f'{recorder.duration * 1000:.2f}'
+            response['X-DB-Slowest'] = f'{recorder.slowest[0] * 1000:.2f}'
+            response['X-DB-Duplicates'] = recorder.repeated
+        if (
+            recorder.count > settings.SQL_BUDGET_MAX_QUERIES
+            or recorder.duration * 1000 > settings.SQL_BUDGET_MAX_TIME_MS
+        ):
+            logger.warning(
+                'Бюджет SQL превышен: %s %s — %s',
+                request.method, request.path, recorder.summary()
+            )
+        return response
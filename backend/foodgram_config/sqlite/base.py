@@ -0,0 +1,39 @@
+"""SQLite-бэкенд с PRAGMA и режимом транзакций из настроек.
+
+В OPTIONS, помимо параметров sqlite3.connect, понимает:
+
+* ``pragmas`` — словарь PRAGMA, выполняемых на каждом новом
+  соединении (journal_mode, synchronous, cache_size, ...);
+* ``transaction_mode`` — DEFERRED, IMMEDIATE или EXCLUSIVE для BEGIN
+  в atomic. IMMEDIATE берёт блокировку записи сразу, поэтому
+  конкурирующие записи ждут busy_timeout, а не падают с
+  «database is locked» при повышении блокировки чтения до записи.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.transaction_mode = kwargs.pop(
+            'transaction_mode', 'DEFERRED'
+        ).upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode должен быть одним из {TRANSACTION_MODES}'
+            )
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
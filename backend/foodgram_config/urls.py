@@ -8,6 +8,7 @@ from api.views import (
     UserViewSet, IngredientViewSet, LogoutView,
     ObtainAuthToken, RecipeViewSet
 )
+from recipes.views import short_link_redirect
 
 router = DefaultRouter()
 router.register("users", UserViewSet, basename="users")
@@ -19,6 +20,7 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/auth/token/logout/', LogoutView.as_view(), name='logout'),
     path('api/auth/token/login/', ObtainAuthToken.as_view(), name='login'),
+    path('r/<str:code>', short_link_redirect, name='short-link'),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
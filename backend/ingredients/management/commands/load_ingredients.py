@@ -0,0 +1,49 @@
+from django.db import transaction
+
+from foodgram_config.loaders import BulkLoadCommand
+from ingredients.models import Ingredient
+from ingredients.search import ingredient_index
+
+
+class Command(BulkLoadCommand):
+    help = (
+        'Загружает ингредиенты из CSV (название,единица измерения) '
+        'или JSON ([{"name": ..., "measurement_unit": ...}]). '
+        'Уже существующие пары название/единица пропускаются.'
+    )
+
+    def parse_rows(self, records):
+        for record in records:
+            if isinstance(record, dict):
+                name = record['name']
+                measurement_unit = record['measurement_unit']
+            else:
+                name, measurement_unit = record
+            yield name.strip(), measurement_unit.strip()
+
+    def load_batch(self, batch):
+        # Дубли ищутся одним запросом на пачку: память не растёт
+        # ни с базой, ни с файлом
+        known = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in batch}
+            ).values_list('name', 'measurement_unit')
+        )
+        ingredients = []
+        for name, measurement_unit in batch:
+            if (name, measurement_unit) in known:
+                continue
+            known.add((name, measurement_unit))
+            ingredients.append(
+                Ingredient(name=name, measurement_unit=measurement_unit)
+            )
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(ingredients)
+        return len(ingredients)
+
+    def handle(self, *args, **options):
+        try:
+            super().handle(*args, **options)
+        finally:
+            # bulk_create не отправляет сигналы post_save
+            ingredient_index.invalidate()
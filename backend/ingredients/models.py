@@ -8,6 +8,9 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=100, verbose_name='Единица измерения'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Дата изменения'
+    )
 
     class Meta:
         verbose_name = 'ингредиент'
@@ -0,0 +1,136 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ingredients.models import Ingredient
+
+# Длина самых длинных подстрок в индексе: запрос проверяется только
+# на рецептах из самого короткого списка его подстрок такой длины
+GRAM_SIZE = 3
+
+
+def grams(text, size=GRAM_SIZE):
+    """Подстроки ``text`` длины ``size`` (или сам текст, если он короче)."""
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def normalize(text):
+    """Приводит строку к виду для сравнения без учёта регистра.
+
+    casefold корректно складывает кириллицу, а «ё» приравнивается к «е»,
+    как её обычно и набирают.
+    """
+    return text.casefold().replace('ё', 'е').strip()
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Индекс строится лениво при первом поиске, сбрасывается сигналами
+    при изменении ``Ingredient`` и дополнительно устаревает через
+    ``INGREDIENT_INDEX_TTL`` секунд, чтобы подхватить изменения,
+    сделанные другими процессами.
+
+    Префиксы ищутся бинарным поиском по ключам, вхождения в середину
+    слова — по спискам n-грамм (подстрок длиной 1–3 символа), так что
+    поиск проверяет только ключи, содержащие самую редкую n-грамму
+    запроса, а не весь каталог.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.built_at = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'INGREDIENT_INDEX_TTL', 300)
+
+    def invalidate(self):
+        self.index = None
+
+    def is_expired(self):
+        return time.monotonic() - self.built_at > self.ttl
+
+    def build(self):
+        rows = sorted(
+            Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit', 'updated_at'
+            ),
+            key=lambda row: (normalize(row[1]), row[0])
+        )
+        keys = [normalize(name) for _, name, _, _ in rows]
+        entries = tuple(
+            Ingredient(
+                id=pk,
+                name=name,
+                measurement_unit=measurement_unit,
+                updated_at=updated_at,
+            )
+            for pk, name, measurement_unit, updated_at in rows
+        )
+        # Версия каталога: меняется при добавлении, изменении и удалении
+        version = (
+            len(rows),
+            max((row[3] for row in rows), default=None),
+        )
+        postings = defaultdict(list)
+        for position, key in enumerate(keys):
+            for size in range(1, GRAM_SIZE + 1):
+                for gram in grams(key, size):
+                    postings[gram].append(position)
+        self.index = (keys, entries, version, dict(postings))
+        self.built_at = time.monotonic()
+        return self.index
+
+    def get_index(self):
+        index = self.index
+        if index is None or self.is_expired():
+            with self.lock:
+                index = self.index
+                if index is None or self.is_expired():
+                    index = self.build()
+        return index
+
+    async def aget_index(self):
+        """get_index для async-представлений: сборка уходит в поток."""
+        index = self.index
+        if index is None or self.is_expired():
+            index = await sync_to_async(self.get_index)()
+        return index
+
+    @property
+    def version(self):
+        return self.get_index()[2]
+
+    def search(self, query):
+        return self.find(self.get_index(), query)
+
+    @staticmethod
+    def find(index, query):
+        """Ингредиенты, начинающиеся с ``query``, затем содержащие его."""
+        keys, entries, _, postings = index
+        query = normalize(query)
+        if not query:
+            return list(entries)
+        start = position = bisect_left(keys, query)
+        while position < len(keys) and keys[position].startswith(query):
+            position += 1
+        prefix_matches = entries[start:position]
+        candidates = min(
+            (postings.get(gram, ()) for gram in grams(query)), key=len
+        )
+        substring_matches = [
+            entries[i] for i in candidates
+            if not start <= i < position and query in keys[i]
+        ]
+        return [*prefix_matches, *substring_matches]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram_config.page_cache import recipe_page_cache
+from ingredients.models import Ingredient
+from ingredients.search import ingredient_index
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+    # Названия и единицы из каталога есть в каждом закэшированном рецепте
+    recipe_page_cache.invalidate_all()
@@ -1,3 +1,120 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from foodgram_config.loaders import iter_json
+
+from ingredients.models import Ingredient
+from ingredients.search import ingredient_index
+
+
+class IngredientAutocompleteTest(TestCase):
+    url = '/api/ingredients/'
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'Соль', 'соль морская', 'Фасоль', 'Сахар', 'Ванильный сахар',
+                'Ёжевика', 'salt',
+            )
+        )
+
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def search(self, name):
+        response = self.client.get(self.url, {'name': name})
+        return [item['name'] for item in response.data]
+
+    def test_cyrillic_case_folding(self):
+        self.assertEqual(
+            self.search('СОЛ'), ['Соль', 'соль морская', 'Фасоль']
+        )
+        self.assertEqual(self.search('SAL'), ['salt'])
+
+    def test_prefix_matches_go_first(self):
+        self.assertEqual(self.search('сах'), ['Сахар', 'Ванильный сахар'])
+
+    def test_yo_matches_ye(self):
+        self.assertEqual(self.search('еж'), ['Ёжевика'])
+
+    def test_substring_matches_use_ngrams(self):
+        self.assertEqual(
+            self.search('оль'), ['Соль', 'соль морская', 'Фасоль']
+        )
+        self.assertEqual(self.search('ильный сах'), ['Ванильный сахар'])
+        self.assertEqual(self.search('ж'), ['Ёжевика'])
+        self.assertEqual(self.search('олх'), [])
+
+    def test_search_does_not_hit_database(self):
+        self.search('с')
+        with self.assertNumQueries(0):
+            self.search('са')
+
+    def test_index_follows_changes(self):
+        self.search('с')
+        ingredient = Ingredient.objects.create(
+            name='Сода', measurement_unit='г'
+        )
+        self.assertIn('Сода', self.search('сод'))
+        ingredient.delete()
+        self.assertEqual(self.search('сод'), [])
+
+
+class IterJsonTest(SimpleTestCase):
+    items = [{'name': f'ингредиент {i}', 'measurement_unit': 'г'}
+             for i in range(50)]
+
+    def test_array_read_in_small_chunks(self):
+        file = io.StringIO(json.dumps(self.items, ensure_ascii=False))
+        self.assertEqual(list(iter_json(file, chunk_size=7)), self.items)
+
+    def test_json_lines(self):
+        file = io.StringIO('\n'.join(json.dumps(item) for item in self.items))
+        self.assertEqual(list(iter_json(file, chunk_size=5)), self.items)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json(io.StringIO(' [ ] '))), [])
+
+    def test_broken_json(self):
+        with self.assertRaises(ValueError):
+            list(iter_json(io.StringIO('[{"name": "соль"'), chunk_size=4))
+
+
+class LoadIngredientsTest(TestCase):
+
+    def load(self, content, suffix):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, encoding='utf-8'
+        ) as file:
+            file.write(content)
+            file.flush()
+            call_command(
+                'load_ingredients', file.name,
+                batch_size=2, stdout=io.StringIO()
+            )
+
+    def test_load_csv_skips_duplicates(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        self.load('соль,г\nсахар,г\nсахар,г\nсахар,кг\n\nмука,г\n', '.csv')
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            )),
+            [('мука', 'г'), ('сахар', 'г'), ('сахар', 'кг'), ('соль', 'г')]
+        )
+
+    def test_load_json(self):
+        self.load(json.dumps([
+            {'name': 'соль', 'measurement_unit': 'г'},
+            {'name': 'перец', 'measurement_unit': 'щепотка'},
+            {'name': 'соль', 'measurement_unit': 'г'},
+        ]), '.json')
+        self.assertEqual(Ingredient.objects.count(), 2)
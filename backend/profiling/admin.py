@@ -0,0 +1,71 @@
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from profiling.models import RequestProfile
+from profiling.profiler import top_functions
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created', 'method', 'path', 'status_code', 'duration', 'user',
+        'downloads',
+    )
+    list_filter = ('method', 'status_code')
+    search_fields = ('path', 'user__username')
+    readonly_fields = (
+        'name', 'created', 'method', 'path', 'status_code', 'duration',
+        'samples', 'user', 'downloads', 'display_top_functions',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/<str:kind>/',
+                self.admin_site.admin_view(self.download),
+                name='profiling_requestprofile_download',
+            ),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        profile = self.get_object(request, pk)
+        if profile is None or kind not in RequestProfile.KINDS:
+            raise Http404
+        file_path = profile.file_path(kind)
+        if not file_path.exists():
+            raise Http404
+        return FileResponse(
+            file_path.open('rb'), as_attachment=True, filename=file_path.name
+        )
+
+    @admin.display(description='Файлы')
+    def downloads(self, obj):
+        return format_html_join(
+            ' ',
+            '<a href="{}">{}</a>',
+            (
+                (
+                    reverse(
+                        'admin:profiling_requestprofile_download',
+                        args=(obj.pk, kind),
+                    ),
+                    kind,
+                )
+                for kind in RequestProfile.KINDS
+            ),
+        )
+
+    @admin.display(description='Самые дорогие функции')
+    def display_top_functions(self, obj):
+        file_path = obj.file_path('pstats')
+        if not file_path.exists():
+            return '-'
+        return format_html('<pre>{}</pre>', top_functions(file_path))
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ProfilingConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'profiling'
+    verbose_name = 'Профилирование'
+
+    def ready(self):
+        import profiling.signals  # noqa: F401
@@ -0,0 +1,109 @@
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework import exceptions
+
+from profiling.profiler import Capture
+from users.authentication import CachedTokenAuthentication
+
+# Заголовок X-Profile в META
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+class ProfilerMiddleware:
+    """Профилирует запрос по заголовку X-Profile или по выборке.
+
+    Заголовок действует только для staff: по сессии админки или по
+    токену. Кроме того, доля ``PROFILER_SAMPLE_RATE`` всех запросов
+    профилируется без заголовка. Профиль пишется в ``PROFILER_DIR``,
+    его имя возвращается в заголовке ``X-Profile-Name``, список
+    снятых профилей — в админке.
+    Без заголовка и при нулевой доле это одна проверка словаря.
+
+    Под ASGI профиль не снимается: все запросы делят поток цикла
+    событий, и профиль смешал бы их между собой, а синхронные
+    представления из потоков sync_to_async в него не попали бы.
+    Вместо профиля ответ получает заголовок ``X-Profile-Unavailable``.
+    """
+
+    sync_capable = True
+    async_capable = True
+    authentication = CachedTokenAuthentication()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.requested(request):
+            return self.get_response(request)
+        user = self.get_staff_user(request)
+        if user is None and not self.sampled():
+            return self.get_response(request)
+        capture = Capture()
+        capture.start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            capture.stop()
+            raise
+        response['X-Profile-Name'] = capture.name
+        if response.streaming:
+            # Тело потокового ответа (выгрузка списка покупок) строится
+            # при отдаче, профиль снимается до конца итерации
+            response.streaming_content = self.profile_stream(
+                response.streaming_content, capture, request,
+                response, user,
+            )
+            return response
+        capture.stop()
+        return self.finish(capture, request, response, user)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if PROFILE_HEADER in request.META:
+            response['X-Profile-Unavailable'] = 'asgi'
+        return response
+
+    @staticmethod
+    def sampled():
+        rate = settings.PROFILER_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def requested(self, request):
+        return (
+            PROFILE_HEADER in request.META
+            or settings.PROFILER_SAMPLE_RATE > 0
+        )
+
+    def get_staff_user(self, request):
+        """Staff-пользователь из сессии или токена либо None."""
+        if PROFILE_HEADER not in request.META:
+            return None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            return user
+        words = request.headers.get('Authorization', '').split()
+        if len(words) != 2 or words[0] != 'Token':
+            return None
+        try:
+            user, _ = self.authentication.authenticate_credentials(words[1])
+        except exceptions.AuthenticationFailed:
+            return None
+        return user if user.is_staff else None
+
+    def profile_stream(self, content, capture, request, response, user):
+        try:
+            yield from content
+        finally:
+            capture.stop()
+            self.finish(capture, request, response, user)
+
+    @staticmethod
+    def finish(capture, request, response, user):
+        capture.save(request, response.status_code, user)
+        return response
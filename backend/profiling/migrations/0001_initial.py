@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 20:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='имя файлов')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='снят')),
+                ('method', models.CharField(max_length=10, verbose_name='метод')),
+                ('path', models.CharField(max_length=500, verbose_name='путь')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='статус')),
+                ('duration', models.FloatField(verbose_name='длительность, мс')),
+                ('samples', models.PositiveIntegerField(verbose_name='сэмплов стека')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'профиль запроса',
+                'verbose_name_plural': 'профили запросов',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
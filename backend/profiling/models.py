@@ -0,0 +1,57 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.db import models
+
+from users.models import User
+
+
+class RequestProfile(models.Model):
+    """Снятый профиль одного запроса; файлы лежат в PROFILER_DIR."""
+    KINDS = ('pstats', 'collapsed')
+
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='имя файлов',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='снят',
+    )
+    method = models.CharField(
+        max_length=10,
+        verbose_name='метод',
+    )
+    path = models.CharField(
+        max_length=500,
+        verbose_name='путь',
+    )
+    status_code = models.PositiveSmallIntegerField(
+        verbose_name='статус',
+    )
+    duration = models.FloatField(
+        verbose_name='длительность, мс',
+    )
+    samples = models.PositiveIntegerField(
+        verbose_name='сэмплов стека',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_profiles',
+        verbose_name='пользователь',
+    )
+
+    class Meta:
+        verbose_name = 'профиль запроса'
+        verbose_name_plural = 'профили запросов'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.method} {self.path} {self.created:%Y-%m-%d %H:%M:%S}'
+
+    def file_path(self, kind):
+        return Path(settings.PROFILER_DIR) / f'{self.name}.{kind}'
@@ -0,0 +1,117 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from profiling.models import RequestProfile
+
+
+def frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', code.co_filename)
+    # co_qualname появился в Python 3.11
+    return f'{module}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+class StackSampler(threading.Thread):
+    """Сэмплирует стек одного потока раз в ``interval`` секунд.
+
+    Стеки копятся в формате collapsed (``a;b;c <число>``), который
+    понимают flamegraph.pl, speedscope и inferno.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+class Capture:
+    """Профиль запроса: cProfile и сэмплер стека текущего потока.
+
+    cProfile даёт точные счётчики вызовов (pstats), сэмплер — стеки
+    для flamegraph. Профилируется только поток, где вызван ``start``,
+    поэтому ProfilerMiddleware снимает профили только под WSGI.
+    """
+
+    def __init__(self):
+        self.name = (
+            f'{timezone.now():%Y%m%d-%H%M%S}-'
+            f'{get_random_string(6).lower()}'
+        )
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(
+            threading.get_ident(), settings.PROFILER_INTERVAL
+        )
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+
+    def save(self, request, status_code, user=None):
+        """Пишет файлы и запись для админки, старые профили удаляет."""
+        directory = Path(settings.PROFILER_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        profile = RequestProfile(
+            name=self.name,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            status_code=status_code,
+            duration=self.duration * 1000,
+            samples=sum(self.sampler.stacks.values()),
+            user=user,
+        )
+        self.profiler.dump_stats(profile.file_path('pstats'))
+        profile.file_path('collapsed').write_text(
+            self.sampler.collapsed(), encoding='utf-8'
+        )
+        profile.save()
+        stale = RequestProfile.objects.values_list('pk', flat=True)[
+            settings.PROFILER_KEEP:
+        ]
+        # post_delete на каждый объект удаляет и файлы
+        RequestProfile.objects.filter(pk__in=list(stale)).delete()
+        return profile
+
+
+def top_functions(path, limit=30):
+    """Текстовая сводка pstats по кумулятивному времени."""
+    output = io.StringIO()
+    stats = pstats.Stats(str(path), stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return output.getvalue()
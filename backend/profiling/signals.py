@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from profiling.models import RequestProfile
+
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_files(sender, instance, **kwargs):
+    for kind in RequestProfile.KINDS:
+        instance.file_path(kind).unlink(missing_ok=True)
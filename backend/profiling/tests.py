@@ -0,0 +1,179 @@
+import pstats
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from cart.models import ShoppingCart
+from cart.services import add_to_shopping_list
+from ingredients.models import Ingredient
+from profiling.models import RequestProfile
+from profiling.profiler import StackSampler
+from recipes.models import Recipe, RecipeIngredient
+from users.models import User
+
+PROFILER_DIR = tempfile.mkdtemp()
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@override_settings(PROFILER_DIR=PROFILER_DIR, PROFILER_SAMPLE_RATE=0)
+class ProfilerMiddlewareTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='staff@example.com',
+            username='staff',
+            first_name='Сотрудник',
+            last_name='Тестовый',
+            password='password',
+            is_staff=True,
+        )
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Пользователь',
+            last_name='Тестовый',
+            password='password',
+        )
+        cls.staff_token = Token.objects.create(user=cls.staff)
+        cls.user_token = Token.objects.create(user=cls.user)
+        recipe = Recipe.objects.create(
+            author=cls.user,
+            name='рецепт',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe,
+            ingredient=Ingredient.objects.create(
+                name='мука', measurement_unit='г'
+            ),
+            amount=100,
+        )
+        ShoppingCart.objects.create(user=cls.staff, recipe=recipe)
+        add_to_shopping_list(cls.staff.id, recipe.id)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILER_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, url, token=None, profile=True):
+        headers = {'HTTP_X_PROFILE': '1'} if profile else {}
+        if token is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        return self.client.get(url, **headers)
+
+    def test_staff_request_profiled(self):
+        response = self.get('/api/users/subscriptions/', self.staff_token)
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Name'], profile.name)
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.path, '/api/users/subscriptions/')
+        self.assertTrue(profile.file_path('collapsed').exists())
+        stats = pstats.Stats(str(profile.file_path('pstats')))
+        self.assertTrue(any(
+            name == 'subscriptions' for _, _, name in stats.stats
+        ))
+
+    def test_header_ignored_for_non_staff(self):
+        for token in (None, self.user_token):
+            response = self.get('/api/recipes/', token)
+            self.assertNotIn('X-Profile-Name', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_no_header_not_profiled(self):
+        response = self.get('/api/recipes/', self.staff_token, profile=False)
+        self.assertNotIn('X-Profile-Name', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILER_SAMPLE_RATE=1)
+    def test_sampled_without_header(self):
+        self.get('/api/recipes/', profile=False)
+        profile = RequestProfile.objects.get()
+        self.assertIsNone(profile.user)
+
+    def test_streaming_response_profiled_to_the_end(self):
+        response = self.get(
+            '/api/recipes/download_shopping_cart/', self.staff_token
+        )
+        self.assertFalse(RequestProfile.objects.exists())
+        self.assertIn('Мука', b''.join(response.streaming_content).decode())
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Name'], profile.name)
+
+    @override_settings(
+        PROFILER_SAMPLE_RATE=1, ROOT_URLCONF='foodgram_config.asgi_urls'
+    )
+    async def test_not_profiled_under_asgi(self):
+        for url in ('/api/recipes/', '/api/recipes/download_shopping_cart/'):
+            response = await self.async_client.get(
+                url,
+                headers={
+                    'X-Profile': '1',
+                    'Authorization': f'Token {self.staff_token.key}',
+                },
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Name', response)
+            self.assertEqual(response['X-Profile-Unavailable'], 'asgi')
+        self.assertFalse(await RequestProfile.objects.aexists())
+
+    @override_settings(PROFILER_KEEP=2)
+    def test_old_profiles_pruned(self):
+        for _ in range(3):
+            self.get('/api/recipes/', self.staff_token)
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        self.assertEqual(len(list(Path(PROFILER_DIR).iterdir())), 4)
+
+    def test_admin_lists_and_downloads(self):
+        self.get('/api/recipes/', self.staff_token)
+        profile = RequestProfile.objects.get()
+        admin = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            first_name='Админ',
+            last_name='Тестовый',
+            password='password',
+        )
+        self.client.force_login(admin)
+        response = self.client.get('/admin/profiling/requestprofile/')
+        self.assertContains(response, '/api/recipes/')
+        response = self.client.get(
+            f'/admin/profiling/requestprofile/{profile.pk}/change/'
+        )
+        self.assertContains(response, 'cumulative')
+        response = self.client.get(
+            f'/admin/profiling/requestprofile/{profile.pk}'
+            '/download/collapsed/'
+        )
+        self.assertEqual(response.status_code, 200)
+        profile.delete()
+        self.assertFalse(profile.file_path('pstats').exists())
+
+
+class StackSamplerTest(APITestCase):
+
+    def test_collapsed_stacks(self):
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy(0.05)
+        sampler.stop()
+        collapsed = sampler.collapsed()
+        self.assertIn('profiling.tests:busy', collapsed)
+        stack, count = collapsed.splitlines()[0].rsplit(' ', 1)
+        self.assertIn(';', stack)
+        self.assertGreater(int(count), 0)
@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.db.models import Q
 from django.utils.html import format_html
 
+from cart.services import get_recipe_amounts, recipe_amounts_changed
 from recipes.models import Recipe, RecipeIngredient, Favorite
+from recipes.search import fts_available, match_ids, search_terms
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -40,6 +43,28 @@ class RecipeAdmin(admin.ModelAdmin):
 
     display_image.short_description = 'Изображение'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Название и описание ищутся по FTS5-индексу, а не LIKE '%…%'
+        # по всей таблице; автор — как раньше
+        terms = search_terms(search_term)
+        if not terms or not fts_available(queryset.db):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(
+            Q(pk__in=match_ids(terms))
+            | Q(author__username__icontains=search_term)
+            | Q(author__email__icontains=search_term)
+        ), False
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = get_recipe_amounts(recipe.id) if change else {}
+        super().save_related(request, form, formsets, change)
+        recipe_amounts_changed(
+            recipe.id, old_amounts, get_recipe_amounts(recipe.id)
+        )
+
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
@@ -47,6 +72,41 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     list_filter = ('recipe', 'ingredient')
     search_fields = ('recipe__name', 'ingredient__name')
 
+    @staticmethod
+    def get_amounts(recipe_ids):
+        return {
+            recipe_id: get_recipe_amounts(recipe_id)
+            for recipe_id in recipe_ids
+        }
+
+    @staticmethod
+    def amounts_changed(old):
+        # Правка состава переносится в списки покупок, как в RecipeAdmin
+        for recipe_id, old_amounts in old.items():
+            recipe_amounts_changed(
+                recipe_id, old_amounts, get_recipe_amounts(recipe_id)
+            )
+
+    def save_model(self, request, obj, form, change):
+        # Строку могли перенести в другой рецепт: меняются оба
+        old = self.get_amounts(
+            {obj.recipe_id, form.initial.get('recipe', obj.recipe_id)}
+        )
+        super().save_model(request, obj, form, change)
+        self.amounts_changed(old)
+
+    def delete_model(self, request, obj):
+        old = self.get_amounts([obj.recipe_id])
+        super().delete_model(request, obj)
+        self.amounts_changed(old)
+
+    def delete_queryset(self, request, queryset):
+        old = self.get_amounts(
+            set(queryset.values_list('recipe_id', flat=True))
+        )
+        super().delete_queryset(request, queryset)
+        self.amounts_changed(old)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -0,0 +1,119 @@
+from django.core.management.base import CommandError
+from django.db import transaction
+
+from feed.services import fan_out
+from foodgram_config.loaders import BulkLoadCommand
+from foodgram_config.page_cache import recipe_page_cache
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredient
+from recipes.pantry import pantry_index
+from users.models import User
+
+
+class Command(BulkLoadCommand):
+    help = (
+        'Загружает рецепты из JSON: [{"author": почта, "name": ..., '
+        '"text": ..., "cooking_time": ..., "image": путь в MEDIA_ROOT, '
+        '"ingredients": [{"name": ..., "measurement_unit": ..., '
+        '"amount": ...}]}]. Ингредиенты и авторы должны уже существовать, '
+        'рецепты автора с тем же названием пропускаются, повтор '
+        'ингредиента в одном рецепте — ошибка.'
+    )
+    formats = ('json',)
+
+    def parse_rows(self, records):
+        for number, record in enumerate(records, start=1):
+            keys = [
+                (item['name'], item['measurement_unit'])
+                for item in record['ingredients']
+            ]
+            if len(set(keys)) != len(keys):
+                repeated = next(
+                    key for key in keys if keys.count(key) > 1
+                )
+                raise CommandError(
+                    f'Запись {number}: ингредиент '
+                    f'{" ".join(repeated)} указан дважды'
+                )
+            yield record
+
+    def get_author_ids(self, batch):
+        emails = {record['author'] for record in batch}
+        authors = dict(
+            User.objects.filter(email__in=emails).values_list('email', 'id')
+        )
+        unknown = emails - authors.keys()
+        if unknown:
+            raise ValueError(f'неизвестные авторы: {", ".join(unknown)}')
+        return authors
+
+    def get_ingredient_ids(self, batch):
+        names = {
+            item['name']
+            for record in batch for item in record['ingredients']
+        }
+        return {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                name__in=names
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+
+    @staticmethod
+    def get_ingredient_id(ingredients, item):
+        key = (item['name'], item['measurement_unit'])
+        if key not in ingredients:
+            raise ValueError(f'неизвестный ингредиент: {" ".join(key)}')
+        return ingredients[key]
+
+    def load_batch(self, batch):
+        # Авторы, ингредиенты и дубли ищутся запросами на пачку:
+        # память не растёт ни с базой, ни с файлом
+        authors = self.get_author_ids(batch)
+        ingredients = self.get_ingredient_ids(batch)
+        known = set(
+            Recipe.objects.filter(
+                author_id__in=authors.values(),
+                name__in={record['name'] for record in batch},
+            ).values_list('author_id', 'name')
+        )
+        recipes = []
+        recipe_ingredients = []
+        for record in batch:
+            author_id = authors[record['author']]
+            if (author_id, record['name']) in known:
+                continue
+            known.add((author_id, record['name']))
+            recipes.append(Recipe(
+                author_id=author_id,
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+            ))
+            recipe_ingredients.append([
+                (self.get_ingredient_id(ingredients, item), item['amount'])
+                for item in record['ingredients']
+            ])
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                )
+                for recipe, items in zip(recipes, recipe_ingredients)
+                for ingredient_id, amount in items
+            )
+            # bulk_create не шлёт post_save, ленты и индекс ингредиентов
+            # обновляются явно
+            fan_out(recipes)
+            for recipe, items in zip(recipes, recipe_ingredients):
+                pantry_index.set_recipe(
+                    recipe.id, [ingredient_id for ingredient_id, _ in items]
+                )
+        if recipes:
+            # Новые id ещё не кэшированы, сдвигается только список
+            recipe_page_cache.invalidate()
+        return len(recipes)
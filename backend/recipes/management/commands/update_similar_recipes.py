@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import stale_recipe_ids, update_similar_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты для /api/recipes/{id}/similar/. '
+        'По умолчанию — только для рецептов, изменённых после прошлого '
+        'расчёта; запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='пересчитать соседей всех рецептов',
+        )
+        parser.add_argument(
+            '--count',
+            type=int,
+            help='соседей на рецепт, по умолчанию SIMILAR_RECIPES_COUNT',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['all']:
+            recipe_ids = None
+        else:
+            recipe_ids = list(stale_recipe_ids())
+            if not recipe_ids:
+                self.stdout.write('Похожие рецепты актуальны.')
+                return
+        updated = update_similar_recipes(recipe_ids, options['count'])
+        self.stdout.write(
+            f'Пересчитано рецептов: {updated} '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
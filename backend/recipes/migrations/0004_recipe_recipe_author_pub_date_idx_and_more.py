@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+from foodgram_config.migration_operations import remove_duplicates
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_short_code_alter_recipeingredient_recipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicates('recipes.Favorite', ('user', 'recipe')),
+            migrations.RunPython.noop,
+        ),
+        migrations.RunPython(
+            remove_duplicates(
+                'recipes.RecipeIngredient',
+                ('recipe', 'ingredient'),
+                sum_fields=('amount',),
+            ),
+            migrations.RunPython.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 20:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_recipe_author_pub_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recipe',
+            name='short_code',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 20:12
+
+from django.db import migrations
+import foodgram_config.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_remove_recipe_short_code'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=foodgram_config.images.VariantImageField(upload_to='recipes/images/', verbose_name='изображение'),
+        ),
+    ]
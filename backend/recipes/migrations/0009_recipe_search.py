@@ -0,0 +1,84 @@
+# Generated by Django 4.2 on 2026-10-18 20:48
+
+from django.db import DatabaseError, migrations, models, transaction
+import django.db.models.deletion
+import recipes.models
+
+# Название и описание индексируются с «ё», заменённой на «е»:
+# unicode61 не считает их одной буквой
+FOLD = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+
+CREATE_INDEX = [
+    "CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5("
+    "name, text, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    # Совпадение в названии весит в 10 раз больше, чем в описании
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rank) "
+    "VALUES ('rank', 'bm25(10.0, 1.0)')",
+    "INSERT INTO recipes_recipe_fts(rowid, name, text) "
+    f"SELECT id, {FOLD.format('name')}, {FOLD.format('text')} "
+    "FROM recipes_recipe",
+    "CREATE TRIGGER recipes_recipe_fts_insert AFTER INSERT ON recipes_recipe "
+    "BEGIN INSERT INTO recipes_recipe_fts(rowid, name, text) VALUES "
+    f"(new.id, {FOLD.format('new.name')}, {FOLD.format('new.text')}); END",
+    "CREATE TRIGGER recipes_recipe_fts_update "
+    "AFTER UPDATE OF name, text ON recipes_recipe "
+    f"BEGIN UPDATE recipes_recipe_fts SET name = {FOLD.format('new.name')}, "
+    f"text = {FOLD.format('new.text')} WHERE rowid = new.id; END",
+    "CREATE TRIGGER recipes_recipe_fts_delete AFTER DELETE ON recipes_recipe "
+    "BEGIN DELETE FROM recipes_recipe_fts WHERE rowid = old.id; END",
+]
+
+DROP_INDEX = [
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+]
+
+
+def create_index(apps, schema_editor):
+    """FTS5-индекс рецептов; без FTS5 поиск работает через icontains."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                for statement in CREATE_INDEX:
+                    cursor.execute(statement)
+    except DatabaseError:
+        # SQLite собран без FTS5: «no such module: fts5»
+        pass
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP_INDEX:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearch',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='recipes.recipe')),
+                ('name', models.TextField()),
+                ('text', models.TextField()),
+                ('rank', models.FloatField()),
+                ('document', recipes.models.FullTextDocument(db_column='recipes_recipe_fts')),
+            ],
+            options={
+                'db_table': 'recipes_recipe_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 22:47
+
+from django.db import migrations, models
+import foodgram_config.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='форматы копий изображения'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=foodgram_config.images.VariantImageField(upload_to='recipes/images/', variants_field='image_variants', verbose_name='изображение'),
+        ),
+        migrations.RunPython(
+            foodgram_config.images.mark_built_variants(
+                'recipes.Recipe', 'image'
+            ),
+            migrations.RunPython.noop,
+        ),
+    ]
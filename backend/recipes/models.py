@@ -2,7 +2,9 @@ from django.core.validators import MinValueValidator
 from django.db import models
 
 from users.models import User
+from foodgram_config.images import VariantImageField
 from ingredients.models import Ingredient
+from recipes.short_links import encode
 
 
 class Recipe(models.Model):
@@ -16,10 +18,21 @@ class Recipe(models.Model):
         max_length=200,
         verbose_name='название',
     )
-    image = models.ImageField(
+    image = VariantImageField(
         upload_to='recipes/images/',
+        variants_field='image_variants',
         verbose_name='изображение'
     )
+    # Построенные форматы копий, пишет VariantImageField. Без default:
+    # так SQLite добавляет колонку, не пересоздавая таблицу с триггерами
+    # полнотекстового индекса
+    image_variants = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='форматы копий изображения',
+    )
     text = models.TextField(
         verbose_name='описание'
     )
@@ -38,23 +51,81 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='дата публикации'
     )
-    short_code = models.CharField(
-        max_length=6,
-        unique=True,
-        blank=True,
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='дата изменения'
+    )
+    # Раньше updated_at — похожие рецепты пора пересчитать
+    similar_updated_at = models.DateTimeField(
         null=True,
-        verbose_name="Код короткой ссылки",
-        help_text="Уникальный код для короткой ссылки на рецепт",
+        blank=True,
+        editable=False,
+        verbose_name='дата расчёта похожих',
     )
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def short_code(self):
+        """Код короткой ссылки, однозначно выводится из id."""
+        return encode(self.id)
+
+
+class FullTextDocument(models.TextField):
+    """Скрытый столбец FTS5 с именем таблицы: по нему идёт MATCH."""
+
+
+@FullTextDocument.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class RecipeSearch(models.Model):
+    """Строка FTS5-индекса рецептов.
+
+    Виртуальную таблицу и триггеры, которые синхронизируют её
+    с ``Recipe``, создаёт миграция, если SQLite собран с FTS5.
+    Название и описание хранятся с «ё», заменённой на «е».
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_index',
+    )
+    name = models.TextField()
+    text = models.TextField()
+    # Скрытый столбец: bm25 с весами из настройки rank таблицы
+    rank = models.FloatField()
+    document = FullTextDocument(db_column='recipes_recipe_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
+
 
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
@@ -78,11 +149,55 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'ингридиенты рецепта'
         verbose_name_plural = 'ингридиенты рецептов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                name='unique_recipe_ingredient',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.recipe.name} {self.ingredient.name} {self.amount}'
 
 
+class SimilarRecipe(models.Model):
+    """Предрассчитанный сосед рецепта по составу ингредиентов."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_links',
+        verbose_name='рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_backlinks',
+        verbose_name='похожий рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='сходство',
+    )
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id} {self.score:.3f}'
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -100,6 +215,12 @@ class Favorite(models.Model):
     class Meta:
         verbose_name = 'избранный рецепт'
         verbose_name_plural = 'избранные рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_favorite',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
@@ -0,0 +1,322 @@
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Max, Value, When
+
+from recipes.models import RecipeIngredient
+
+
+def set_bit(bitmap, position, value):
+    """Ставит или снимает бит; возвращает, изменился ли он."""
+    index, mask = position >> 3, 1 << (position & 7)
+    if index >= len(bitmap):
+        if not value:
+            return False
+        bitmap.extend(bytes(index - len(bitmap) + 1))
+    if bool(bitmap[index] & mask) == value:
+        return False
+    bitmap[index] ^= mask
+    return True
+
+
+def add_vector(planes, vector):
+    """Прибавляет 0/1-вектор к поразрядным счётчикам ``planes``."""
+    for i, plane in enumerate(planes):
+        planes[i], vector = plane ^ vector, plane & vector
+        if not vector:
+            return
+    planes.append(vector)
+
+
+def subtract(minuend, subtrahend):
+    """Поразрядная разность счётчиков; уменьшаемое не меньше вычитаемого."""
+    result, borrow = [], 0
+    for i in range(max(len(minuend), len(subtrahend))):
+        x = minuend[i] if i < len(minuend) else 0
+        y = subtrahend[i] if i < len(subtrahend) else 0
+        result.append(x ^ y ^ borrow)
+        borrow = (~x & (y | borrow)) | (y & borrow)
+    return result
+
+
+def equal(planes, value, universe):
+    """Маска позиций из ``universe``, где счётчик равен ``value``."""
+    if value >> len(planes):
+        return 0
+    mask = universe
+    for i, plane in enumerate(planes):
+        mask &= plane if value >> i & 1 else ~plane
+    return mask
+
+
+def positions(mask):
+    """Номера установленных битов по возрастанию."""
+    bits = format(mask, 'b')[::-1]
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+class PantryIndex:
+    """Обратный индекс ингредиент → рецепты для поиска «из того, что есть».
+
+    Для каждого ингредиента хранится битовая карта: бит с номером id
+    рецепта стоит, если рецепт его использует. Число ингредиентов
+    рецепта хранится там же поразрядно, по карте на каждый двоичный
+    разряд. Запрос складывает карты выбранных ингредиентов поразрядными
+    операциями над целыми числами Python и не зависит от того,
+    насколько ингредиенты распространены.
+
+    Индекс строится лениво, меняется точечно сигналами
+    ``RecipeIngredient`` и ``set_recipe`` после массовых записей
+    и перестраивается раз в ``PANTRY_INDEX_TTL`` секунд, чтобы подхватить
+    изменения других процессов. Правки, пришедшие во время фоновой
+    перестройки, запоминаются и повторяются на новом индексе: его
+    снимок базы мог их не застать. Память: около
+    ``ингредиенты × max(id рецепта) / 8`` байт.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.bitmaps = None
+        self.totals = None
+        self.total_planes = None
+        self.built_at = 0
+        self.rebuilding = False
+        # Правки за время фоновой перестройки: (метод, аргументы)
+        self.replay = None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'PANTRY_INDEX_TTL', 300)
+
+    def invalidate(self):
+        self.bitmaps = None
+
+    def expired(self):
+        return time.monotonic() - self.built_at > self.ttl
+
+    def build(self):
+        started = time.monotonic()
+        max_id = RecipeIngredient.objects.aggregate(
+            max_id=Max('recipe_id')
+        )['max_id'] or 0
+        size = (max_id >> 3) + 1
+        bitmaps, totals = {}, {}
+        rows = RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=10000)
+        # Пара (рецепт, ингредиент) уникальна, проверять бит не нужно
+        for recipe_id, ingredient_id in rows:
+            bitmap = bitmaps.get(ingredient_id)
+            if bitmap is None:
+                bitmap = bitmaps[ingredient_id] = bytearray(size)
+            index = recipe_id >> 3
+            if index >= len(bitmap):
+                # Рецепт добавлен после подсчёта max_id
+                bitmap.extend(bytes(index - len(bitmap) + 1))
+            bitmap[index] |= 1 << (recipe_id & 7)
+            totals[recipe_id] = totals.get(recipe_id, 0) + 1
+        planes = [
+            bytearray(size)
+            for _ in range(max(totals.values(), default=0).bit_length())
+        ]
+        for recipe_id, total in totals.items():
+            for i, plane in enumerate(planes):
+                if total >> i & 1:
+                    set_bit(plane, recipe_id, True)
+        with self.lock:
+            if self.built_at > started:
+                # Пока шла сборка, индекс уже собрали по более свежему
+                # снимку, например после invalidate
+                return
+            self.bitmaps, self.totals = bitmaps, totals
+            self.total_planes = planes
+            self.built_at = time.monotonic()
+            for method, args in self.replay or ():
+                method(*args)
+            self.replay = None
+
+    def rebuild(self):
+        try:
+            self.build()
+        finally:
+            self.rebuilding = False
+            connections.close_all()
+
+    def ensure_built(self):
+        """Строит индекс при первом запросе.
+
+        Устаревший индекс продолжает отвечать, пока новый строится
+        в фоновом потоке: на 100 тыс. рецептов это секунды.
+        """
+        if self.bitmaps is None:
+            with self.lock:
+                if self.bitmaps is None:
+                    self.build()
+        elif self.expired() and not self.rebuilding:
+            with self.lock:
+                if self.rebuilding:
+                    return
+                self.rebuilding = True
+                self.replay = []
+            threading.Thread(target=self.rebuild, daemon=True).start()
+
+    def set_total(self, recipe_id, total):
+        self.totals[recipe_id] = total
+        if not total:
+            del self.totals[recipe_id]
+        while total >> len(self.total_planes):
+            self.total_planes.append(bytearray())
+        for i, plane in enumerate(self.total_planes):
+            set_bit(plane, recipe_id, bool(total >> i & 1))
+
+    def apply(self, method, *args):
+        """Выполняет правку индекса и запоминает её для перестройки."""
+        with self.lock:
+            if self.replay is not None:
+                self.replay.append((method, args))
+            if self.bitmaps is not None:
+                method(*args)
+
+    def toggle(self, recipe_id, ingredient_id, value):
+        """Ставит или снимает пару рецепт — ингредиент (под lock)."""
+        if value:
+            bitmap = self.bitmaps.setdefault(ingredient_id, bytearray())
+        else:
+            bitmap = self.bitmaps.get(ingredient_id)
+            if bitmap is None:
+                return
+        if set_bit(bitmap, recipe_id, value):
+            self.set_total(
+                recipe_id,
+                self.totals.get(recipe_id, 0) + (1 if value else -1),
+            )
+
+    def replace(self, recipe_id, ingredient_ids):
+        """Заменяет состав рецепта (под lock)."""
+        index, mask = recipe_id >> 3, 1 << (recipe_id & 7)
+        stale = [
+            ingredient_id
+            for ingredient_id, bitmap in self.bitmaps.items()
+            if index < len(bitmap) and bitmap[index] & mask
+            and ingredient_id not in ingredient_ids
+        ]
+        for ingredient_id in stale:
+            self.toggle(recipe_id, ingredient_id, False)
+        for ingredient_id in ingredient_ids:
+            self.toggle(recipe_id, ingredient_id, True)
+
+    def add(self, recipe_id, ingredient_id):
+        self.apply(self.toggle, recipe_id, ingredient_id, True)
+
+    def remove(self, recipe_id, ingredient_id):
+        self.apply(self.toggle, recipe_id, ingredient_id, False)
+
+    def set_recipe(self, recipe_id, ingredient_ids):
+        """Заменяет состав рецепта целиком, например после bulk_create."""
+        self.apply(self.replace, recipe_id, set(ingredient_ids))
+
+    def sync_recipe(self, recipe_id):
+        """Перечитывает состав рецепта из базы."""
+        if self.bitmaps is not None or self.replay is not None:
+            self.set_recipe(
+                recipe_id,
+                RecipeIngredient.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list('ingredient_id', flat=True),
+            )
+
+    def find(self, have, missing_max, limit, allowed=None):
+        """Рецепты, где есть хотя бы один из ``have``, а недостаёт
+        не больше ``missing_max`` ингредиентов.
+
+        Возвращает до ``limit`` троек (id, недостаёт, есть): сначала
+        с меньшим числом недостающих, затем с большим числом имеющихся,
+        затем новые. ``allowed`` — битовая маска id, среди которых
+        искать (например, прошедших остальные фильтры).
+        """
+        self.ensure_built()
+        with self.lock:
+            covered, candidates = [], 0
+            for ingredient_id in set(have):
+                if ingredient_id in self.bitmaps:
+                    vector = int.from_bytes(
+                        self.bitmaps[ingredient_id], 'little'
+                    )
+                    add_vector(covered, vector)
+                    candidates |= vector
+            if allowed is not None:
+                candidates &= allowed
+            missing = subtract(
+                [
+                    int.from_bytes(plane, 'little')
+                    for plane in self.total_planes
+                ],
+                covered,
+            )
+            found = []
+            for missing_count in range(missing_max + 1):
+                tier = sorted(
+                    positions(equal(missing, missing_count, candidates)),
+                    key=lambda recipe_id: (
+                        -self.totals[recipe_id], -recipe_id
+                    ),
+                )
+                found.extend(
+                    (
+                        recipe_id,
+                        missing_count,
+                        self.totals[recipe_id] - missing_count,
+                    )
+                    for recipe_id in tier
+                )
+                if len(found) >= limit:
+                    break
+        return found[:limit]
+
+
+pantry_index = PantryIndex()
+
+
+def cook_from(queryset, have, missing_max):
+    """Рецепты из ``have`` с недостающими не больше ``missing_max``.
+
+    Аннотации ``missing_ingredients`` и ``covered_ingredients``:
+    сколько ингредиентов рецепта недостаёт и сколько есть.
+    PANTRY_MAX_RESULTS ограничивает уже отфильтрованные рецепты:
+    если ``queryset`` сужен другими фильтрами, индекс ищет только
+    среди его id.
+    """
+    allowed = None
+    if queryset.query.has_filters():
+        bitmap = bytearray()
+        ids = queryset.order_by().values_list('pk', flat=True)
+        for recipe_id in ids.iterator():
+            set_bit(bitmap, recipe_id, True)
+        allowed = int.from_bytes(bitmap, 'little')
+    found = pantry_index.find(
+        have, missing_max, settings.PANTRY_MAX_RESULTS, allowed
+    )
+    if not found:
+        return queryset.none()
+    by_missing, by_covered = defaultdict(list), defaultdict(list)
+    for recipe_id, missing, covered in found:
+        by_missing[missing].append(recipe_id)
+        by_covered[covered].append(recipe_id)
+    return queryset.filter(
+        pk__in=[recipe_id for recipe_id, _, _ in found]
+    ).annotate(
+        missing_ingredients=Case(*(
+            When(pk__in=ids, then=Value(missing))
+            for missing, ids in by_missing.items()
+        )),
+        covered_ingredients=Case(*(
+            When(pk__in=ids, then=Value(covered))
+            for covered, ids in by_covered.items()
+        )),
+    ).order_by('missing_ingredients', '-covered_ingredients', '-id')
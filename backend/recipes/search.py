@@ -0,0 +1,164 @@
+import re
+from functools import reduce
+from operator import and_
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, F, Func, Q, TextField, Value, When
+from django.db.models.functions import Lower, Replace
+from django.utils.html import escape
+
+from ingredients.search import normalize
+from recipes.models import RecipeSearch
+
+FTS_TABLE = 'recipes_recipe_fts'
+# Больше слов в запросе не нужно человеку, но утяжеляет MATCH
+MAX_TERMS = 8
+SNIPPET_LENGTH = 160
+# Гласные окончания, которые отбрасываются у слов запроса: поиск идёт
+# по префиксу, и «свекла» находит «свеклой» и «свеклу»
+ENDINGS = 'аеиоуыэюяйь'
+MIN_STEM = 4
+
+fts_tables = {}
+
+
+class Casefold(Func):
+    """Строка, приведённая как в ``normalize``: casefold, «ё» → «е».
+
+    lower() и LIKE в SQLite складывают только ASCII, поэтому там
+    вызывается Python-функция, которую добавляет ``register_casefold``.
+    """
+    function = 'casefold'
+    output_field = TextField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(Replace(
+            Lower(*self.get_source_expressions()), Value('ё'), Value('е')
+        ))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+def casefold(text):
+    return None if text is None else normalize(text)
+
+
+def register_casefold(sender, connection, **kwargs):
+    """Обработчик connection_created: функция casefold для SQLite."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'casefold', 1, casefold, deterministic=True
+        )
+
+
+def stem(word):
+    """Грубая основа слова для поиска по префиксу."""
+    for _ in range(2):
+        if len(word) > MIN_STEM and word[-1] in ENDINGS:
+            word = word[:-1]
+    return word
+
+
+def search_terms(query):
+    """Основы слов запроса в нижнем регистре, «ё» приведена к «е»."""
+    return [
+        stem(word) for word in re.findall(r'\w+', normalize(query or ''))
+    ][:MAX_TERMS]
+
+
+def fts_available(using='default'):
+    """Есть ли FTS5-индекс: его создаёт миграция, если SQLite умеет FTS5."""
+    connection = connections[using]
+    if not settings.RECIPE_SEARCH_FTS or connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in fts_tables:
+        fts_tables[name] = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return fts_tables[name]
+
+
+def match_expression(terms):
+    """Запрос FTS5: все слова как префиксы, кавычки экранированы."""
+    return ' '.join(
+        '"{}"*'.format(term.replace('"', '""')) for term in terms
+    )
+
+
+def search_recipes(queryset, terms):
+    """Рецепты по словам ``terms``, самые релевантные первыми.
+
+    С FTS5 ранжирует bm25 (название весит больше описания), без него
+    ищет подстроки в приведённых через Casefold названии и описании
+    и поднимает совпадения в названии. Аннотация ``search_rank``:
+    меньше — релевантнее.
+    """
+    if fts_available(queryset.db):
+        queryset = queryset.filter(
+            search_index__document__match=match_expression(terms)
+        ).annotate(search_rank=F('search_index__rank'))
+    else:
+        queryset = queryset.alias(
+            search_name=Casefold('name'),
+            search_text=Casefold('text'),
+        ).filter(reduce(and_, (
+            Q(search_name__contains=term) | Q(search_text__contains=term)
+            for term in terms
+        ))).annotate(search_rank=Case(
+            When(
+                reduce(and_, (
+                    Q(search_name__contains=term) for term in terms
+                )),
+                then=Value(0),
+            ),
+            default=Value(1),
+        ))
+    return queryset.order_by('search_rank', '-pub_date', '-id')
+
+
+def match_ids(terms):
+    """Подзапрос id рецептов, найденных FTS5."""
+    return RecipeSearch.objects.filter(
+        document__match=match_expression(terms)
+    ).values('recipe_id')
+
+
+def find_matches(text, terms):
+    """Отрезки ``text``, совпавшие со словами как с префиксами."""
+    pattern = re.compile(
+        r'\b(?:{})\w*'.format('|'.join(map(re.escape, terms))),
+        re.IGNORECASE,
+    )
+    # Замена «ё» не меняет длину, позиции совпадают с исходным текстом
+    folded = text.replace('ё', 'е').replace('Ё', 'Е')
+    return [match.span() for match in pattern.finditer(folded)]
+
+
+def highlight(text, terms, start=0, end=None):
+    """HTML фрагмента ``text[start:end]`` с совпадениями в <mark>."""
+    end = len(text) if end is None else end
+    parts, position = [], start
+    for match_start, match_end in find_matches(text, terms):
+        if match_start < start or match_end > end:
+            continue
+        parts.append(escape(text[position:match_start]))
+        parts.append(f'<mark>{escape(text[match_start:match_end])}</mark>')
+        position = match_end
+    parts.append(escape(text[position:end]))
+    return ''.join(parts)
+
+
+def snippet(text, terms, length=SNIPPET_LENGTH):
+    """Отрывок описания вокруг первого совпадения с подсветкой."""
+    matches = find_matches(text, terms)
+    start = max(0, matches[0][0] - length // 3) if matches else 0
+    end = min(len(text), start + length)
+    start = max(0, min(start, end - length))
+    return (
+        ('…' if start else '')
+        + highlight(text, terms, start, end)
+        + ('…' if end < len(text) else '')
+    )
@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from hashids import Hashids
+
+hashids = Hashids(salt=settings.SECRET_KEY, min_length=6)
+
+
+def encode(recipe_id):
+    return hashids.encode(recipe_id)
+
+
+def decode(code):
+    """id рецепта по короткому коду или None, если код невалиден."""
+    decoded = hashids.decode(code)
+    if len(decoded) != 1:
+        return None
+    return decoded[0]
+
+
+class KnownRecipeIds:
+    """Ограниченный LRU-кэш id рецептов, которые точно существуют.
+
+    Запоминаются только найденные рецепты: рецепт, созданный после
+    промаха, не должен отдавать 404 из кэша. Удалённые рецепты
+    вычёркиваются сигналом post_delete.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = OrderedDict()
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'SHORT_LINK_CACHE_SIZE', 10000)
+
+    def add(self, recipe_id):
+        with self.lock:
+            self.ids[recipe_id] = None
+            self.ids.move_to_end(recipe_id)
+            while len(self.ids) > self.maxsize:
+                self.ids.popitem(last=False)
+
+    def discard(self, recipe_id):
+        with self.lock:
+            self.ids.pop(recipe_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.ids.clear()
+
+    def exists(self, recipe_id):
+        with self.lock:
+            if recipe_id in self.ids:
+                self.ids.move_to_end(recipe_id)
+                return True
+        # Импорт здесь: модуль используется в recipes.models
+        from recipes.models import Recipe
+        if Recipe.objects.filter(id=recipe_id).exists():
+            self.add(recipe_id)
+            return True
+        return False
+
+
+known_recipe_ids = KnownRecipeIds()
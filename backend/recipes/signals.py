@@ -0,0 +1,131 @@
+import contextlib
+import threading
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from foodgram_config.page_cache import recipe_page_cache
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredient
+from recipes.pantry import pantry_index
+from recipes.short_links import known_recipe_ids
+from users.models import User
+
+
+def deleted_with_recipe(origin):
+    """Строка удаляется каскадом вместе с рецептом."""
+    return isinstance(origin, Recipe) or (
+        isinstance(origin, QuerySet) and origin.model is Recipe
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_deleted_recipe(instance, **kwargs):
+    known_recipe_ids.discard(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_pages(instance, **kwargs):
+    recipe_page_cache.invalidate([instance.id])
+
+
+class PendingChanges(threading.local):
+    """Рецепты, состав которых менялся в текущей транзакции.
+
+    Версия каждого рецепта сдвигается и кэш его страниц сбрасывается
+    один раз при фиксации, сколько бы строк ни поменялось. После
+    отката набор доживает до следующей фиксации: лишний сброс
+    безвреден.
+    """
+
+    def __init__(self):
+        self.recipe_ids = set()
+        self.saving = set()
+
+
+pending = PendingChanges()
+
+
+@contextlib.contextmanager
+def saving_recipe(recipe_id):
+    """Состав правится вместе с самим рецептом.
+
+    Сохранение рецепта уже сдвинуло его версию и сбросило кэш, строкам
+    состава внутри блока делать это незачем.
+    """
+    pending.saving.add(recipe_id)
+    try:
+        yield
+    finally:
+        pending.saving.discard(recipe_id)
+
+
+def flush_pending():
+    recipe_ids, pending.recipe_ids = pending.recipe_ids, set()
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now()
+    )
+    recipe_page_cache.invalidate(recipe_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_recipe(instance, origin=None, **kwargs):
+    """Меняет версию рецепта (ETag) и сбрасывает кэш его страниц при
+    правке состава в обход сериализатора.
+
+    При удалении самого рецепта строки удаляются каскадом, и трогать
+    его уже незачем.
+    """
+    if (
+        deleted_with_recipe(origin)
+        or instance.recipe_id in pending.saving
+    ):
+        return
+    pending.recipe_ids.add(instance.recipe_id)
+    # Обработчик ставится на каждую строку: поставленный раньше мог
+    # пропасть с откатом точки сохранения, лишние вызовы пусты
+    transaction.on_commit(flush_pending)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def index_recipe_ingredient(instance, created, **kwargs):
+    if created:
+        pantry_index.add(instance.recipe_id, instance.ingredient_id)
+    else:
+        # Ингредиент строки мог смениться, прежний неизвестен
+        pantry_index.sync_recipe(instance.recipe_id)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def unindex_recipe_ingredient(instance, **kwargs):
+    pantry_index.remove(instance.recipe_id, instance.ingredient_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_pages(instance, created, **kwargs):
+    # Новый ингредиент ещё не входит ни в один рецепт
+    if not created:
+        recipe_page_cache.invalidate(
+            RecipeIngredient.objects.filter(
+                ingredient=instance
+            ).values_list('recipe_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(instance, created, update_fields, **kwargs):
+    # Вход пользователя обновляет только last_login, в ответах его нет
+    if created or update_fields == frozenset(['last_login']):
+        return
+    recipe_page_cache.invalidate(
+        Recipe.objects.filter(
+            author=instance
+        ).values_list('id', flat=True)
+    )
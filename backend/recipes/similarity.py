@@ -0,0 +1,218 @@
+import heapq
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from scipy import sparse
+
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+
+BATCH_SIZE = 1000
+# Сколько кандидатов на одного соседа пересчитывается точно
+RESCORE_FACTOR = 4
+
+
+def top_k(groups, scores, ids, k):
+    """Индексы до ``k`` лучших элементов каждой группы.
+
+    Внутри группы порядок — по убыванию оценки, при равенстве по
+    убыванию id; группы идут по возрастанию.
+    """
+    order = np.lexsort((-ids, -scores, groups))
+    groups = groups[order]
+    starts = np.searchsorted(groups, groups)
+    return order[np.arange(len(order)) - starts < k]
+
+
+class SimilarityMatrix:
+    """Разреженная матрица рецепт × ингредиент для поиска похожих.
+
+    Вес ингредиента в рецепте — IDF, умноженный на
+    log(1 + количество / медиана количества этого ингредиента): соль
+    есть почти везде и почти ничего не весит, а двойная порция мяса
+    весит больше обычной. Строки нормированы, сходство — косинус.
+
+    Кандидаты в соседи — произведение строк на транспонированную
+    матрицу, столбцы которой отсортированы по весу и обрезаны до
+    ``postings_limit``: частый ингредиент не превращает поиск
+    в перебор всех пар, а найденные кандидаты затем пересчитываются
+    точно. Всё считается в scipy.sparse пачками по ``BATCH_SIZE`` строк.
+    """
+
+    def __init__(self, rows, postings_limit):
+        rows = np.fromiter(rows, dtype=np.dtype((np.int64, 3)))
+        self.ids, recipe_index = np.unique(rows[:, 0], return_inverse=True)
+        ingredient_ids, column = np.unique(rows[:, 1], return_inverse=True)
+        amounts = rows[:, 2].astype(np.float64)
+        counts = np.bincount(column, minlength=len(ingredient_ids))
+        idf = np.log((1 + len(self.ids)) / (1 + counts)) + 1
+        # Медиана количества по столбцу: значения столбца идут подряд
+        sorted_amounts = amounts[np.lexsort((amounts, column))]
+        starts = np.cumsum(counts) - counts
+        typical = (
+            sorted_amounts[starts + (counts - 1) // 2]
+            + sorted_amounts[starts + counts // 2]
+        ) / 2
+        weights = idf[column] * np.log1p(amounts / typical[column])
+        weights /= np.sqrt(np.bincount(
+            recipe_index, weights * weights, minlength=len(self.ids)
+        ))[recipe_index]
+        shape = (len(self.ids), len(ingredient_ids))
+        self.matrix = sparse.csr_matrix(
+            (weights, (recipe_index, column)), shape=shape
+        )
+        kept = top_k(column, weights, recipe_index, postings_limit)
+        self.postings = sparse.csr_matrix(
+            (weights[kept], (column[kept], recipe_index[kept])),
+            shape=shape[::-1],
+        )
+
+    @classmethod
+    def load(cls, postings_limit=None):
+        return cls(
+            RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id', 'amount'
+            ).iterator(chunk_size=10000),
+            postings_limit or settings.SIMILAR_RECIPES_POSTINGS,
+        )
+
+    def neighbours(self, recipe_ids, count):
+        """{id: до ``count`` пар (сходство, id) по убыванию сходства}.
+
+        Рецепты без ингредиентов получают пустой список.
+        """
+        recipe_ids = np.fromiter(recipe_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, recipe_ids)
+        found = positions < len(self.ids)
+        found[found] = self.ids[positions[found]] == recipe_ids[found]
+        lists = {int(recipe_id): [] for recipe_id in recipe_ids}
+        positions = positions[found]
+        for start in range(0, len(positions), BATCH_SIZE):
+            self.add_neighbours(
+                lists, positions[start:start + BATCH_SIZE], count
+            )
+        return lists
+
+    def add_neighbours(self, lists, rows, count):
+        group, other = self.candidates(rows, count * RESCORE_FACTOR)
+        scores = np.asarray(
+            self.matrix[rows[group]].multiply(self.matrix[other]).sum(axis=1)
+        ).ravel()
+        for index in top_k(group, scores, other, count):
+            lists[int(self.ids[rows[group[index]]])].append(
+                (float(scores[index]), int(self.ids[other[index]]))
+            )
+
+    def candidates(self, rows, limit):
+        """Пары (номер строки в ``rows``, кандидат) по обрезанным столбцам.
+
+        У каждой строки до ``limit`` кандидатов с наибольшей частичной
+        оценкой; строки произведения уже сгруппированы в CSR, поэтому
+        хватает argpartition по каждой.
+        """
+        partial = self.matrix[rows] @ self.postings
+        others = []
+        for position, row in enumerate(rows):
+            start, end = partial.indptr[position:position + 2]
+            columns = partial.indices[start:end]
+            scores = partial.data[start:end]
+            own = columns != row
+            columns, scores = columns[own], scores[own]
+            if len(columns) > limit:
+                columns = columns[
+                    np.argpartition(-scores, limit - 1)[:limit]
+                ]
+            others.append(columns)
+        group = np.repeat(np.arange(len(rows)), [len(c) for c in others])
+        return group, np.concatenate(others or [np.empty(0, np.int64)])
+
+
+def batches(ids):
+    """Части списка id, умещающиеся в параметры одного запроса."""
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def stale_recipe_ids():
+    """Рецепты, изменённые после расчёта их соседей."""
+    return Recipe.objects.filter(
+        Q(similar_updated_at__isnull=True)
+        | Q(similar_updated_at__lt=F('updated_at'))
+    ).values_list('id', flat=True)
+
+
+def update_similar_recipes(recipe_ids=None, count=None):
+    """Пересчитывает соседей; без ``recipe_ids`` — для всех рецептов.
+
+    Возвращает число пересчитанных рецептов.
+    """
+    count = count or settings.SIMILAR_RECIPES_COUNT
+    # Время до чтения матрицы: правка во время расчёта попадёт в следующий
+    started = timezone.now()
+    matrix = SimilarityMatrix.load()
+    if recipe_ids is None:
+        return update_all(matrix, count, started)
+    return update_changed(matrix, set(recipe_ids), count, started)
+
+
+def update_all(matrix, count, started):
+    changed = Recipe.objects.filter(pub_date__lt=started)
+    lists = matrix.neighbours(changed.values_list('id', flat=True), count)
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        save_lists(lists)
+        changed.update(similar_updated_at=started)
+    return len(lists)
+
+
+def update_changed(matrix, changed, count, started):
+    """Частичный пересчёт.
+
+    Обновляются и чужие списки: те, где встречались изменённые рецепты,
+    пересчитываются целиком, а в списки новых соседей изменённый рецепт
+    вставляется с той же оценкой — косинус симметричен.
+    """
+    affected = set(changed)
+    for ids in batches(changed):
+        affected.update(SimilarRecipe.objects.filter(
+            similar_id__in=ids
+        ).values_list('recipe_id', flat=True))
+    lists = matrix.neighbours(affected, count)
+    current = defaultdict(list)
+    for recipe_id in changed:
+        for score, other_id in lists[recipe_id]:
+            if other_id not in affected:
+                current[other_id].append((score, recipe_id))
+    for ids in batches(current):
+        for recipe_id, similar_id, score in SimilarRecipe.objects.filter(
+            recipe_id__in=ids
+        ).values_list('recipe_id', 'similar_id', 'score'):
+            current[recipe_id].append((score, similar_id))
+    for recipe_id, pairs in current.items():
+        lists[recipe_id] = heapq.nlargest(count, pairs)
+    with transaction.atomic():
+        for ids in batches(lists):
+            SimilarRecipe.objects.filter(recipe_id__in=ids).delete()
+        save_lists(lists)
+        for ids in batches(changed):
+            Recipe.objects.filter(pk__in=ids).update(
+                similar_updated_at=started
+            )
+    return len(changed)
+
+
+def save_lists(lists):
+    SimilarRecipe.objects.bulk_create(
+        (
+            SimilarRecipe(
+                recipe_id=recipe_id, similar_id=similar_id, score=score
+            )
+            for recipe_id, pairs in lists.items()
+            for score, similar_id in pairs
+        ),
+        batch_size=BATCH_SIZE,
+    )
@@ -1,3 +1,301 @@
+import io
+import json
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
-# Create your tests here.
+from ingredients.models import Ingredient
+from foodgram_config.page_cache import recipe_page_cache
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+from recipes.pantry import pantry_index
+from recipes.short_links import known_recipe_ids
+from recipes.similarity import stale_recipe_ids
+from users.models import User
+
+
+class LoadRecipesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cook@example.com',
+            username='cook',
+            first_name='Повар',
+            last_name='Тестовый',
+            password='password',
+        )
+        Ingredient.objects.bulk_create([
+            Ingredient(name='мука', measurement_unit='г'),
+            Ingredient(name='яйца', measurement_unit='шт'),
+        ])
+
+    def load(self, records):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', encoding='utf-8'
+        ) as file:
+            json.dump(records, file)
+            file.flush()
+            call_command(
+                'load_recipes', file.name,
+                batch_size=2, stdout=io.StringIO()
+            )
+
+    def test_load_recipes(self):
+        records = [
+            {
+                'author': self.author.email,
+                'name': f'блины {i}',
+                'text': 'описание',
+                'cooking_time': 20,
+                'image': 'recipes/images/pancakes.png',
+                'ingredients': [
+                    {'name': 'мука', 'measurement_unit': 'г', 'amount': 200},
+                    {'name': 'яйца', 'measurement_unit': 'шт', 'amount': 2},
+                ],
+            }
+            for i in range(3)
+        ]
+        generation = recipe_page_cache.get_generation()
+        # Повтор попадает в другую пачку
+        self.load(records + records[:1])
+        self.assertNotEqual(recipe_page_cache.get_generation(), generation)
+        self.load(records)
+        self.assertEqual(Recipe.objects.count(), 3)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.recipe_ingredients.count(), 2)
+            self.assertTrue(recipe.short_code)
+
+    def test_repeated_ingredient_rejected(self):
+        record = {
+            'author': self.author.email,
+            'name': 'оладьи',
+            'text': 'описание',
+            'cooking_time': 15,
+            'image': 'recipes/images/fritters.png',
+            'ingredients': [
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': 100},
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': 50},
+            ],
+        }
+        valid = dict(record, ingredients=record['ingredients'][:1])
+        with self.assertRaisesMessage(
+            CommandError, 'Запись 2: ингредиент мука г указан дважды'
+        ):
+            self.load([valid, record])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_pantry_index_updated(self):
+        pantry_index.ensure_built()
+        self.addCleanup(pantry_index.invalidate)
+        flour = Ingredient.objects.get(name='мука')
+        self.load([{
+            'author': self.author.email,
+            'name': 'лепёшка',
+            'text': 'описание',
+            'cooking_time': 10,
+            'image': 'recipes/images/flatbread.png',
+            'ingredients': [
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': 300},
+            ],
+        }])
+        recipe = Recipe.objects.get(name='лепёшка')
+        self.assertIn(
+            (recipe.id, 0, 1),
+            pantry_index.find([flour.id], missing_max=0, limit=10),
+        )
+
+
+class ShortLinkTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Автор',
+            last_name='Тестовый',
+            password='password',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author,
+            name='рецепт',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+
+    def setUp(self):
+        known_recipe_ids.clear()
+
+    def test_redirect_is_cached(self):
+        url = f'/r/{self.recipe.short_code}'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertRedirects(
+            response, f'/recipes/{self.recipe.id}',
+            fetch_redirect_response=False
+        )
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_invalid_code_does_not_hit_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/r/not-a-code')
+        self.assertEqual(response.status_code, 404)
+
+    def test_deleted_recipe(self):
+        url = f'/r/{self.recipe.short_code}'
+        self.client.get(url)
+        self.recipe.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_get_link(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/get-link/')
+        self.assertTrue(
+            response.data['short-link'].endswith(
+                f'/r/{self.recipe.short_code}'
+            )
+        )
+
+
+class SimilarRecipesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='similar@example.com',
+            username='similar',
+            first_name='Похожий',
+            last_name='Тестовый',
+            password='password',
+        )
+        (
+            cls.beet, cls.cabbage, cls.potato, cls.salt, cls.garlic,
+            cls.flour, cls.sugar,
+        ) = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'свёкла', 'капуста', 'картофель', 'соль', 'чеснок',
+                'мука', 'сахар',
+            )
+        )
+        cls.borsch = cls.create_recipe(
+            (cls.beet, 300), (cls.cabbage, 200), (cls.potato, 200),
+            (cls.salt, 5),
+        )
+        cls.green_borsch = cls.create_recipe(
+            (cls.beet, 250), (cls.cabbage, 150), (cls.potato, 300),
+            (cls.salt, 5),
+        )
+        cls.salad = cls.create_recipe(
+            (cls.beet, 200), (cls.garlic, 10), (cls.salt, 3),
+        )
+        cls.cake = cls.create_recipe(
+            (cls.flour, 300), (cls.sugar, 200), (cls.salt, 1),
+        )
+
+    @classmethod
+    def create_recipe(cls, *ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.author,
+            name='рецепт',
+            image='recipes/images/test.png',
+            text='описание',
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in ingredients
+        )
+        return recipe
+
+    def update(self, *args, **options):
+        output = io.StringIO()
+        call_command(
+            'update_similar_recipes', *args, stdout=output, **options
+        )
+        return output.getvalue()
+
+    def lists(self):
+        lists = {}
+        for link in SimilarRecipe.objects.order_by('-score', 'similar_id'):
+            lists.setdefault(link.recipe_id, []).append(
+                (link.similar_id, round(link.score, 6))
+            )
+        return lists
+
+    def similar(self, recipe):
+        response = self.client.get(f'/api/recipes/{recipe.id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_ranked_by_weighted_cosine(self):
+        self.update('--all')
+        lists = self.lists()
+        self.assertEqual(
+            [recipe_id for recipe_id, _ in lists[self.borsch.id]],
+            [self.green_borsch.id, self.salad.id, self.cake.id],
+        )
+        scores = dict(lists[self.borsch.id])
+        self.assertGreater(scores[self.green_borsch.id], 0.9)
+        # Соль есть везде, и общая соль почти ничего не значит
+        self.assertLess(scores[self.cake.id], 0.05)
+        self.assertEqual(
+            dict(lists[self.salad.id])[self.borsch.id],
+            scores[self.salad.id],
+        )
+        self.assertFalse(stale_recipe_ids().exists())
+
+    def test_count(self):
+        self.update('--all', count=1)
+        lists = self.lists()
+        self.assertEqual(lists[self.borsch.id][0][0], self.green_borsch.id)
+        self.assertEqual({len(pairs) for pairs in lists.values()}, {1})
+
+    def test_incremental_matches_full(self):
+        self.update('--all')
+        self.assertIn('актуальны', self.update())
+        self.cake.recipe_ingredients.all().delete()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=self.cake, ingredient=ingredient, amount=1
+            )
+            for ingredient in (self.beet, self.garlic)
+        )
+        self.cake.save()
+        self.assertEqual(list(stale_recipe_ids()), [self.cake.id])
+        self.assertIn('Пересчитано рецептов: 1', self.update())
+        incremental = self.lists()
+        self.assertEqual(incremental[self.salad.id][0][0], self.cake.id)
+        self.update('--all')
+        self.assertEqual(incremental, self.lists())
+
+    def test_endpoint(self):
+        self.update('--all')
+        with self.assertNumQueries(1):
+            data = self.similar(self.borsch)
+        self.assertEqual(
+            [recipe['id'] for recipe in data],
+            [self.green_borsch.id, self.salad.id, self.cake.id],
+        )
+        self.assertEqual(
+            set(data[0]),
+            {
+                'id', 'name', 'image', 'image_sources', 'cooking_time',
+                'similarity',
+            },
+        )
+        self.green_borsch.delete()
+        self.assertEqual(
+            [recipe['id'] for recipe in self.similar(self.borsch)],
+            [self.salad.id, self.cake.id],
+        )
+
+    def test_endpoint_without_neighbours(self):
+        self.assertEqual(self.similar(self.borsch), [])
+        response = self.client.get('/api/recipes/1000000/similar/')
+        self.assertEqual(response.status_code, 404)
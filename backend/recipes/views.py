@@ -1,3 +1,16 @@
-from django.shortcuts import render
+from django.http import Http404
+from django.shortcuts import redirect
 
-# Create your views here.
+from recipes.short_links import decode, known_recipe_ids
+
+
+def short_link_redirect(request, code):
+    """Перенаправляет /r/<code> на страницу рецепта.
+
+    Код раскодируется без обращения к БД, а существование рецепта
+    обычно подтверждается кэшем известных id.
+    """
+    recipe_id = decode(code)
+    if recipe_id is None or not known_recipe_ids.exists(recipe_id):
+        raise Http404('Рецепт не найден')
+    return redirect(f'/recipes/{recipe_id}')
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from feed.services import add_author_to_feed, remove_author_from_feed
 from users.models import User, Subscription
 
 
@@ -33,3 +34,21 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('user', 'subscribed_to')
     list_filter = ('user', 'subscribed_to')
     search_fields = ('user__username', 'subscribed_to__username')
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            remove_author_from_feed(
+                form.initial['user'], form.initial['subscribed_to']
+            )
+        super().save_model(request, obj, form, change)
+        add_author_to_feed(obj.user_id, obj.subscribed_to_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        remove_author_from_feed(obj.user_id, obj.subscribed_to_id)
+
+    def delete_queryset(self, request, queryset):
+        removed = list(queryset.values_list('user_id', 'subscribed_to_id'))
+        super().delete_queryset(request, queryset)
+        for user_id, author_id in removed:
+            remove_author_from_feed(user_id, author_id)
@@ -0,0 +1,152 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication, get_authorization_header
+)
+
+
+class TokenCache:
+    """Кэш разрешения токена в пользователя.
+
+    В бэкенде TOKEN_CACHE_ALIAS (он может быть общим) хранятся только
+    хэши: хэш ключа -> (id пользователя, метка записи) и обратная
+    ссылка пользователь -> хэш ключа, чтобы выселять запись по
+    пользователю без запроса к БД: при выходе, смене пароля,
+    деактивации и любом другом изменении пользователя. Сам
+    пользователь лежит в ограниченном LRU процесса и годится, пока его
+    метка совпадает с меткой в бэкенде, иначе перечитывается по id.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = OrderedDict()
+
+    @property
+    def cache(self):
+        return caches[settings.TOKEN_CACHE_ALIAS]
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'TOKEN_USER_CACHE_SIZE', 10000)
+
+    @staticmethod
+    def digest(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def token_key(self, digest):
+        return f'auth:token:{digest}'
+
+    def user_key(self, user_id):
+        return f'auth:user:{user_id}'
+
+    def lookup(self, key):
+        """(id пользователя, метка) по ключу токена или None."""
+        return self.cache.get(self.token_key(self.digest(key)))
+
+    def cached_user(self, entry):
+        """Пользователь из памяти процесса, если его метка актуальна."""
+        user_id, stamp = entry
+        with self.lock:
+            cached = self.users.get(user_id)
+            if cached is None or cached[0] != stamp:
+                return None
+            self.users.move_to_end(user_id)
+            return cached[1]
+
+    def remember(self, user, stamp):
+        with self.lock:
+            self.users[user.pk] = (stamp, user)
+            self.users.move_to_end(user.pk)
+            while len(self.users) > self.maxsize:
+                self.users.popitem(last=False)
+
+    def get(self, key):
+        """Пользователь по ключу токена или None, если записи нет."""
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        user = self.cached_user(entry)
+        if user is None:
+            user = get_user_model().objects.filter(pk=entry[0]).first()
+            if user is None:
+                return None
+            self.remember(user, entry[1])
+        return user
+
+    def set(self, token):
+        digest = self.digest(token.key)
+        stamp = time.time_ns()
+        self.cache.set_many(
+            {
+                self.token_key(digest): (token.user_id, stamp),
+                self.user_key(token.user_id): digest,
+            },
+            settings.TOKEN_CACHE_TIMEOUT
+        )
+        self.remember(token.user, stamp)
+
+    def evict(self, key):
+        self.cache.delete(self.token_key(self.digest(key)))
+
+    def evict_user(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+        user_key = self.user_key(user_id)
+        digest = self.cache.get(user_key)
+        if digest is not None:
+            self.cache.delete_many([self.token_key(digest), user_key])
+
+    def clear(self):
+        self.cache.clear()
+        with self.lock:
+            self.users.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса Token JOIN User на каждый запрос."""
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(token)
+            return (user, token)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return (user, self.make_token(key, user))
+
+    def make_token(self, key, user):
+        """Token без чтения из БД: в кэше нет ни ключа, ни токена."""
+        return self.get_model()(key=key, user=user)
+
+    async def aauthenticate(self, request):
+        """authenticate для async-представлений.
+
+        Попадание в кэш и в память процесса обходится без потока,
+        остальное, включая разбор ошибок заголовка, выполняет синхронный
+        authenticate через sync_to_async.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 2:
+            key = auth[1].decode(errors='replace')
+            entry = token_cache.lookup(key)
+            user = entry and token_cache.cached_user(entry)
+            if user and user.is_active:
+                return (user, self.make_token(key, user))
+        return await sync_to_async(self.authenticate)(request)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register()
+def check_token_cache(app_configs, **kwargs):
+    """Кэш токенов в памяти процесса не даёт отозвать токен везде."""
+    if settings.DEBUG:
+        return []
+    alias = settings.TOKEN_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend != LOCMEM_BACKEND:
+        return []
+    return [
+        Warning(
+            f'Кэш токенов {alias!r} использует {backend}: выход и смена '
+            'пароля не отзовут токен в других процессах.',
+            hint='Укажите общий бэкенд в TOKEN_CACHE_BACKEND или '
+                 'TOKEN_CACHE_ALIAS.',
+            id='users.W001',
+        )
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+from foodgram_config.migration_operations import remove_duplicates
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_subscription'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicates('users.Subscription', ('user', 'subscribed_to')),
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(fields=('user', 'subscribed_to'), name='unique_subscription'),
+        ),
+    ]
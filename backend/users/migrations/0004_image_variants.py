@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 20:12
+
+from django.db import migrations
+import foodgram_config.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_subscription_unique_subscription'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=foodgram_config.images.VariantImageField(blank=True, null=True, upload_to='avatars/', verbose_name='аватарка'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 22:47
+
+from django.db import migrations, models
+import foodgram_config.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='форматы копий аватарки'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=foodgram_config.images.VariantImageField(blank=True, null=True, upload_to='avatars/', variants_field='avatar_variants', verbose_name='аватарка'),
+        ),
+        migrations.RunPython(
+            foodgram_config.images.mark_built_variants(
+                'users.User', 'avatar'
+            ),
+            migrations.RunPython.noop,
+        ),
+    ]
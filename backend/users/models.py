@@ -1,7 +1,29 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import RegexValidator
 from django.db import models
 
+from foodgram_config.images import VariantImageField
+
+
+class UserQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        # update() не шлёт post_save: пользователей, которых
+        # деактивируют или возвращают, выселяем из кэша токенов явно
+        if 'is_active' not in kwargs:
+            return super().update(**kwargs)
+        # Импорт здесь: модуль аутентификации загружается после моделей
+        from users.authentication import token_cache
+        user_ids = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        for user_id in user_ids:
+            token_cache.evict_user(user_id)
+        return updated
+
+
+class FoodgramUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
 
 class User(AbstractUser):
     email = models.EmailField(
@@ -22,15 +44,30 @@ class User(AbstractUser):
         max_length=150,
         verbose_name='фамилия'
     )
-    avatar = models.ImageField(
+    avatar = VariantImageField(
         upload_to='avatars/',
+        variants_field='avatar_variants',
         blank=True,
         null=True,
         verbose_name='аватарка',
     )
+    # Построенные форматы копий аватарки, пишет VariantImageField
+    avatar_variants = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='форматы копий аватарки',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='дата изменения'
+    )
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name', 'password']
     USERNAME_FIELD = 'email'
 
+    objects = FoodgramUserManager()
+
     class Meta:
         verbose_name = 'пользователь'
         verbose_name_plural = 'пользователи'
@@ -56,6 +93,12 @@ class Subscription(models.Model):
     class Meta:
         verbose_name = 'подписка'
         verbose_name_plural = 'подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'subscribed_to'],
+                name='unique_subscription',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} подписан на {self.subscribed_to.username}'
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import token_cache
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+def evict_changed_user(instance, update_fields, **kwargs):
+    # Вход обновляет только last_login, закэшированный user от этого
+    # не устаревает
+    if update_fields != frozenset(['last_login']):
+        token_cache.evict_user(instance.id)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Token)
+def evict_deleted(instance, **kwargs):
+    token_cache.evict_user(
+        instance.id if isinstance(instance, User) else instance.user_id
+    )
@@ -1,3 +1,107 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from users.authentication import token_cache
+from users.checks import check_token_cache
+from users.models import User
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    url = '/api/users/me/'
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            email='token@example.com',
+            username='token',
+            first_name='Токен',
+            last_name='Тестовый',
+            password='old-password-123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_lookup(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        # остаётся только запрос is_subscribed из сериализатора
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_logout_revokes_immediately(self):
+        self.client.get(self.url)
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_password_change_evicts(self):
+        self.client.get(self.url)
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'old-password-123',
+            'new_password': 'new-password-456',
+        })
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_deactivation_revokes(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_queryset_deactivation_revokes(self):
+        self.client.get(self.url)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_backend_holds_only_hashes(self):
+        self.client.get(self.url)
+        digest = token_cache.cache.get(token_cache.user_key(self.user.id))
+        self.assertNotEqual(digest, self.token.key)
+        self.assertEqual(
+            token_cache.cache.get(token_cache.token_key(digest))[0],
+            self.user.id,
+        )
+
+    def test_other_process_reloads_user(self):
+        self.client.get(self.url)
+        token_cache.users.clear()
+        # пользователь по id вместо Token JOIN User, и is_subscribed
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_token_deleted_elsewhere(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token missing')
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class TokenCacheCheckTest(SimpleTestCase):
+    locmem = {
+        'tokens': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+    @override_settings(DEBUG=False, CACHES={
+        'tokens': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        },
+    })
+    def test_shared_backend_passes(self):
+        self.assertEqual(check_token_cache(None), [])
+
+    @override_settings(DEBUG=False, CACHES=locmem)
+    def test_locmem_flagged_without_debug(self):
+        errors = check_token_cache(None)
+        self.assertEqual([error.id for error in errors], ['users.W001'])
+
+    @override_settings(DEBUG=True, CACHES=locmem)
+    def test_locmem_allowed_in_debug(self):
+        self.assertEqual(check_token_cache(None), [])